@@ -0,0 +1,279 @@
+import email.utils
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import incr, observe
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = "https://translate.librenode.com"
+TRANSLATE_PATH = "/api/translate"
+
+CONNECT_TIMEOUT = 5.0
+READ_TIMEOUT = 30.0
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5  # Seconds; doubled on every retry before jitter
+MAX_BACKOFF = 20.0
+MAX_RETRY_AFTER = 60.0  # Longest Retry-After we are willing to honour
+RATE_LIMIT = 8.0  # Requests per second across all engines; 0 disables the limiter
+BREAKER_WINDOW = 20  # Recent request outcomes an engine's circuit breaker looks at
+BREAKER_MIN_REQUESTS = 10  # Outcomes needed in the window before the circuit may open
+BREAKER_FAILURE_RATIO = 0.5  # Share of failed requests in the window that opens the circuit
+BREAKER_RESET = 30.0  # Seconds before an open circuit lets a probe request through
+CANCEL_POLL = 0.1  # Seconds between checks for a cancelled job while waiting on a request
+
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised without sending a request while an engine's circuit is open"""
+
+
+class TranslationCancelled(Exception):
+    pass
+
+
+class TokenBucket:
+    """Client-side rate limiter: `rate` tokens per second, bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, cancel_event=None):
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                raise TranslationCancelled()
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return
+                wait = (1.0 - self.tokens) / self.rate
+            _sleep(wait, cancel_event)
+
+
+class CircuitBreaker:
+    """Closed -> open when `failure_ratio` of the last `window` requests failed; half-open after `reset_timeout`
+
+    Each outcome is one logical request after its retries, so a flaky engine
+    that answers most chunks on a retry keeps its circuit closed.
+    """
+
+    def __init__(self, window=BREAKER_WINDOW, min_requests=BREAKER_MIN_REQUESTS,
+                 failure_ratio=BREAKER_FAILURE_RATIO, reset_timeout=BREAKER_RESET):
+        self.min_requests = min(min_requests, window)
+        self.failure_ratio = failure_ratio
+        self.reset_timeout = reset_timeout
+        self.outcomes = deque(maxlen=window)  # True for a success
+        self.opened_at = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return 'closed'
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                return 'half-open'
+            return 'open'
+
+    def allow(self):
+        """Whether a request may be sent; only one probe is let through when half-open"""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self.probing:
+                return False
+            self.probing = True
+            return True
+
+    @property
+    def failures(self):
+        with self._lock:
+            return self.outcomes.count(False)
+
+    def record_success(self):
+        with self._lock:
+            if self.probing:
+                self.opened_at = None
+                self.probing = False
+            self.outcomes.append(True)
+
+    def record_failure(self):
+        with self._lock:
+            self.outcomes.append(False)
+            failed = self.outcomes.count(False)
+            if self.probing or (len(self.outcomes) >= self.min_requests
+                                and failed >= self.failure_ratio * len(self.outcomes)):
+                self.opened_at = time.monotonic()
+                # Start afresh once a probe succeeds
+                self.outcomes.clear()
+            self.probing = False
+
+    def release(self):
+        """End a request that says nothing about the engine's health, such as one rate limited"""
+        with self._lock:
+            self.probing = False
+
+
+def _sleep(seconds, cancel_event=None):
+    """Sleep, waking early to raise TranslationCancelled once cancel_event is set"""
+    if cancel_event is None:
+        time.sleep(seconds)
+    elif cancel_event.wait(seconds):
+        raise TranslationCancelled()
+
+
+def retry_after_seconds(response):
+    """Parse a Retry-After header given either in seconds or as an HTTP date"""
+    value = response.headers.get('Retry-After') if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class LibreNodeClient:
+    """HTTP client for the LibreNode API with timeouts, retries, rate limiting and circuit breakers"""
+
+    def __init__(self, base_url=None, pool_size=8, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+                 max_retries=MAX_RETRIES, rate_limit=RATE_LIMIT):
+        self.base_url = (base_url or DEFAULT_BASE_URL).rstrip('/')
+        self.url = self.base_url + TRANSLATE_PATH
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.limiter = TokenBucket(rate_limit, capacity=pool_size) if rate_limit else None
+        self.breakers = {}
+        self._breakers_lock = threading.Lock()
+        self.session = requests.Session()
+        self.session.headers.update({'Accept': 'application/json'})
+        # Keep one pooled connection per request in flight so TLS handshakes are reused
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        # Cancellable requests wait for their answer here, so a cancelled job frees its
+        # worker at once; room for the requests of a cancelled job and of the next one
+        self._senders = ThreadPoolExecutor(max_workers=pool_size * 4, thread_name_prefix='http')
+
+    def breaker(self, engine):
+        with self._breakers_lock:
+            if engine not in self.breakers:
+                self.breakers[engine] = CircuitBreaker()
+            return self.breakers[engine]
+
+    def _backoff(self, attempt, response=None):
+        retry_after = retry_after_seconds(response)
+        if retry_after is not None:
+            return min(retry_after, MAX_RETRY_AFTER)
+        # Full jitter keeps concurrent workers from retrying in lockstep
+        return random.uniform(0, min(MAX_BACKOFF, BACKOFF_BASE * (2 ** attempt)))
+
+    def translate(self, payload, cancel_event=None, sent=None):
+        """POST a translation request, retrying transient failures; returns the response.
+
+        Raises requests.HTTPError for non-retryable statuses or once retries are
+        exhausted, and CircuitOpenError while the engine's circuit is open. The
+        breaker sees one outcome per call, not one per attempt. Setting
+        cancel_event stops retrying and waiting, including for the answer to
+        a request already sent, with TranslationCancelled.
+        sent, an Event, is set when the first attempt leaves the rate limiter.
+        The response's elapsed time covers only the attempt that produced it.
+        """
+        engine = payload.get('engine', '')
+        breaker = self.breaker(engine)
+        if not breaker.allow():
+            incr('circuit_rejections', engine=engine)
+            raise CircuitOpenError(f"Circuit open for engine '{engine}' after repeated failures")
+        healthy = None  # Outcome for the breaker; None when the request says nothing about the engine
+        try:
+            attempt = 0
+            while True:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise TranslationCancelled()
+                if self.limiter is not None:
+                    self.limiter.acquire(cancel_event)
+                if sent is not None:
+                    sent.set()
+                response = None
+                start = time.perf_counter()
+                try:
+                    response = self._post(payload, cancel_event)
+                    # Timed per attempt, after the limiter: client-side waits are not engine latency
+                    observe('http_request_seconds', time.perf_counter() - start, engine=engine)
+                    if response.status_code not in RETRY_STATUSES:
+                        # 4xx other than 429 means our request was wrong, not that the engine is down
+                        healthy = response.status_code < 500
+                        response.raise_for_status()
+                        return response
+                    error = requests.exceptions.HTTPError(
+                        f"{response.status_code} Server Error for url: {self.url}", response=response)
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                    error = e
+                if attempt >= self.max_retries:
+                    # Rate limiting is left to backoff and the token bucket rather than the breaker
+                    if response is None or response.status_code != 429:
+                        healthy = False
+                    raise error
+                delay = self._backoff(attempt, response)
+                incr('http_retries', engine=engine)
+                logger.warning("Retrying %s request in %.2fs after: %s", engine, delay, error)
+                _sleep(delay, cancel_event)
+                attempt += 1
+        finally:
+            if healthy is None:
+                breaker.release()
+            elif healthy:
+                breaker.record_success()
+            else:
+                breaker.record_failure()
+
+    def _post(self, payload, cancel_event=None):
+        """POST payload; with a cancel_event, stop waiting for the answer once it is set"""
+        if cancel_event is None:
+            return self.session.post(self.url, data=payload, timeout=self.timeout)
+        future = self._senders.submit(self.session.post, self.url, data=payload, timeout=self.timeout)
+        while True:
+            try:
+                return future.result(timeout=CANCEL_POLL)
+            except FutureTimeout:
+                if cancel_event.is_set():
+                    # The request runs on until answered or timed out, but nobody waits for it
+                    incr('http_abandoned', engine=payload.get('engine', ''))
+                    raise TranslationCancelled()
+
+    def close(self):
+        self._senders.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+
+
+def default_base_url():
+    return os.environ.get('DOTRANSLATE_API_URL') or DEFAULT_BASE_URL
+
+
+def default_rate_limit():
+    try:
+        return float(os.environ.get('DOTRANSLATE_RATE_LIMIT', RATE_LIMIT))
+    except ValueError:
+        return RATE_LIMIT
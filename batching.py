@@ -0,0 +1,88 @@
+import os
+import re
+import threading
+
+from segmenter import MAX_CHARS
+
+MAX_BATCH_CHARS = 4000  # Upper bound of the characters packed into one request
+MIN_BATCH_CHARS = 250
+GROW_STEP = 250  # Added to an engine's limit after a fast, well-filled request
+SLOW_REQUEST = 3.0  # Seconds; slower requests (and failures) halve the limit
+FLUSH_FILL = 0.8  # A batch this full is sent without waiting for the next segment
+
+# Segments after the first are preceded by a numbered marker on its own line.
+# Engines keep digits and brackets, but may add spaces or switch to full-width
+# brackets when translating into Chinese, so the parser accepts those too.
+MARKER = '\n[[{}]]\n'
+MARKER_OVERHEAD = len(MARKER.format(999))
+_marker_re = re.compile(r'\s*[\[［【]\s*[\[［【]\s*(\d+)\s*[\]］】]\s*[\]］】]\s*')
+
+
+def default_batch_chars():
+    """Batch size cap from DOTRANSLATE_BATCH_CHARS; 0 turns packing off"""
+    try:
+        return max(0, int(os.environ.get('DOTRANSLATE_BATCH_CHARS', MAX_BATCH_CHARS)))
+    except ValueError:
+        return MAX_BATCH_CHARS
+
+
+def can_pack(segment):
+    """Segments that already contain something marker-like are sent on their own"""
+    return not _marker_re.search(segment)
+
+
+def pack(segments):
+    """Join segments into one request text, separated by numbered marker lines"""
+    parts = [segments[0]]
+    for n, segment in enumerate(segments[1:], 1):
+        parts.append(MARKER.format(n))
+        parts.append(segment)
+    return ''.join(parts)
+
+
+def unpack(text, count):
+    """Split a translated pack into its count segments, or None when markers were lost or mangled"""
+    pieces = _marker_re.split(text)
+    numbers = pieces[1::2]
+    if numbers != [str(n) for n in range(1, count)]:
+        return None
+    return [segment.strip() for segment in pieces[0::2]]
+
+
+class PayloadSizer:
+    """Per-engine request size limit: grows while well-filled requests are fast, halves on trouble.
+
+    The limit starts at MAX_CHARS, the size a single chunk may have, so
+    only segments that leave a request half empty are packed until an engine
+    has shown it answers larger requests quickly.
+    """
+
+    def __init__(self, maximum=MAX_BATCH_CHARS, initial=MAX_CHARS, minimum=MIN_BATCH_CHARS):
+        self.maximum = maximum
+        self.minimum = min(minimum, maximum)
+        self.initial = max(self.minimum, min(initial, maximum))
+        self._limits = {}
+        self._lock = threading.Lock()
+
+    def limit(self, engine):
+        with self._lock:
+            return self._limits.get(engine, self.initial)
+
+    def record(self, engine, latency, ok, chars):
+        with self._lock:
+            limit = self._limits.get(engine, self.initial)
+            if not ok or latency > SLOW_REQUEST:
+                limit = max(self.minimum, limit // 2)
+            elif chars >= limit / 2:
+                # Small requests being fast says nothing about larger ones
+                limit = min(self.maximum, limit + GROW_STEP)
+            self._limits[engine] = limit
+
+    def shrink(self, engine):
+        """Halve the limit after a pack came back unusable"""
+        with self._lock:
+            self._limits[engine] = max(self.minimum, self._limits.get(engine, self.initial) // 2)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._limits)
@@ -0,0 +1,61 @@
+"""Run the whole benchmark suite and optionally compare with an earlier run.
+
+Run from the repository root:
+
+    python -m benchmarks --save before.json
+    git checkout my-branch
+    python -m benchmarks --compare before.json
+
+Benchmarks whose requirements are missing (tesseract, the WordNet corpus)
+are skipped. Use --quick for a smoke run with small inputs.
+"""
+import argparse
+import sys
+
+from benchmarks import (bench_batching, bench_dedup, bench_extraction, bench_ocr_batch, bench_segmenter,
+                        bench_thesaurus, bench_translate)
+from benchmarks.harness import Results
+
+SUITES = {
+    'segmenter': (bench_segmenter, ['--size-mb', '0.5', '--repeat', '1']),
+    'translate': (bench_translate, ['--sizes', '20', '--workers', '4', '--latency', '0.01']),
+    'dedup': (bench_dedup, ['--pages', '20', '--latency', '0.01']),
+    'batching': (bench_batching, ['--segments', '100', '--latency', '0.01']),
+    'extraction': (bench_extraction, ['--text-pages', '20', '--scanned-pages', '2', '--images', '2',
+                                      '--repeat', '1']),
+    'ocr_batch': (bench_ocr_batch, ['--images', '8']),
+    'thesaurus': (bench_thesaurus, ['--words', '100']),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Run the benchmark suite.')
+    parser.add_argument('suites', nargs='*', help='benchmarks to run: ' + ', '.join(SUITES) + ' (default: all)')
+    parser.add_argument('--quick', action='store_true', help='small inputs, for a smoke run')
+    parser.add_argument('--save', metavar='PATH', help='write the results as JSON')
+    parser.add_argument('--compare', metavar='PATH', help='compare with results saved by --save')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='slowdown reported as a regression (default: %(default)s)')
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.suites if name not in SUITES]
+    if unknown:
+        parser.error(f"unknown benchmark: {', '.join(unknown)}")
+
+    results = Results()
+    for name in args.suites or SUITES:
+        module, quick_args = SUITES[name]
+        module.main(quick_args if args.quick else [], results)
+        print()
+    if args.save:
+        results.save(args.save)
+        print(f"Results saved to {args.save}")
+    if args.compare:
+        regressions = results.compare(args.compare, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) slower than the baseline by more than {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
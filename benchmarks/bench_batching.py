@@ -0,0 +1,55 @@
+"""Requests and time saved by packing many short segments into shared requests.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_batching --segments 500 --latency 0.05
+"""
+import argparse
+import random
+
+from api_client import LibreNodeClient
+from batching import MAX_BATCH_CHARS, PayloadSizer
+from benchmarks.bench_segmenter import latin_text
+from benchmarks.fake_server import FakeLibreNode
+from benchmarks.harness import Results, best_of
+from translation_engine import TranslationEngine
+
+
+def make_segments(count, rng):
+    """Short distinct segments, like table cells or one-line records"""
+    return [f"{latin_text(rng.randint(20, 160), rng).strip()} {n}" for n in range(count)]
+
+
+def run(server, segments, batch_chars, workers):
+    client = TranslationEngine(max_workers=workers, memory=None, sizer=PayloadSizer(batch_chars),
+                               client=LibreNodeClient(server.base_url, pool_size=workers * 2, rate_limit=0))
+    try:
+        requests_before = server.requests
+        seconds, _ = best_of(lambda: client.translate_chunks(segments, 'en', 'es', 'google'), 1)
+        return seconds, server.requests - requests_before
+    finally:
+        client.close()
+
+
+def main(argv=None, results=None):
+    parser = argparse.ArgumentParser(description='Benchmark segment packing against a local fake API.')
+    parser.add_argument('--segments', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.05, help='fake API latency in seconds')
+    parser.add_argument('--batch-chars', type=int, default=MAX_BATCH_CHARS)
+    args = parser.parse_args(argv)
+    results = results if results is not None else Results()
+    segments = make_segments(args.segments, random.Random(5))
+
+    with FakeLibreNode(latency=args.latency) as server:
+        print(f"-- {args.segments} short segments, fake latency {args.latency * 1000:.0f} ms")
+        for label, batch_chars in (('one request per segment', 0),
+                                   (f"packed up to {args.batch_chars} chars", args.batch_chars)):
+            seconds, requests = run(server, segments, batch_chars, args.workers)
+            print(f"{label:<36} {seconds:8.2f} s  {requests:5d} requests")
+            results.add(f"batching {label} {args.segments} segments", seconds, requests=requests)
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Requests saved by segment deduplication on a paged document with running headers and footers.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_dedup --pages 100 --latency 0.02
+"""
+import argparse
+import random
+
+from api_client import LibreNodeClient
+from benchmarks.bench_segmenter import latin_text
+from benchmarks.fake_server import FakeLibreNode
+from benchmarks.harness import Results, best_of
+from dedup import split_boilerplate
+from segmenter import MAX_CHARS, chunk_pages
+from translation_engine import TranslationEngine
+
+HEADER = 'ACME Corporation - Quarterly Statement\nConfidential, for the addressee only'
+FOOTER = ('This statement is provided for information only and does not constitute an offer '
+          'or a solicitation. Figures are unaudited and may be revised without notice.')
+
+
+def make_pages(count, page_chars, rng):
+    """(page number, text) pairs: a running header, body text, a footer and the page number"""
+    return [(number, f"{HEADER}\n\n{latin_text(page_chars, rng)}\n\n{FOOTER}\n{number}")
+            for number in range(1, count + 1)]
+
+
+def run(server, pages, chunker, dedupe, workers, max_chars):
+    client = TranslationEngine(max_workers=workers, memory=None,
+                               client=LibreNodeClient(server.base_url, pool_size=workers * 2, rate_limit=0))
+    client.dedupe = dedupe
+    try:
+        requests_before = server.requests
+        seconds, _ = best_of(lambda: client.translate_items(
+            ((gap, chunk) for gap, chunk, _ in chunker(pages, max_chars)), 'en', 'es', 'google'), 1)
+        return seconds, server.requests - requests_before
+    finally:
+        client.close()
+
+
+def main(argv=None, results=None):
+    parser = argparse.ArgumentParser(description='Benchmark segment deduplication against a local fake API.')
+    parser.add_argument('--pages', type=int, default=100)
+    parser.add_argument('--page-chars', type=int, default=1600, help='body characters per page')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.02, help='fake API latency in seconds')
+    parser.add_argument('--max-chars', type=int, default=MAX_CHARS)
+    args = parser.parse_args(argv)
+    results = results if results is not None else Results()
+    pages = make_pages(args.pages, args.page_chars, random.Random(11))
+
+    with FakeLibreNode(latency=args.latency) as server:
+        print(f"-- {args.pages} pages with a running header and footer, fake latency {args.latency * 1000:.0f} ms")
+        for label, chunker, dedupe in (('no dedup', chunk_pages, False),
+                                       ('dedup', split_boilerplate, True)):
+            seconds, requests = run(server, pages, chunker, dedupe, args.workers, args.max_chars)
+            print(f"{label:<36} {seconds:8.2f} s  {requests:5d} requests")
+            results.add(f"dedup {label} {args.pages} pages", seconds, requests=requests)
+    return results
+
+
+if __name__ == '__main__':
+    main()
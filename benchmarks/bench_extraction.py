@@ -0,0 +1,67 @@
+"""PDF text extraction and OCR on generated fixture files.
+
+Run from the repository root (the OCR cases require the tesseract binary):
+
+    python -m benchmarks.bench_extraction --text-pages 200 --scanned-pages 10
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+
+from benchmarks.fixtures import make_images, make_scanned_pdf, make_text_pdf
+from benchmarks.harness import Results, best_of
+from ocr import get_ocr_engine
+from pdf_text import iter_pdf_pages
+
+
+def read_pdf(path):
+    return sum(len(text) for _, _, text in iter_pdf_pages(path))
+
+
+def main(argv=None, results=None):
+    parser = argparse.ArgumentParser(description='Benchmark PDF extraction and OCR.')
+    parser.add_argument('--text-pages', type=int, default=100)
+    parser.add_argument('--scanned-pages', type=int, default=8)
+    parser.add_argument('--images', type=int, default=8)
+    parser.add_argument('--lang', default='eng')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+    results = results if results is not None else Results()
+    # Without the OCR cache every run really calls Tesseract
+    os.environ['DOTRANSLATE_OCR_CACHE'] = 'off'
+    rng = random.Random(7)
+
+    with tempfile.TemporaryDirectory(prefix='dotranslate-bench-') as directory:
+        text_pdf = make_text_pdf(os.path.join(directory, 'text.pdf'), args.text_pages, rng)
+        seconds, chars = best_of(lambda: read_pdf(text_pdf), args.repeat)
+        print(f"-- PDF text layer, {args.text_pages} pages")
+        print(f"{'iter_pdf_pages':<36} {seconds * 1000:9.1f} ms  "
+              f"{seconds / args.text_pages * 1000:7.2f} ms/page  {chars} chars")
+        results.add(f"pdf text layer {args.text_pages} pages", seconds, chars=chars)
+
+        if shutil.which('tesseract') is None:
+            print('tesseract not found on PATH; skipping OCR cases')
+            return results
+
+        engine = get_ocr_engine()
+        try:
+            scanned_pdf = make_scanned_pdf(os.path.join(directory, 'scanned.pdf'), args.scanned_pages, rng)
+            print(f"-- scanned PDF, {args.scanned_pages} pages, lang={args.lang}, {engine.max_workers} workers")
+            seconds, chars = best_of(lambda: read_pdf(scanned_pdf), 1)
+            print(f"{'iter_pdf_pages (OCR)':<36} {seconds:9.2f} s  "
+                  f"{seconds / args.scanned_pages * 1000:7.1f} ms/page  {chars} chars")
+            results.add(f"pdf ocr {args.scanned_pages} pages", seconds, chars=chars)
+
+            paths = make_images(directory, args.images, rng)
+            seconds, texts = best_of(lambda: [engine.ocr_file(path, args.lang) for path in paths], 1)
+            print(f"{'ocr_file per image':<36} {seconds:9.2f} s  {seconds / len(paths) * 1000:7.1f} ms/image")
+            results.add(f"ocr_file {args.images} images", seconds)
+        finally:
+            engine.close()
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Compare one Tesseract process per image with batched Tesseract runs.
+
+Run from the repository root (requires the tesseract binary):
+
+    python -m benchmarks.bench_ocr_batch --images 100 --lang eng
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from benchmarks.fixtures import make_images
+from benchmarks.harness import Results
+from ocr import OcrEngine
+
+
+def timed(label, fn, count, results):
+    start = time.perf_counter()
+    texts = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<36} {elapsed:8.2f} s  {elapsed / count * 1000:8.1f} ms/image")
+    results.add(f"ocr {count} images {label}", elapsed)
+    return texts
+
+
+def main(argv=None, results=None):
+    parser = argparse.ArgumentParser(description='Benchmark batched against per-image Tesseract calls.')
+    parser.add_argument('--images', type=int, default=50)
+    parser.add_argument('--lang', default='eng', help="Tesseract languages, e.g. 'chi_sim+chi_tra'")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+    results = results if results is not None else Results()
+
+    if shutil.which('tesseract') is None:
+        print('tesseract not found on PATH; skipping OCR benchmark')
+        return results
+
+    with tempfile.TemporaryDirectory(prefix='dotranslate-bench-') as directory:
+        paths = make_images(directory, args.images, random.Random(7))
+        print(f"-- {args.images} images, lang={args.lang}, {args.workers} workers, cache disabled")
+        serial = OcrEngine(max_workers=1)
+        pooled = OcrEngine(max_workers=args.workers)
+        try:
+            timed('per-image, serial', lambda: [serial.ocr_file(path, args.lang) for path in paths],
+                  len(paths), results)
+            per_call = timed('per-image, pool of workers',
+                             lambda: pooled.ocr_pages([open(path, 'rb').read() for path in paths], args.lang),
+                             len(paths), results)
+            batched = timed('batched Tesseract runs', lambda: pooled.ocr_batch(paths, args.lang),
+                            len(paths), results)
+        finally:
+            pooled.close()
+        same = sum(a == b for a, b in zip(per_call, batched))
+        print(f"identical output for {same}/{len(paths)} images")
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Micro-benchmarks for the segmenter on multi-megabyte inputs.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_segmenter --size-mb 4
+"""
+import argparse
+import random
+import re
+import time
+
+from benchmarks.harness import Results
+from segmenter import MAX_CHARS, chunk_spans
+
+WORDS = ('translation', 'document', 'the', 'of', 'and', 'privacy', 'engine', 'a',
+         'request', 'page', 'invoice', 'contract', 'is', 'with', 'local', 'text')
+HANZI = '我你他们的是在不了有和人这中大为上个国说到以'
+
+
+def legacy_chunk_text(text, max_chars):
+    """The chunker that used to live inside TranslationApp.translate_text"""
+    cjk_re = re.compile(r'[一-鿿㐀-䶿぀-ヿ가-힯]')
+    if cjk_re.search(text):
+        return [text[i:i+max_chars] for i in range(0, len(text), max_chars)]
+    paragraphs = text.split('\n')
+    chunks = []
+    current = ''
+    for para in paragraphs:
+        if len(current) + len(para) + 1 > max_chars:
+            if current:
+                chunks.append(current)
+                current = ''
+        if len(para) > max_chars:
+            for i in range(0, len(para), max_chars):
+                chunks.append(para[i:i+max_chars])
+        else:
+            if current:
+                current += '\n' + para
+            else:
+                current = para
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def latin_text(size, rng, paragraph_sentences=6):
+    parts = []
+    total = 0
+    sentence_count = 0
+    while total < size:
+        sentence = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(5, 25))).capitalize()
+        sentence += rng.choice('..?!') + (' ' if sentence_count % paragraph_sentences else '\n')
+        sentence_count += 1
+        parts.append(sentence)
+        total += len(sentence)
+    return ''.join(parts)
+
+
+def cjk_text(size, rng):
+    parts = []
+    total = 0
+    while total < size:
+        sentence = ''.join(rng.choice(HANZI) for _ in range(rng.randint(8, 40))) + rng.choice('。！？')
+        parts.append(sentence)
+        total += len(sentence)
+    return ''.join(parts)
+
+
+def bench(name, fn, text, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        chunks = fn(text)
+        best = min(best, time.perf_counter() - start)
+    mb = len(text.encode('utf-8')) / 1e6
+    print(f"{name:<32} {best * 1000:9.1f} ms  {mb / best:8.1f} MB/s  {len(chunks):7d} chunks")
+    return best
+
+
+def main(argv=None, results=None):
+    parser = argparse.ArgumentParser(description='Benchmark chunk_spans against the legacy chunker.')
+    parser.add_argument('--size-mb', type=float, default=4.0, help='input size in megabytes')
+    parser.add_argument('--max-chars', type=int, default=MAX_CHARS)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+    results = results if results is not None else Results()
+
+    rng = random.Random(42)
+    size = int(args.size_mb * 1e6)
+    inputs = {
+        'latin paragraphs': latin_text(size, rng),
+        'latin single paragraph': latin_text(size, rng, paragraph_sentences=10**9),
+        'cjk sentences': cjk_text(size // 3, rng),  # ~3 bytes per character
+    }
+    for label, text in inputs.items():
+        print(f"-- {label} ({len(text)} chars)")
+        bench('legacy chunk_text', lambda t: legacy_chunk_text(t, args.max_chars), text, args.repeat)
+        seconds = bench('segmenter.chunk_spans', lambda t: chunk_spans(t, args.max_chars), text, args.repeat)
+        results.add(f"chunk_spans {label} {args.size_mb:g}MB", seconds)
+    return results
+
+
+if __name__ == '__main__':
+    main()
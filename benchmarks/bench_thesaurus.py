@@ -0,0 +1,97 @@
+"""Thesaurus lookup latency: live WordNet walks against the precomputed index.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_thesaurus --words 500
+
+Without the NLTK WordNet corpus only the index is measured, on a synthetic
+vocabulary of WordNet's size.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.harness import Results
+from thesaurus import Thesaurus, wordnet_available, write_index
+
+WORDS = ('good', 'fast', 'light', 'run', 'bank', 'clear', 'cold', 'happy', 'strong', 'open',
+         'translate', 'document', 'quick', 'old', 'new', 'high', 'close', 'dark', 'hard', 'free')
+
+
+def legacy_lookup(word):
+    """Synonyms and antonyms the way get_thesaurus_text used to collect them"""
+    import nltk
+    try:
+        nltk.data.find('corpora/wordnet')
+    except LookupError:
+        nltk.download('wordnet')
+    synonyms = []
+    antonyms = []
+    from nltk.corpus import wordnet
+    for syn in wordnet.synsets(word):
+        for lemma in syn.lemmas():
+            if lemma.name().lower() not in synonyms:
+                synonyms.append(lemma.name().lower())
+            if lemma.antonyms():
+                for ant in lemma.antonyms():
+                    if ant.name().lower() not in antonyms:
+                        antonyms.append(ant.name().lower())
+    return synonyms, antonyms
+
+
+def synthetic_entries(rng, count=150000):
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    words = sorted(set(''.join(rng.choice(letters) for _ in range(rng.randint(3, 12))) for _ in range(count)))
+    return words, [(word, [word] + rng.sample(words, 8), rng.sample(words, 1), 'n') for word in words]
+
+
+def timed(label, fn, words, results):
+    start = time.perf_counter()
+    for word in words:
+        fn(word)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<36} {elapsed / len(words) * 1e6:9.1f} us/lookup")
+    results.add(f"thesaurus {label}", elapsed)
+
+
+def main(argv=None, results=None):
+    parser = argparse.ArgumentParser(description='Benchmark thesaurus lookups.')
+    parser.add_argument('--words', type=int, default=500, help='lookups to time')
+    args = parser.parse_args(argv)
+    results = results if results is not None else Results()
+    rng = random.Random(3)
+
+    with tempfile.TemporaryDirectory(prefix='dotranslate-bench-') as directory:
+        thesaurus = Thesaurus(directory=directory)
+        if wordnet_available():
+            words = [rng.choice(WORDS) for _ in range(args.words)]
+            print('-- WordNet thesaurus lookups')
+            start = time.perf_counter()
+            legacy_lookup('good')
+            print(f"{'legacy first lookup (loads WordNet)':<36} {(time.perf_counter() - start) * 1000:9.1f} ms")
+            timed('legacy lookup', legacy_lookup, words, results)
+            start = time.perf_counter()
+            thesaurus.build_index()
+            print(f"{'index build (once per install)':<36} {time.perf_counter() - start:9.1f} s")
+        else:
+            print('-- thesaurus index, synthetic vocabulary (NLTK WordNet corpus not installed)')
+            vocabulary, entries = synthetic_entries(rng)
+            write_index(thesaurus.index_path('english'), entries)
+            words = [rng.choice(vocabulary) for _ in range(args.words)]
+        size = os.path.getsize(thesaurus.index_path('english'))
+        print(f"{'index size':<36} {size / 1e6:9.1f} MB")
+        start = time.perf_counter()
+        thesaurus.lookup(words[0], 'english')
+        print(f"{'index first lookup (maps the file)':<36} {(time.perf_counter() - start) * 1000:9.2f} ms")
+        timed('index lookup', lambda word: thesaurus._lookup(word, 'english'), words, results)
+        for word in words:
+            thesaurus.lookup(word, 'english')  # Fill the LRU cache
+        timed('memoized lookup', lambda word: thesaurus.lookup(word, 'english'), words, results)
+        thesaurus.close()
+    return results
+
+
+if __name__ == '__main__':
+    main()
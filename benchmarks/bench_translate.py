@@ -0,0 +1,67 @@
+"""End-to-end translate_text throughput against the fake LibreNode server.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_translate --sizes 10,100,1000 --latency 0.05 --workers 1,4,8
+"""
+import argparse
+import random
+
+from api_client import LibreNodeClient
+from benchmarks.bench_segmenter import latin_text
+from benchmarks.fake_server import FakeLibreNode
+from benchmarks.harness import Results, best_of
+from segmenter import MAX_CHARS
+from translation_engine import TranslationEngine
+
+
+def int_list(value):
+    return [int(part) for part in value.split(',') if part]
+
+
+def run(server, text, workers, engine, max_chars, repeat):
+    # Translation memory off so every run hits the (fake) network
+    client = TranslationEngine(max_workers=workers, memory=None,
+                               client=LibreNodeClient(server.base_url, pool_size=workers * 2, rate_limit=0))
+    try:
+        requests_before = server.requests
+        seconds, (translation, _) = best_of(
+            lambda: client.translate_text(text, 'en', 'es', engine, max_chars), repeat)
+        requests = (server.requests - requests_before) // max(1, repeat)
+    finally:
+        client.close()
+    failed = translation.count('failed:')
+    return seconds, requests, failed
+
+
+def main(argv=None, results=None):
+    parser = argparse.ArgumentParser(description='Benchmark translate_text against a local fake API.')
+    parser.add_argument('--sizes', type=int_list, default=[10, 100, 500], help='document sizes in KB')
+    parser.add_argument('--workers', type=int_list, default=[1, 4, 8])
+    parser.add_argument('--latency', type=float, default=0.02, help='fake API latency in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--word-choices', action='store_true')
+    parser.add_argument('--engine', default='google')
+    parser.add_argument('--max-chars', type=int, default=MAX_CHARS)
+    parser.add_argument('--repeat', type=int, default=1)
+    args = parser.parse_args(argv)
+    results = results if results is not None else Results()
+
+    rng = random.Random(42)
+    with FakeLibreNode(latency=args.latency, error_rate=args.error_rate,
+                       word_choices=args.word_choices) as server:
+        print(f"-- translate_text, engine={args.engine}, fake latency {args.latency * 1000:.0f} ms, "
+              f"error rate {args.error_rate:.0%}")
+        for size_kb in args.sizes:
+            text = latin_text(size_kb * 1000, rng)
+            for workers in args.workers:
+                seconds, requests, failed = run(server, text, workers, args.engine, args.max_chars, args.repeat)
+                print(f"{size_kb:6d} KB  {workers:3d} workers  {seconds:8.2f} s  "
+                      f"{len(text) / seconds / 1000:9.1f} kchars/s  {requests:5d} requests  {failed} failed")
+                results.add(f"translate_text {size_kb}KB x{workers}", seconds,
+                            requests=requests, failed=failed)
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""A local stand-in for the LibreNode translation API.
+
+Answers POST /api/translate like the real service, with configurable latency,
+error rate and word_choices payloads, so benchmarks do not depend on the
+network. It can also be run on its own and the app pointed at it:
+
+    python -m benchmarks.fake_server --port 8765 --latency 0.2 --error-rate 0.05
+    DOTRANSLATE_API_URL=http://127.0.0.1:8765 python translator.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+WORD_CHOICES = [{'word': 'hola', 'score': 0.9}, {'word': 'saludos', 'score': 0.6},
+                {'word': 'buenas', 'score': 0.4}]
+
+
+class FakeLibreNode:
+    """Threaded HTTP server that 'translates' by upper-casing the text.
+
+    latency: mean seconds per request; jitter: +/- fraction of it.
+    error_rate: fraction of requests answered with error_status.
+    engine_latency: optional per-engine override of latency.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, jitter=0.2, error_rate=0.0,
+                 error_status=503, word_choices=False, engine_latency=None, seed=1):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.word_choices = word_choices
+        self.engine_latency = engine_latency or {}
+        self.requests = 0
+        self.errors = 0
+        self.bytes_received = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _plan(self, engine):
+        """Decide this request's delay and whether it fails"""
+        with self._lock:
+            self.requests += 1
+            latency = self.engine_latency.get(engine, self.latency)
+            delay = latency * (1 + self._rng.uniform(-self.jitter, self.jitter)) if latency else 0.0
+            failed = self._rng.random() < self.error_rate
+            if failed:
+                self.errors += 1
+            return delay, failed
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # Keep-alive, like the real service
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                body = self.rfile.read(length)
+                with server._lock:
+                    server.bytes_received += length
+                form = {key: values[0] for key, values in parse_qs(body.decode('utf-8')).items()}
+                delay, failed = server._plan(form.get('engine'))
+                if delay:
+                    time.sleep(delay)
+                if failed:
+                    self.reply(server.error_status, {'error': 'injected failure'})
+                    return
+                result = {'translated-text': form.get('text', '').upper()}
+                if server.word_choices:
+                    result['word_choices'] = WORD_CHOICES
+                self.reply(200, result)
+
+            def reply(self, status, payload):
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run a fake LibreNode translation API.')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.1, help='mean seconds per request')
+    parser.add_argument('--jitter', type=float, default=0.2, help='latency jitter as a fraction')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--word-choices', action='store_true', help='include word_choices in replies')
+    args = parser.parse_args(argv)
+    server = FakeLibreNode(port=args.port, latency=args.latency, jitter=args.jitter,
+                           error_rate=args.error_rate, error_status=args.error_status,
+                           word_choices=args.word_choices)
+    print(f"Fake LibreNode listening on {server.base_url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Deterministic fixture files for the extraction and OCR benchmarks.
+
+Fixtures are generated rather than checked in, so they cost nothing in the
+repository and are identical on every machine for a given seed.
+"""
+import os
+
+WORDS = ('invoice', 'total', 'amount', 'due', 'date', 'customer', 'reference', 'payment',
+         'translation', 'document', 'page', 'number', 'address', 'service', 'quantity')
+
+
+def _font(size):
+    from PIL import ImageFont
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:  # Pillow < 10.1 has a single fixed-size default font
+        return ImageFont.load_default()
+
+
+def text_image(rng, lines=4, size=(900, 260)):
+    """A white image with a few lines of random words in black"""
+    from PIL import Image, ImageDraw
+    font = _font(28)
+    image = Image.new('RGB', size, 'white')
+    draw = ImageDraw.Draw(image)
+    for line in range(lines):
+        words = ' '.join(rng.choice(WORDS) for _ in range(6))
+        draw.text((30, 30 + line * 55), words, fill='black', font=font)
+    return image
+
+
+def make_images(directory, count, rng):
+    paths = []
+    for idx in range(count):
+        path = os.path.join(directory, f"image_{idx:04d}.png")
+        text_image(rng).save(path)
+        paths.append(path)
+    return paths
+
+
+def make_scanned_pdf(path, pages, rng):
+    """A PDF whose pages are images only, like the output of a document scanner"""
+    images = [text_image(rng, lines=20, size=(1240, 1754)) for _ in range(pages)]
+    images[0].save(path, save_all=True, append_images=images[1:], resolution=150)
+    return path
+
+
+def make_text_pdf(path, pages, rng, lines_per_page=45):
+    """A PDF with a real text layer (Helvetica), written by hand to avoid extra dependencies"""
+    objects = [b'<< /Type /Catalog /Pages 2 0 R >>', None,
+               b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    page_ids = []
+    for _ in range(pages):
+        lines = [' '.join(rng.choice(WORDS) for _ in range(10)).capitalize() + '.'
+                 for _ in range(lines_per_page)]
+        stream = 'BT /F1 11 Tf 14 TL 50 800 Td ' + ' '.join(f"({line}) '" for line in lines) + ' ET'
+        stream = stream.encode('latin-1')
+        objects.append(b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream')
+        objects.append(b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] '
+                       b'/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>' % len(objects))
+        page_ids.append(len(objects))
+    kids = ' '.join(f"{page_id} 0 R" for page_id in page_ids).encode('ascii')
+    objects[1] = b'<< /Type /Pages /Kids [' + kids + b'] /Count %d >>' % pages
+
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    out += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    with open(path, 'wb') as file:
+        file.write(out)
+    return path
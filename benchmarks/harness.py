@@ -0,0 +1,71 @@
+"""Shared helpers for recording benchmark results and comparing them across commits."""
+import json
+import platform
+import subprocess
+import time
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, check=True).stdout.decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def best_of(fn, repeat):
+    """Run fn `repeat` times, returning (fastest wall time, last result)"""
+    best = float('inf')
+    result = None
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+class Results:
+    """Collects named timings; lower `seconds` is better for every entry"""
+
+    def __init__(self):
+        self.entries = []
+
+    def add(self, name, seconds, **extra):
+        self.entries.append(dict(name=name, seconds=seconds, **extra))
+
+    def to_json(self):
+        return {
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'results': self.entries,
+        }
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.to_json(), file, indent=2)
+            file.write('\n')
+
+    def compare(self, baseline_path, threshold=0.10):
+        """Print the change against a saved run; returns the names that got slower than threshold"""
+        with open(baseline_path, encoding='utf-8') as file:
+            baseline = json.load(file)
+        previous = {entry['name']: entry['seconds'] for entry in baseline['results']}
+        print(f"-- compared with {baseline.get('revision') or baseline_path}")
+        regressions = []
+        for entry in self.entries:
+            before = previous.get(entry['name'])
+            if not before:
+                print(f"{entry['name']:<48} {'new':>10}")
+                continue
+            change = (entry['seconds'] - before) / before
+            flag = ''
+            if change > threshold:
+                flag = '  SLOWER'
+                regressions.append(entry['name'])
+            elif change < -threshold:
+                flag = '  faster'
+            print(f"{entry['name']:<48} {before * 1000:9.1f} -> {entry['seconds'] * 1000:9.1f} ms "
+                  f"({change:+.1%}){flag}")
+        return regressions
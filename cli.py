@@ -0,0 +1,346 @@
+"""Headless command line interface for dotranslate.
+
+Translates files, directories or JSON lines streams without loading Kivy:
+
+    python cli.py -s English -t Spanish document.pdf scans/
+    python cli.py -t German --format jsonl notes.txt > notes.jsonl
+    python cli.py --jsonl < requests.jsonl > translations.jsonl
+
+Each JSON lines input record is an object with a "text" field and optional
+"id", "from", "to" and "engine" fields overriding the command line options.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from api_client import READ_TIMEOUT, CONNECT_TIMEOUT, LibreNodeClient, default_base_url, default_rate_limit
+from metrics import METRICS, configure_logging, configure_metrics
+from translation_engine import AUTO_SOURCE, TranslationEngine, default_workers, LANGUAGE_CODES, ENGINE_CODES
+from translation_memory import open_default_memory
+from batching import PayloadSizer, default_batch_chars
+from segmenter import MAX_CHARS, chunk_pages
+from dedup import SegmentDeduplicator, split_boilerplate
+from extraction import extract_text_from_file, is_supported
+from pdf_text import iter_pdf_pages
+from ocr import IMAGE_EXTENSIONS, get_ocr_engine, ocr_lang
+
+RECORD_GROUP = 32  # JSON lines records translated together so their short texts can share requests
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_language(value):
+    """Accept either a language name ('Spanish') or an API code ('es')"""
+    lowered = value.lower()
+    if lowered in LANGUAGE_CODES:
+        return LANGUAGE_CODES[lowered]
+    if lowered in LANGUAGE_CODES.values():
+        return lowered
+    raise argparse.ArgumentTypeError(f"unknown language: {value}")
+
+
+def resolve_target(value):
+    code = resolve_language(value)
+    if code == AUTO_SOURCE:
+        raise argparse.ArgumentTypeError('the target language cannot be detected')
+    return code
+
+
+def resolve_engine(value):
+    lowered = value.lower()
+    if lowered not in ENGINE_CODES:
+        raise argparse.ArgumentTypeError(f"unknown engine: {value}")
+    return ENGINE_CODES[lowered]
+
+
+def ocr_language_name(code):
+    """Map an API language code back to the name used for OCR language packs"""
+    for name, lang_code in LANGUAGE_CODES.items():
+        if lang_code == code:
+            return name.title()
+    return 'English'
+
+
+def iter_input_files(paths):
+    """Expand directories into the supported files they contain"""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if is_supported(name):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def ordered_map(executor, fn, items, window):
+    """Like executor.map, but keeps at most `window` items in flight so
+    unbounded inputs such as stdin are streamed rather than read up front"""
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def iter_groups(items, size):
+    """Lists of up to `size` consecutive items"""
+    group = []
+    for item in items:
+        group.append(item)
+        if len(group) >= size:
+            yield group
+            group = []
+    if group:
+        yield group
+
+
+class BatchTranslator:
+    def __init__(self, client, source_lang, target_lang, engine, max_chars=MAX_CHARS, pages=None):
+        self.client = client
+        self.source_lang = source_lang
+        self.target_lang = target_lang
+        self.engine = engine
+        self.max_chars = max_chars
+        self.pages = pages
+        self.ocr_texts = {}  # Image path -> text from a batched OCR run
+
+    def batch_ocr(self, paths):
+        """OCR all images up front with batched Tesseract runs"""
+        images = [path for path in paths if path.lower().endswith(IMAGE_EXTENSIONS)]
+        if not images:
+            return
+        try:
+            texts = get_ocr_engine().ocr_batch(images, ocr_lang(ocr_language_name(self.source_lang)))
+        except Exception as e:
+            # Fall back to OCR'ing each file on its own
+            logger.warning("Batch OCR failed, OCR'ing files one by one: %s", e)
+            return
+        self.ocr_texts.update(zip(images, texts))
+
+    def translate_file(self, path):
+        record = {'path': path, 'from': self.source_lang, 'to': self.target_lang, 'engine': self.engine}
+        ocr_language = ocr_language_name(self.source_lang)
+        try:
+            if path.lower().endswith('.pdf'):
+                # Stream pages straight into translation instead of reading the whole PDF first
+                pages = ((number, text) for number, _, text in iter_pdf_pages(path, ocr_language, self.pages))
+                if self.client.dedupe:
+                    items = split_boilerplate(pages, self.max_chars)
+                    dedup = SegmentDeduplicator()
+                else:
+                    items = chunk_pages(pages, self.max_chars)
+                    dedup = None
+                record['translation'], _ = self.client.translate_items(
+                    ((gap, chunk) for gap, chunk, _ in items), self.source_lang, self.target_lang,
+                    self.engine, dedup=dedup)
+                if dedup is not None:
+                    logger.info("%s: %s", path, dedup.report())
+            else:
+                text = self.ocr_texts.pop(path, None)
+                if text is None:
+                    text = extract_text_from_file(path, ocr_language)
+                record['translation'], _ = self.client.translate_text(
+                    text, self.source_lang, self.target_lang, self.engine, self.max_chars)
+        except Exception as e:
+            record['error'] = str(e)
+        return record
+
+    def parse_record(self, line):
+        """(record, text) for a JSON lines request, or (error record, None) when it is invalid"""
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict) or not isinstance(request.get('text'), str):
+                raise ValueError('expected an object with a "text" field')
+            for field in ('from', 'to', 'engine'):
+                if not isinstance(request.get(field, ''), str):
+                    raise ValueError(f'"{field}" must be a string')
+            source_lang = resolve_language(request.get('from', self.source_lang))
+            target_lang = resolve_target(request.get('to', self.target_lang))
+            engine = resolve_engine(request.get('engine', self.engine))
+        except (ValueError, argparse.ArgumentTypeError) as e:
+            return {'error': f"Invalid record: {str(e)}"}, None
+        record = {'from': source_lang, 'to': target_lang, 'engine': engine}
+        if 'id' in request:
+            record['id'] = request['id']
+        return record, request['text']
+
+    def _translate_into(self, record, text):
+        try:
+            record['translation'], _ = self.client.translate_text(
+                text, record['from'], record['to'], record['engine'], self.max_chars)
+        except Exception as e:
+            record['error'] = str(e)
+
+    def translate_record(self, line):
+        record, text = self.parse_record(line)
+        if text is not None:
+            self._translate_into(record, text)
+        return record
+
+    def translate_records(self, lines):
+        """Translate a group of JSON lines requests, packing short texts that share languages and engine"""
+        parsed = [self.parse_record(line) for line in lines]
+        groups = {}
+        for record, text in parsed:
+            if text is not None:
+                groups.setdefault((record['from'], record['to'], record['engine']), []).append((record, text))
+        for (source_lang, target_lang, engine), requests in groups.items():
+            try:
+                translations = self.client.translate_texts(
+                    [text for _, text in requests], source_lang, target_lang, engine, self.max_chars)
+            except Exception as e:
+                # Find the record that failed rather than fail its whole group
+                logger.info("Group of %d records failed, translating them one by one: %s", len(requests), e)
+                for record, text in requests:
+                    self._translate_into(record, text)
+                continue
+            for (record, _), (translation, _) in zip(requests, translations):
+                record['translation'] = translation
+        return [record for record, _ in parsed]
+
+
+def write_records(records, output_format, output_dir, stream):
+    """Write records as they arrive; returns the number of failed records"""
+    failures = 0
+    collected = []
+    for record in records:
+        if 'error' in record:
+            failures += 1
+            print(f"{record.get('path', record.get('id', '<stdin>'))}: {record['error']}", file=sys.stderr)
+        if output_dir and 'path' in record and 'translation' in record:
+            name = os.path.splitext(os.path.basename(record['path']))[0]
+            out_path = os.path.join(output_dir, f"{name}.{record['to']}.txt")
+            with open(out_path, 'w', encoding='utf-8') as file:
+                file.write(record['translation'] + '\n')
+            record['output'] = out_path
+        if output_format == 'json':
+            collected.append(record)
+        elif output_format == 'jsonl':
+            stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+            stream.flush()
+        elif 'translation' in record and not output_dir:
+            if 'path' in record:
+                stream.write(f"==> {record['path']} <==\n")
+            stream.write(record['translation'] + '\n')
+            stream.flush()
+    if output_format == 'json':
+        json.dump(collected, stream, ensure_ascii=False, indent=2)
+        stream.write('\n')
+    return failures
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='dotranslate',
+        description='Translate files, directories or JSON lines streams without the GUI.')
+    parser.add_argument('inputs', nargs='*',
+                        help='files or directories to translate (images, PDFs, .txt, .md)')
+    parser.add_argument('-s', '--source', type=resolve_language, default='en',
+                        help="source language name or code, or 'detect' to detect it "
+                             "from the text (default: English)")
+    parser.add_argument('-t', '--target', type=resolve_target, default='es',
+                        help='target language name or code (default: Spanish)')
+    parser.add_argument('-e', '--engine', type=resolve_engine, default='google',
+                        help='translation engine: ' + ', '.join(ENGINE_CODES))
+    parser.add_argument('--no-hedge', action='store_true',
+                        help="with --engine auto, never race a second engine against a slow one")
+    parser.add_argument('--no-dedup', action='store_true',
+                        help='send repeated headers, footers and segments every time they occur')
+    parser.add_argument('-j', '--concurrency', type=int, default=default_workers(),
+                        help='concurrent API requests (default: %(default)s)')
+    parser.add_argument('-f', '--format', choices=('text', 'json', 'jsonl'), default='text',
+                        help='output format (default: text)')
+    parser.add_argument('-o', '--output-dir',
+                        help='write one <name>.<lang>.txt file per input file into this directory')
+    parser.add_argument('--jsonl', action='store_true',
+                        help='read JSON lines requests from stdin and write JSON lines to stdout')
+    parser.add_argument('--max-chars', type=int, default=MAX_CHARS,
+                        help='maximum characters per text chunk (default: %(default)s)')
+    parser.add_argument('--batch-chars', type=int, default=default_batch_chars(),
+                        help='maximum characters of short chunks packed into one API request, '
+                             '0 to send every chunk on its own (default: %(default)s)')
+    parser.add_argument('--pages',
+                        help="PDF pages to translate, e.g. '1-5,8,20-' (default: all)")
+    parser.add_argument('--batch-ocr', action='store_true',
+                        help='OCR all input images with a few long-running Tesseract processes '
+                             'instead of one process per image')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='do not read or write the translation memory')
+    parser.add_argument('--api-url', default=default_base_url(),
+                        help='LibreNode API base URL (default: %(default)s)')
+    parser.add_argument('--rate-limit', type=float, default=default_rate_limit(),
+                        help='maximum API requests per second, 0 for no limit (default: %(default)s)')
+    parser.add_argument('--timeout', type=float, default=READ_TIMEOUT,
+                        help='seconds to wait for an API response before retrying (default: %(default)s)')
+    parser.add_argument('--log-level', choices=('DEBUG', 'INFO', 'WARNING', 'ERROR'), type=str.upper,
+                        help='log verbosity on stderr (default: DOTRANSLATE_LOG_LEVEL or WARNING)')
+    parser.add_argument('--metrics',
+                        help='export metrics to this file: Prometheus text if it ends in .prom, '
+                             'JSON lines otherwise (default: DOTRANSLATE_METRICS)')
+    parser.add_argument('--stats', action='store_true',
+                        help='print a timing and cache summary to stderr when done')
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not args.inputs and not args.jsonl:
+        parser.error('no inputs given (pass files/directories or use --jsonl)')
+    if args.concurrency < 1:
+        parser.error('--concurrency must be at least 1')
+    if args.batch_chars < 0:
+        parser.error('--batch-chars must not be negative')
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    configure_logging(args.log_level)
+    configure_metrics(args.metrics)
+
+    memory = None if args.no_cache else open_default_memory()
+    api = LibreNodeClient(args.api_url, pool_size=args.concurrency * 2,
+                          timeout=(CONNECT_TIMEOUT, args.timeout), rate_limit=args.rate_limit)
+    client = TranslationEngine(max_workers=args.concurrency, client=api, memory=memory,
+                               sizer=PayloadSizer(args.batch_chars))
+    if args.no_hedge:
+        client.router.hedge = False
+    if args.no_dedup:
+        client.dedupe = False
+    batch = BatchTranslator(client, args.source, args.target, args.engine, args.max_chars, args.pages)
+    # Documents are fanned out on their own pool; their chunks share the engine pool
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        try:
+            if args.jsonl:
+                lines = (line for line in sys.stdin if line.strip())
+                if args.batch_chars:
+                    groups = ordered_map(executor, batch.translate_records,
+                                         iter_groups(lines, RECORD_GROUP), args.concurrency)
+                    records = (record for group in groups for record in group)
+                else:
+                    records = ordered_map(executor, batch.translate_record, lines, args.concurrency * 2)
+                failures = write_records(records, 'jsonl', None, sys.stdout)
+            else:
+                paths = iter_input_files(args.inputs)
+                if args.batch_ocr:
+                    paths = list(paths)
+                    batch.batch_ocr(paths)
+                records = ordered_map(executor, batch.translate_file, paths, args.concurrency * 2)
+                failures = write_records(records, args.format, args.output_dir, sys.stdout)
+        finally:
+            client.close()
+            get_ocr_engine().close()
+            if args.stats:
+                print(METRICS.summary(), file=sys.stderr)
+            METRICS.close()
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
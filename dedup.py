@@ -0,0 +1,180 @@
+import re
+import unicodedata
+
+from metrics import incr, timer
+from segmenter import MAX_CHARS, chunk_spans
+
+MAX_BOILERPLATE_CHARS = 300  # Longer lines are body text even when they repeat
+
+# Nothing but digits, punctuation, symbols and whitespace: page numbers, totals, rules
+_untranslatable_re = re.compile(r'[\W\d_]*')
+_line_re = re.compile(r'[^\n]+')
+_whitespace_re = re.compile(r'\s+')
+
+
+def needs_translation(text):
+    """False for segments that come back from the API unchanged, e.g. '12', '- 3 -' or '1,250.00'"""
+    return not _untranslatable_re.fullmatch(text)
+
+
+def segment_key(text):
+    """Identity of a segment for deduplication: NFC, whitespace collapsed"""
+    return _whitespace_re.sub(' ', unicodedata.normalize('NFC', text)).strip()
+
+
+def _line_kind(key, seen):
+    if not needs_translation(key):
+        return 'untranslatable'
+    if key in seen and len(key) <= MAX_BOILERPLATE_CHARS:
+        return 'repeated'
+    return None
+
+
+def _page_blocks(text, seen):
+    """(kind, start, end) of a page's boilerplate runs at its top and bottom, and of the body between"""
+    lines = []
+    for match in _line_re.finditer(text):
+        key = segment_key(match.group())
+        if key:
+            lines.append((match.start(), match.end(), _line_kind(key, seen)))
+    top = 0
+    while top < len(lines) and lines[top][2]:
+        top += 1
+    bottom = len(lines)
+    while bottom > top and lines[bottom - 1][2]:
+        bottom -= 1
+    blocks = []
+    for idx, (start, end, kind) in enumerate(lines):
+        # Body lines form one block; boilerplate lines group with neighbours of the same kind
+        kind = 'body' if top <= idx < bottom else kind
+        if blocks and blocks[-1][0] == kind:
+            blocks[-1][2] = end
+        else:
+            blocks.append([kind, start, end])
+    return blocks
+
+
+def split_boilerplate(pages, max_chars=MAX_CHARS, separator='\n'):
+    """Drop-in for segmenter.chunk_pages that keeps headers, footers and page numbers apart.
+
+    Lines at the top or bottom of a page that already appeared on an earlier
+    page, or that need no translation, become segments of their own instead
+    of being packed with body text, so every copy is the same chunk and
+    SegmentDeduplicator sends it once. A page is only split when that takes
+    no more requests than sending it whole. Joining the items reproduces the
+    pages.
+    """
+    seen = set()  # Lines of earlier pages
+    sent = set()  # Boilerplate blocks already split out, which cost nothing the next time
+    first = True
+    for page, text in pages:
+        with timer('chunking_seconds'):
+            whole = chunk_spans(text, max_chars)
+            chunks = whole
+            # Try splitting out every repeated line, then only the lines that need no translation
+            for candidates in (seen, ()):
+                blocks = _page_blocks(text, candidates)
+                if len(blocks) < 2:
+                    continue
+                split = []
+                cost = 0
+                for kind, start, end in blocks:
+                    block_chunks = [chunk._replace(start=chunk.start + start, end=chunk.end + start)
+                                    for chunk in chunk_spans(text[start:end], max_chars)]
+                    split.extend(block_chunks)
+                    if kind == 'body':
+                        cost += len(block_chunks)
+                    elif kind == 'repeated' and segment_key(text[start:end]) not in sent:
+                        cost += 1
+                if cost <= len(whole):
+                    chunks = split
+                    incr('boilerplate_blocks', sum(1 for kind, _, _ in blocks if kind != 'body'))
+                    sent.update(segment_key(text[start:end]) for kind, start, end in blocks
+                                if kind == 'repeated')
+                    break
+        previous_end = None
+        for chunk in chunks:
+            if previous_end is not None:
+                gap = text[previous_end:chunk.start]
+            else:
+                gap = '' if first else separator
+            first = False
+            previous_end = chunk.end
+            yield gap, chunk.text, page
+        for match in _line_re.finditer(text):
+            key = segment_key(match.group())
+            if key and len(key) <= MAX_BOILERPLATE_CHARS:
+                seen.add(key)
+
+
+class SegmentDeduplicator:
+    """Bookkeeping for one job: which chunks repeat an earlier one or need no translation.
+
+    Only the first copy of a segment is sent; its result is handed to every
+    later copy, and segments without letters come back as they are. Results
+    of an earlier run passed as `previous` ({segment_key: result}) are reused
+    as well, even with `dedupe` off.
+    """
+
+    def __init__(self, previous=None, dedupe=True):
+        self.dedupe = dedupe
+        self._previous = previous or {}
+        self._first = {}  # Segment key -> index of its first occurrence
+        self._results = {}  # First index -> (text, word_choices) once translated
+        self._waiting = {}  # First index -> indexes of copies still waiting for it
+        self._ready = []
+        self.segments = 0
+        self.duplicates = 0
+        self.untranslatable = 0
+        self.reused = 0
+
+    @property
+    def saved(self):
+        """Requests that did not have to be sent"""
+        return self.duplicates + self.untranslatable + self.reused
+
+    def _answer(self, idx, result, reason):
+        incr('dedup_saved_requests', reason=reason)
+        self._ready.append((idx, result))
+        return False
+
+    def add(self, idx, chunk):
+        """True when chunk has to be translated; otherwise its result comes out of ready()"""
+        self.segments += 1
+        if self.dedupe and not needs_translation(chunk):
+            self.untranslatable += 1
+            return self._answer(idx, (chunk, None), 'untranslatable')
+        key = segment_key(chunk)
+        if key in self._previous:
+            self.reused += 1
+            return self._answer(idx, self._previous[key], 'unchanged')
+        if not self.dedupe:
+            return True
+        first = self._first.setdefault(key, idx)
+        if first == idx:
+            return True
+        self.duplicates += 1
+        if first in self._results:
+            return self._answer(idx, self._results[first], 'duplicate')
+        incr('dedup_saved_requests', reason='duplicate')
+        self._waiting.setdefault(first, []).append(idx)
+        return False
+
+    def resolved(self, idx, result):
+        """Record the translation of a sent chunk, releasing its copies"""
+        if self.dedupe:
+            self._results[idx] = result
+        for copy in self._waiting.pop(idx, ()):
+            self._ready.append((copy, result))
+
+    def ready(self):
+        """(idx, result) for chunks answered without a request since the last call"""
+        ready, self._ready = self._ready, []
+        return ready
+
+    def report(self):
+        reasons = [f"{count} {reason}" for count, reason in ((self.reused, 'unchanged'),
+                                                             (self.duplicates, 'repeated'),
+                                                             (self.untranslatable, 'without text')) if count]
+        details = f" ({', '.join(reasons)})" if reasons else ''
+        return f"{self.saved} of {self.segments} segments needed no request{details}"
@@ -0,0 +1,87 @@
+import threading
+import time
+from collections import deque
+
+ENGINES = ('google', 'duckduckgo', 'yandex', 'deepl')
+
+WINDOW = 50  # Latency samples kept per engine
+MIN_SAMPLES = 5  # Below this the hedge delay falls back to DEFAULT_HEDGE_DELAY
+DEFAULT_LATENCY = 1.0  # Assumed latency of an engine that has not been tried yet
+DEFAULT_HEDGE_DELAY = 1.5
+MIN_HEDGE_DELAY = 0.3
+FAILURE_DECAY = 0.8  # Weight of history in the exponentially decayed failure rate
+UNHEALTHY_FAILURE_RATE = 0.5
+COOLDOWN = 30.0  # Seconds an unhealthy engine is avoided after its last failure
+
+
+class EngineStats:
+    def __init__(self):
+        self.latencies = deque(maxlen=WINDOW)
+        self.failure_rate = 0.0
+        self.last_failure = 0.0
+        self.requests = 0
+
+    def quantile(self, q):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class EngineRouter:
+    """Tracks per-engine latency and failures to pick and hedge engines in Auto mode"""
+
+    def __init__(self, engines=ENGINES, hedge=True, hedge_quantile=0.95):
+        self.engines = tuple(engines)
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self._stats = {engine: EngineStats() for engine in self.engines}
+        self._lock = threading.Lock()
+
+    def record(self, engine, latency, ok):
+        with self._lock:
+            stats = self._stats.get(engine)
+            if stats is None:
+                return
+            stats.requests += 1
+            stats.failure_rate = stats.failure_rate * FAILURE_DECAY + (0.0 if ok else 1.0 - FAILURE_DECAY)
+            if ok:
+                stats.latencies.append(latency)
+            else:
+                stats.last_failure = time.monotonic()
+
+    def _score(self, engine, now):
+        stats = self._stats[engine]
+        median = stats.quantile(0.5)
+        latency = DEFAULT_LATENCY if median is None else median
+        unhealthy = (stats.failure_rate >= UNHEALTHY_FAILURE_RATE
+                     and now - stats.last_failure < COOLDOWN)
+        # Unhealthy engines sort last; failures otherwise make an engine look slower
+        return (unhealthy, latency * (1.0 + 4.0 * stats.failure_rate))
+
+    def ranked(self):
+        """Engines from most to least preferred"""
+        now = time.monotonic()
+        with self._lock:
+            return sorted(self.engines, key=lambda engine: self._score(engine, now))
+
+    def hedge_delay(self, engine):
+        """Wait this long for `engine` before firing a second engine at the same chunk"""
+        with self._lock:
+            stats = self._stats[engine]
+            if len(stats.latencies) < MIN_SAMPLES:
+                return DEFAULT_HEDGE_DELAY
+            return max(MIN_HEDGE_DELAY, stats.quantile(self.hedge_quantile))
+
+    def snapshot(self):
+        """Per-engine p50/p95 latency, failure rate and request count"""
+        with self._lock:
+            return {
+                engine: {
+                    'p50': stats.quantile(0.5),
+                    'p95': stats.quantile(0.95),
+                    'failure_rate': round(stats.failure_rate, 3),
+                    'requests': stats.requests,
+                }
+                for engine, stats in self._stats.items()
+            }
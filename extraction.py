@@ -0,0 +1,34 @@
+import os
+
+from metrics import timer
+from ocr import IMAGE_EXTENSIONS, extract_text_from_image
+from pdf_text import extract_text_from_pdf
+
+TEXT_EXTENSIONS = ('.txt', '.md')
+SUPPORTED_EXTENSIONS = IMAGE_EXTENSIONS + ('.pdf',) + TEXT_EXTENSIONS
+
+
+def is_supported(path):
+    return path.lower().endswith(SUPPORTED_EXTENSIONS)
+
+
+def extract_text_from_file(path, source_lang='English'):
+    """Extract text from an image, PDF or plain text file"""
+    lower = path.lower()
+    if lower.endswith(IMAGE_EXTENSIONS):
+        with timer('extraction_seconds', kind='image'):
+            return extract_text_from_image(path, source_lang)
+    if lower.endswith('.pdf'):
+        with timer('extraction_seconds', kind='pdf'):
+            return extract_text_from_pdf(path, source_lang)
+    if lower.endswith(TEXT_EXTENSIONS):
+        with open(path, encoding='utf-8') as file:
+            return file.read()
+    raise ValueError(f"Unsupported file format: {os.path.basename(path)}")
+
+
+def warm_up():
+    """Import the OCR and PDF libraries ahead of the first file being opened"""
+    import pytesseract  # noqa: F401
+    import PIL.Image  # noqa: F401
+    import PyPDF2  # noqa: F401
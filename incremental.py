@@ -0,0 +1,100 @@
+import threading
+
+from dedup import SegmentDeduplicator, segment_key
+from metrics import timer
+from segmenter import MAX_CHARS, Chunk, chunk_spans, iter_sentences
+from translation_engine import is_failure
+
+LIVE_DELAY = 0.8  # Seconds without typing before live mode re-translates
+
+
+def _spans(text, start, end, max_chars):
+    return [chunk._replace(start=chunk.start + start, end=chunk.end + start)
+            for chunk in chunk_spans(text[start:end], max_chars)]
+
+
+def _sentence_edges(text):
+    """Offsets where a sentence of text starts and where its content ends"""
+    starts = set()
+    ends = set()
+    for start, end in iter_sentences(text):
+        sentence = text[start:end]
+        starts.add(start + len(sentence) - len(sentence.lstrip()))
+        ends.add(start + len(sentence.rstrip()))
+    return starts, ends
+
+
+def chunk_like(text, previous, max_chars=MAX_CHARS):
+    """Chunk text, reusing the previous chunks wherever they still occur verbatim.
+
+    Only the text between reused chunks is segmented afresh, so an edit
+    changes the chunks it touches instead of shifting every later boundary.
+    A previous chunk is only reused where it still spans whole sentences:
+    text typed after an unfinished sentence joins that sentence, which is
+    then segmented again rather than sent in pieces.
+    """
+    starts, ends = _sentence_edges(text)
+    chunks = []
+    pos = 0
+    for old in previous:
+        idx = text.find(old, pos)
+        while idx != -1 and not (idx in starts and idx + len(old) in ends):
+            idx = text.find(old, idx + 1)
+        if idx == -1:
+            continue  # Edited or deleted
+        chunks.extend(_spans(text, pos, idx, max_chars))
+        chunks.append(Chunk(old, idx, idx + len(old)))
+        pos = idx + len(old)
+    chunks.extend(_spans(text, pos, len(text), max_chars))
+    return chunks
+
+
+class TranslationSession:
+    """Segmentation and results of the last translation, so an edited text only re-sends what changed"""
+
+    def __init__(self, max_chars=MAX_CHARS):
+        self.max_chars = max_chars
+        self._lock = threading.Lock()
+        self._params = None
+        self._chunks = []  # Chunk texts of the last run, in order
+        self._results = {}  # Segment key -> (text, word_choices) for the chunks of the last run
+
+    def items(self, text):
+        """(separator, chunk) pairs for text, keeping the last run's chunk boundaries where they still apply"""
+        with self._lock:
+            previous = self._chunks
+        with timer('chunking_seconds'):
+            chunks = chunk_like(text, previous, self.max_chars)
+        items = []
+        previous_end = None
+        for chunk in chunks:
+            items.append(('' if previous_end is None else text[previous_end:chunk.start], chunk.text))
+            previous_end = chunk.end
+        return items
+
+    def deduplicator(self, params, dedupe=True):
+        """SegmentDeduplicator answering unchanged segments from the last run with the same params"""
+        with self._lock:
+            previous = dict(self._results) if params == self._params else None
+        return SegmentDeduplicator(previous=previous, dedupe=dedupe)
+
+    def record(self, params, chunks, results):
+        """Remember a run's chunk texts and its {idx: result}; a cancelled run keeps what finished"""
+        with self._lock:
+            old = self._results if params == self._params else {}
+            remembered = {}
+            for idx, chunk in enumerate(chunks):
+                key = segment_key(chunk)
+                result = results.get(idx) or old.get(key)
+                # Failure markers are retried next time, not reused
+                if result is not None and not is_failure(result[0]):
+                    remembered[key] = result
+            self._params = params
+            self._chunks = list(chunks)
+            self._results = remembered
+
+    def clear(self):
+        with self._lock:
+            self._params = None
+            self._chunks = []
+            self._results = {}
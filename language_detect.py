@@ -0,0 +1,109 @@
+import re
+from collections import Counter
+
+SAMPLE_CHARS = 4000  # Characters of a text that are looked at
+MIN_WORDS = 3  # Fewer Latin words than this are too little to go on
+MARKER_WEIGHT = 0.5  # Weight of a diacritic relative to a stopword
+
+_scripts = (
+    ('han', re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]')),
+    ('cyrillic', re.compile(r'[\u0400-\u04ff]')),
+    ('latin', re.compile(r'[A-Za-z\u00c0-\u024f]')),
+)
+_word_re = re.compile(r'[^\W\d_]+')
+
+STOPWORDS = {
+    'english': frozenset(
+        'the and of to is in that it for was with as on are be this by have from or at not which but '
+        'you they we his her will would has been an'.split()),
+    'spanish': frozenset(
+        'el la los las de que y en un una es por con para no se del al lo como más pero sus le ya o '
+        'este sí porque esta entre cuando muy sin sobre también hay fue son está'.split()),
+    'french': frozenset(
+        'le la les de des du et est un une que qui en dans pour pas au aux sur ne se ce il elle nous '
+        'vous ils avec plus par sont mais ou été être cette très'.split()),
+    'german': frozenset(
+        'der die das und ist nicht ein eine zu den von mit sich des auf für im dem auch es an als sie '
+        'wir ich er wie bei oder noch werden wird sind hat nach aus über kann'.split()),
+    'italian': frozenset(
+        'il lo la gli le di che e è un una per non in con del della dei delle si sono al alla da come '
+        'più ma anche questo questa nel nella ha mi ci essere molto'.split()),
+}
+
+MARKERS = {
+    'spanish': frozenset('ñ¿¡áíóú'),
+    'french': frozenset('çèêëîïôûœæ'),
+    'german': frozenset('äöüß'),
+    'italian': frozenset('àìòù'),
+}
+
+# Stopwords of several languages ('in', 'la', 'de') say nothing about which one a text is in
+SHARED_STOPWORDS = frozenset(word for word, count in Counter(
+    word for stopwords in STOPWORDS.values() for word in stopwords).items() if count > 1)
+_distinctive = {language: stopwords - SHARED_STOPWORDS for language, stopwords in STOPWORDS.items()}
+
+# Characters written differently in Simplified and Traditional Chinese, pair by pair
+_SIMPLIFIED = '这们说国个来时为会对学发经过见长门东车书语话还进间问题开关与么边实现点动机写无没应该认样让给电种业产从头气体后'
+_TRADITIONAL = '這們說國個來時為會對學發經過見長門東車書語話還進間問題開關與麼邊實現點動機寫無沒應該認樣讓給電種業產從頭氣體後'
+SIMPLIFIED_ONLY = frozenset(s for s, t in zip(_SIMPLIFIED, _TRADITIONAL) if s != t)
+TRADITIONAL_ONLY = frozenset(t for s, t in zip(_SIMPLIFIED, _TRADITIONAL) if s != t)
+
+
+def detect_script(text):
+    """(script, share of letters) for the dominant script of text: 'latin', 'cyrillic', 'han' or None"""
+    sample = text[:SAMPLE_CHARS]
+    counts = {script: len(pattern.findall(sample)) for script, pattern in _scripts}
+    total = sum(counts.values())
+    if not total:
+        return None, 0.0
+    script = max(counts, key=counts.get)
+    return script, counts[script] / total
+
+
+def _latin_language(sample):
+    words = _word_re.findall(sample.lower())
+    if len(words) < MIN_WORDS:
+        return None, 0.0
+    scores = Counter()
+    for word in words:
+        for language, stopwords in _distinctive.items():
+            if word in stopwords:
+                scores[language] += 1
+    for char in sample.lower():
+        for language, markers in MARKERS.items():
+            if char in markers:
+                scores[language] += MARKER_WEIGHT
+    ranked = scores.most_common(2)
+    if not ranked:
+        return None, 0.0
+    best = ranked[0][1]
+    runner_up = ranked[1][1] if len(ranked) > 1 else 0
+    return ranked[0][0], (best - runner_up) / best
+
+
+def detect_language(text):
+    """(language name as in LANGUAGE_CODES, confidence 0..1), or (None, 0.0) when unsure.
+
+    The script tells Latin, Cyrillic and Han text apart; Latin languages are
+    then scored by their most frequent short words and their diacritics.
+    """
+    sample = text[:SAMPLE_CHARS]
+    script, share = detect_script(sample)
+    if script == 'han':
+        return 'chinese', share
+    if script == 'cyrillic':
+        return 'russian', share
+    if script == 'latin':
+        language, confidence = _latin_language(sample)
+        return language, confidence * share
+    return None, 0.0
+
+
+def chinese_variant(text):
+    """'simplified', 'traditional', or None when text has no telling characters"""
+    sample = text[:SAMPLE_CHARS]
+    simplified = sum(1 for char in sample if char in SIMPLIFIED_ONLY)
+    traditional = sum(1 for char in sample if char in TRADITIONAL_ONLY)
+    if simplified == traditional:
+        return None
+    return 'simplified' if simplified > traditional else 'traditional'
@@ -0,0 +1,209 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+LOG_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+DEFAULT_LOG_LEVEL = 'WARNING'
+SAMPLES = 1000  # Recent observations kept per timer for quantiles
+PROMETHEUS_PREFIX = 'dotranslate_'
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Timer:
+    """Count, sum, extremes and a window of recent samples for one labelled series"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.samples = deque(maxlen=SAMPLES)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        self.samples.append(value)
+
+    def quantile(self, q):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _prometheus_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_labels(key):
+    return '{' + ', '.join(f"{name}={value}" for name, value in key) + '}' if key else ''
+
+
+class Metrics:
+    """Thread-safe counters and timers, exportable as JSON lines or Prometheus text.
+
+    Every observation is also appended to the JSON lines sink when one is open,
+    so a session can be replayed and analysed afterwards.
+    """
+
+    def __init__(self):
+        self._counters = {}  # (name, label key) -> value
+        self._timers = {}  # (name, label key) -> Timer
+        self._lock = threading.Lock()
+        self._sink = None
+        self.prometheus_path = None
+
+    def _emit(self, kind, name, value, labels):
+        # Called with the lock held so lines from different threads never interleave
+        if self._sink is not None:
+            self._sink.write(json.dumps({'ts': round(time.time(), 6), 'type': kind, 'name': name,
+                                         'value': value, 'labels': labels}, ensure_ascii=False) + '\n')
+
+    def incr(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+            self._emit('counter', name, value, labels)
+
+    def observe(self, name, value, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            timer = self._timers.get(key)
+            if timer is None:
+                timer = self._timers[key] = Timer()
+            timer.add(value)
+            self._emit('timer', name, value, labels)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Observe the wall time of the with-block in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def open_jsonl(self, path):
+        with self._lock:
+            if self._sink is not None:
+                self._sink.close()
+            self._sink = open(path, 'a', encoding='utf-8')
+
+    def snapshot(self):
+        """Counters and timer summaries as plain data"""
+        with self._lock:
+            counters = [{'name': name, 'labels': dict(key), 'value': value}
+                        for (name, key), value in sorted(self._counters.items())]
+            timers = [{'name': name, 'labels': dict(key), 'count': timer.count, 'sum': timer.total,
+                       'min': timer.min, 'max': timer.max,
+                       **{f"p{int(q * 100)}": timer.quantile(q) for q in QUANTILES}}
+                      for (name, key), timer in sorted(self._timers.items())]
+        return {'counters': counters, 'timers': timers}
+
+    def prometheus(self):
+        """Prometheus text exposition format: counters as *_total, timers as summaries"""
+        lines = []
+        with self._lock:
+            for name in sorted(set(name for name, _ in self._counters)):
+                metric = f"{PROMETHEUS_PREFIX}{name}_total"
+                lines.append(f"# TYPE {metric} counter")
+                for (counter_name, key), value in sorted(self._counters.items()):
+                    if counter_name == name:
+                        lines.append(f"{metric}{_prometheus_labels(key)} {value}")
+            for name in sorted(set(name for name, _ in self._timers)):
+                metric = f"{PROMETHEUS_PREFIX}{name}"
+                lines.append(f"# TYPE {metric} summary")
+                for (timer_name, key), timer in sorted(self._timers.items()):
+                    if timer_name != name:
+                        continue
+                    for q in QUANTILES:
+                        labels = _prometheus_labels(key, [('quantile', q)])
+                        lines.append(f"{metric}{labels} {timer.quantile(q):.6f}")
+                    lines.append(f"{metric}_sum{_prometheus_labels(key)} {timer.total:.6f}")
+                    lines.append(f"{metric}_count{_prometheus_labels(key)} {timer.count}")
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        # Write then rename so a node_exporter textfile collector never reads a partial file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            file.write(self.prometheus())
+        os.replace(tmp_path, path)
+
+    def summary(self):
+        """Human readable report of where time went this session"""
+        snapshot = self.snapshot()
+        if not snapshot['counters'] and not snapshot['timers']:
+            return 'No metrics recorded yet.'
+        lines = ['Timings:']
+        for timer in snapshot['timers']:
+            labels = _format_labels(_label_key(timer['labels']))
+            lines.append(f"  {timer['name']}{labels}: {timer['count']} x, "
+                         f"total {timer['sum']:.3f} s, p50 {timer['p50'] * 1000:.1f} ms, "
+                         f"p95 {timer['p95'] * 1000:.1f} ms, max {timer['max'] * 1000:.1f} ms")
+        lines.append('Counters:')
+        for counter in snapshot['counters']:
+            lines.append(f"  {counter['name']}{_format_labels(_label_key(counter['labels']))}: {counter['value']}")
+        return '\n'.join(lines)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._timers.clear()
+
+    def close(self):
+        """Flush the JSON lines sink and write the Prometheus file, if configured"""
+        if self.prometheus_path:
+            try:
+                self.write_prometheus(self.prometheus_path)
+            except OSError as e:
+                logger.warning("Could not write metrics to %s: %s", self.prometheus_path, e)
+        with self._lock:
+            if self._sink is not None:
+                self._sink.close()
+                self._sink = None
+
+
+METRICS = Metrics()
+
+incr = METRICS.incr
+observe = METRICS.observe
+timer = METRICS.timer
+
+
+def configure_logging(level=None):
+    """Route log records to stderr at `level`, falling back to DOTRANSLATE_LOG_LEVEL"""
+    level = (level or os.environ.get('DOTRANSLATE_LOG_LEVEL') or DEFAULT_LOG_LEVEL).upper()
+    logging.basicConfig(level=getattr(logging, level, logging.WARNING), format=LOG_FORMAT)
+
+
+def configure_metrics(path=None):
+    """Export metrics to `path` or DOTRANSLATE_METRICS: *.prom is written as a
+    Prometheus textfile on close, anything else receives JSON lines as they happen"""
+    path = path or os.environ.get('DOTRANSLATE_METRICS')
+    if not path:
+        return
+    try:
+        if path.endswith('.prom'):
+            METRICS.prometheus_path = path
+        else:
+            METRICS.open_jsonl(path)
+    except OSError as e:
+        logger.warning("Metrics export disabled: %s", e)
@@ -0,0 +1,497 @@
+import hashlib
+import io
+import logging
+import os
+import re
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+
+from language_detect import chinese_variant, detect_language
+from metrics import incr, observe
+from ocr_preprocess import PREPROCESS_VERSION, preprocess
+from translation_memory import cache_dir
+
+# Tesseract language packs for each source language
+OCR_LANG_CODES = {
+    'English': 'eng',
+    'Chinese': 'chi_sim+chi_tra',  # Use both simplified and traditional Chinese
+    'Russian': 'rus',
+    'German': 'deu',
+    'French': 'fra',
+    'Spanish': 'spa',
+    'Italian': 'ita',
+    'Detect': 'auto'
+}
+
+AUTO_LANG = 'auto'  # Detect the script and language of each image before OCR
+PACK_SCRIPTS = {'eng': 'Latin', 'spa': 'Latin', 'fra': 'Latin', 'deu': 'Latin', 'ita': 'Latin',
+                'rus': 'Cyrillic', 'chi_sim': 'Han', 'chi_tra': 'Han'}
+# Packs probed for a script; both Chinese packs, since chi_sim alone reads traditional text as simplified
+SCRIPT_PACKS = {'Latin': 'eng', 'Cyrillic': 'rus', 'Han': 'chi_sim+chi_tra'}
+CHINESE_PACKS = {'simplified': 'chi_sim', 'traditional': 'chi_tra'}  # Told apart from the probe's text
+PROBE_SIZE = 1200  # Longest side, in pixels, of the image used to pick language packs
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+logger = logging.getLogger(__name__)
+
+BATCH_MIN_IMAGES = 8  # Images per Tesseract process before a batch is split across cores
+TILE_HEIGHT = 1600  # Images at least twice this tall are OCR'd as horizontal strips
+CUT_SEARCH = 0.15  # Fraction of a tile searched for a blank row to cut at
+
+
+def ocr_lang(source_lang):
+    return OCR_LANG_CODES.get(source_lang, 'eng')
+
+
+@lru_cache(maxsize=1)
+def installed_packs():
+    """Tesseract language packs on this machine; empty when they cannot be listed"""
+    import pytesseract
+    try:
+        return frozenset(pytesseract.get_languages(config=''))
+    except Exception as e:
+        logger.debug("Could not list Tesseract languages: %s", e)
+        return frozenset()
+
+
+def _installed(pack):
+    installed = installed_packs()
+    return not installed or all(part in installed for part in pack.split('+'))
+
+
+def _probe_image(image):
+    """Small grayscale copy of an image, enough for OSD and a rough OCR pass"""
+    probe = image.convert('L')
+    scale = PROBE_SIZE / max(probe.size)
+    if scale < 1:
+        probe = probe.resize((max(1, int(probe.width * scale)), max(1, int(probe.height * scale))))
+    return probe
+
+
+def _osd_script(probe):
+    import pytesseract
+    if installed_packs() and 'osd' not in installed_packs():
+        return None
+    try:
+        osd = pytesseract.image_to_osd(probe, config='--psm 0')
+    except pytesseract.TesseractError:
+        return None  # Too little text to tell
+    match = re.search(r'Script: (\w+)', osd)
+    return match.group(1) if match else None
+
+
+def _pack_for_text(text, fallback):
+    language, _ = detect_language(text)
+    if language == 'chinese':
+        # Both packs, as without probing, when the text has too few telling characters
+        pack = CHINESE_PACKS.get(chinese_variant(text), OCR_LANG_CODES['Chinese'])
+    elif language:
+        pack = OCR_LANG_CODES[language.title()]
+    else:
+        return fallback
+    return pack if _installed(pack) else fallback
+
+
+def choose_ocr_lang(image, lang):
+    """Narrow lang to the one pack an image needs, from a low resolution probe.
+
+    'auto' is resolved from Tesseract's script detection (OSD) and a rough
+    OCR pass with the packs of the script. Chinese skips OSD and tells
+    simplified from traditional by the characters a pass with both packs
+    reads, keeping both when they do not tell. A single pack is kept
+    unless OSD finds another script, e.g. Cyrillic text with 'eng'.
+    Call it once per document, see LanguageChoice.
+    """
+    import pytesseract
+    probe = _probe_image(image)
+    script = 'Han' if lang == OCR_LANG_CODES['Chinese'] else _osd_script(probe)
+    if lang != AUTO_LANG and '+' not in lang:
+        if script is None or PACK_SCRIPTS.get(lang, script) == script:
+            return lang
+        logger.info("Image is in %s script, which '%s' does not read; detecting its language", script, lang)
+    fallback = 'eng' if lang == AUTO_LANG else lang
+    if script == 'Cyrillic' and _installed('rus'):
+        return 'rus'  # The only Cyrillic language supported
+    probe_lang = SCRIPT_PACKS.get(script) or (lang if lang != AUTO_LANG else '+'.join(SCRIPT_PACKS.values()))
+    probe_lang = '+'.join(pack for pack in probe_lang.split('+') if _installed(pack))
+    if not probe_lang:
+        return fallback
+    try:
+        text = pytesseract.image_to_string(probe, config=f'-l {probe_lang} --psm 3')
+    except pytesseract.TesseractError as e:
+        logger.warning("OCR language probe failed: %s", e)
+        return fallback
+    chosen = _pack_for_text(text, fallback)
+    logger.debug("OCR language: %s for '%s' (script %s)", chosen, lang, script)
+    return chosen
+
+
+def _limit_tesseract_threads():
+    # Tesseract subprocesses inherit this; one OpenMP thread each keeps pool workers from oversubscribing the CPU
+    os.environ['OMP_THREAD_LIMIT'] = '1'
+
+
+class LanguageChoice:
+    """The language pack of one document or batch, picked from the first image that needs OCR"""
+
+    def __init__(self, lang):
+        self.lang = lang  # As requested; this is what keys the OCR cache
+        self._chosen = None
+        self._lock = threading.Lock()
+
+    def resolve(self, source):
+        """Pack to OCR with, probing `source` (a PIL image or encoded bytes) if none was chosen yet"""
+        with self._lock:
+            if self._chosen is None:
+                from PIL import Image
+                start = time.perf_counter()
+                image = Image.open(io.BytesIO(source)) if isinstance(source, bytes) else source
+                self._chosen = choose_ocr_lang(image, self.lang)
+                observe('ocr_stage_seconds', time.perf_counter() - start, stage='language_probe')
+            return self._chosen
+
+
+def _ocr_job(job):
+    """OCR one page or tile, returning (text, stage timings).
+
+    Runs in a pool thread; Tesseract itself is a subprocess, so pages run in parallel.
+    """
+    # Pillow and pytesseract are imported on first use to keep startup fast
+    import pytesseract
+    from PIL import Image
+    source, lang, psm = job
+    image = Image.open(io.BytesIO(source)) if isinstance(source, bytes) else source
+    image, timings = preprocess(image)
+    start = time.perf_counter()
+    text = pytesseract.image_to_string(image, config=f'-l {lang} --psm {psm}').strip()
+    timings['tesseract'] = time.perf_counter() - start
+    return text, timings
+
+
+def _probe_file(image_path, lang):
+    """Pack for one image file of a batch, from its own low resolution probe"""
+    from PIL import Image
+    with Image.open(image_path) as image:
+        return LanguageChoice(lang).resolve(image)
+
+
+def _preprocess_to_file(job):
+    """Preprocess an image file and save it as PNG for a batched Tesseract run"""
+    from PIL import Image
+    image_path, out_path = job
+    with Image.open(image_path) as image:
+        processed, timings = preprocess(image)
+    processed.save(out_path, format='PNG')
+    return timings
+
+
+def run_tesseract_batch(image_paths, lang, psm=3):
+    """OCR many images with a single Tesseract process, returning one text per image.
+
+    Tesseract reads the image list from a file and loads its traineddata once;
+    pages are separated by form feeds in its output.
+    """
+    import pytesseract
+    if not image_paths:
+        return []
+    with tempfile.TemporaryDirectory(prefix='dotranslate-ocr-') as tmp_dir:
+        list_path = os.path.join(tmp_dir, 'images.txt')
+        with open(list_path, 'w', encoding='utf-8') as file:
+            file.write('\n'.join(image_paths) + '\n')
+        env = dict(os.environ, OMP_THREAD_LIMIT='1')
+        process = subprocess.run(
+            [pytesseract.pytesseract.tesseract_cmd, list_path, 'stdout',
+             '-l', lang, '--psm', str(psm), '-c', 'page_separator=\f'],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+    if process.returncode != 0:
+        raise Exception(f"Tesseract failed: {process.stderr.decode('utf-8', 'replace').strip()}")
+    pages = process.stdout.decode('utf-8', 'replace').split('\f')
+    if pages and not pages[-1].strip():
+        pages.pop()  # Text after the last separator
+    if len(pages) != len(image_paths):
+        raise Exception(f"Tesseract returned {len(pages)} pages for {len(image_paths)} images")
+    return [page.strip() for page in pages]
+
+
+def _report_timings(timings):
+    # Stage timings come back with each job's result, so they are recorded where it is collected
+    for stage, seconds in timings.items():
+        observe('ocr_stage_seconds', seconds, stage=stage)
+    logger.debug('OCR timings: %s', ', '.join(f"{stage} {seconds * 1000:.1f} ms" for stage, seconds in timings.items()))
+
+
+class OcrCache:
+    """On-disk OCR results keyed by image content hash plus language and psm"""
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(cache_dir(), 'ocr')
+        os.makedirs(self.path, exist_ok=True)
+
+    @staticmethod
+    def key(data, lang, psm):
+        digest = hashlib.sha256(data)
+        digest.update(f"|{lang}|{psm}|{PREPROCESS_VERSION}".encode('utf-8'))
+        return digest.hexdigest()
+
+    def _file(self, key):
+        return os.path.join(self.path, key[:2], key + '.txt')
+
+    def get(self, key):
+        try:
+            with open(self._file(key), encoding='utf-8') as file:
+                return file.read()
+        except OSError:
+            return None
+
+    def put(self, key, text):
+        path = self._file(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so a crash never leaves a truncated entry behind
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            file.write(text)
+        os.replace(tmp_path, path)
+
+    def clear(self):
+        import shutil
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.makedirs(self.path, exist_ok=True)
+
+
+def open_default_ocr_cache():
+    """Open the OCR cache unless DOTRANSLATE_OCR_CACHE=off"""
+    setting = os.environ.get('DOTRANSLATE_OCR_CACHE', '')
+    if setting.lower() in ('0', 'off', 'false', 'no'):
+        return None
+    try:
+        return OcrCache(path=setting or None)
+    except OSError as e:
+        logger.warning("OCR cache disabled: %s", e)
+        return None
+
+
+def _best_cut(gray, nominal, search):
+    """Row near `nominal` with the brightest average, i.e. most likely between lines of text"""
+    from PIL import Image
+    top = max(1, nominal - search)
+    bottom = min(gray.height - 1, nominal + search)
+    # Squashing the band to one pixel wide gives the mean of every row in C
+    profile = list(gray.crop((0, top, gray.width, bottom)).resize((1, bottom - top), Image.BOX).getdata())
+    brightest = max(profile)
+    candidates = [top + i for i, value in enumerate(profile) if value == brightest]
+    return min(candidates, key=lambda row: abs(row - nominal))
+
+
+def split_into_tiles(image, max_tiles, tile_height=TILE_HEIGHT):
+    """Split a tall image into horizontal strips cut along blank rows, in reading order"""
+    count = min(max_tiles, image.height // tile_height)
+    if count <= 1:
+        return [image]
+    gray = image.convert('L')
+    step = image.height // count
+    search = int(step * CUT_SEARCH)
+    cuts = [0] + [_best_cut(gray, step * i, search) for i in range(1, count)] + [image.height]
+    return [image.crop((0, top, image.width, bottom)) for top, bottom in zip(cuts, cuts[1:]) if bottom > top]
+
+
+def _completed(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+class OcrEngine:
+    """Runs Tesseract over pages and tiles in a pool sized to the CPU count"""
+
+    def __init__(self, max_workers=None, cache=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.cache = cache
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                # Threads, not processes: Tesseract runs as a subprocess anyway, and
+                # forking a process that has GUI and HTTP threads can deadlock the child
+                _limit_tesseract_threads()
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='ocr')
+            return self._executor
+
+    def ocr_pages(self, sources, lang, psm=3, choice=None):
+        """OCR images (PIL images or encoded bytes) and return their text in order"""
+        sources = list(sources)
+        # A lone image is OCR'd in-process rather than paying for a pool round trip
+        futures = self.submit_pages(sources, lang, psm, inline=len(sources) <= 1, choice=choice)
+        return [future.result() for future in futures]
+
+    def submit_pages(self, sources, lang, psm=3, inline=False, choice=None):
+        """Queue images for OCR without waiting, returning one future per image.
+
+        Encoded images found in the OCR cache resolve immediately. The pack
+        is narrowed once by `choice`; pass the same LanguageChoice for every
+        page of a document so it is only probed once.
+        """
+        choice = choice or LanguageChoice(lang)
+        futures = []
+        for source in sources:
+            key = None
+            if self.cache is not None and isinstance(source, bytes):
+                key = OcrCache.key(source, lang, psm)
+                text = self.cache.get(key)
+                incr('ocr_cache_lookups', result='miss' if text is None else 'hit')
+                if text is not None:
+                    futures.append(_completed(text))
+                    continue
+            job = (source, choice.resolve(source), psm)
+            if inline or self.max_workers == 1:
+                text, timings = _ocr_job(job)
+                _report_timings(timings)
+                future = _completed(text)
+                if key is not None:
+                    self.cache.put(key, text)
+            else:
+                future = Future()
+                self._pool().submit(_ocr_job, job).add_done_callback(
+                    lambda job_future, future=future, key=key: self._job_done(job_future, future, key))
+            futures.append(future)
+        return futures
+
+    def _job_done(self, job_future, future, key):
+        if job_future.cancelled():
+            future.cancel()
+            return
+        try:
+            text, timings = job_future.result()
+        except Exception as e:
+            future.set_exception(e)
+            return
+        _report_timings(timings)
+        if key is not None:
+            try:
+                self.cache.put(key, text)
+            except OSError as e:
+                logger.warning("Could not write OCR cache: %s", e)
+        future.set_result(text)
+
+    def ocr_image(self, image, lang, psm=3):
+        """OCR a single image, splitting large scans into strips across the pool"""
+        choice = LanguageChoice(lang)
+        choice.resolve(image)  # Probe the whole image rather than its first strip
+        tiles = split_into_tiles(image, self.max_workers)
+        return '\n'.join(text for text in self.ocr_pages(tiles, lang, psm, choice) if text)
+
+    def ocr_file(self, image_path, lang, psm=3):
+        """OCR an image file, reusing the cached text if the same file was OCR'd before"""
+        from PIL import Image
+        key = None
+        if self.cache is not None:
+            with open(image_path, 'rb') as file:
+                key = OcrCache.key(file.read(), lang, psm)
+            text = self.cache.get(key)
+            incr('ocr_cache_lookups', result='miss' if text is None else 'hit')
+            if text is not None:
+                return text
+        text = self.ocr_image(Image.open(image_path), lang, psm)
+        if key is not None:
+            self.cache.put(key, text)
+        return text
+
+    def ocr_batch(self, image_paths, lang, psm=3):
+        """OCR many image files with one Tesseract process per core instead of one per image.
+
+        Preprocessing runs across the pool; the preprocessed images are then
+        split into at most max_workers contiguous batches per language pack so
+        each process loads its models once. A single pack named by the caller
+        is used for every image; 'auto' and multi-pack languages are narrowed
+        per image from its own low resolution probe, since a directory may
+        mix languages. Large images are not split into strips here.
+        """
+        texts = [None] * len(image_paths)
+        keys = [None] * len(image_paths)
+        misses = []
+        for idx, image_path in enumerate(image_paths):
+            if self.cache is not None:
+                with open(image_path, 'rb') as file:
+                    keys[idx] = OcrCache.key(file.read(), lang, psm)
+                texts[idx] = self.cache.get(keys[idx])
+                incr('ocr_cache_lookups', result='miss' if texts[idx] is None else 'hit')
+            if texts[idx] is None:
+                misses.append(idx)
+        if not misses:
+            return texts
+        if lang == AUTO_LANG or '+' in lang:
+            probes = [image_paths[idx] for idx in misses]
+            if self.max_workers == 1 or len(probes) == 1:
+                packs = [_probe_file(path, lang) for path in probes]
+            else:
+                packs = list(self._pool().map(lambda path: _probe_file(path, lang), probes))
+        else:
+            packs = [lang] * len(misses)
+
+        with tempfile.TemporaryDirectory(prefix='dotranslate-batch-') as tmp_dir:
+            jobs = [(image_paths[idx], os.path.join(tmp_dir, f"{n:06d}.png")) for n, idx in enumerate(misses)]
+            if self.max_workers == 1 or len(jobs) == 1:
+                timings = [_preprocess_to_file(job) for job in jobs]
+            else:
+                timings = list(self._pool().map(_preprocess_to_file, jobs))
+            for stage_timings in timings:
+                _report_timings(stage_timings)
+
+            by_pack = {}
+            for (_, out_path), pack in zip(jobs, packs):
+                by_pack.setdefault(pack, []).append(out_path)
+            groups = []
+            for pack, processed in by_pack.items():
+                batches = max(1, min(self.max_workers, len(processed) // BATCH_MIN_IMAGES))
+                size = -(-len(processed) // batches)
+                groups.extend((pack, processed[i:i + size]) for i in range(0, len(processed), size))
+            start = time.perf_counter()
+            # Each batch is its own Tesseract subprocess, so threads are enough to run them side by side
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(groups)),
+                                    thread_name_prefix='tesseract') as executor:
+                done = executor.map(lambda group: run_tesseract_batch(group[1], group[0], psm), groups)
+                by_path = {}
+                for (_, processed), batch_texts in zip(groups, done):
+                    by_path.update(zip(processed, batch_texts))
+            results = [by_path[out_path] for _, out_path in jobs]
+            elapsed = time.perf_counter() - start
+            observe('ocr_batch_seconds', elapsed)
+            logger.info("Batched Tesseract: %d images in %d processes (%s), %.1f ms",
+                        len(jobs), len(groups), ', '.join(by_pack), elapsed * 1000)
+
+        for idx, text in zip(misses, results):
+            texts[idx] = text
+            if keys[idx] is not None:
+                self.cache.put(keys[idx], text)
+        return texts
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+_default_engine = None
+
+
+def get_ocr_engine():
+    global _default_engine
+    if _default_engine is None:
+        _default_engine = OcrEngine(cache=open_default_ocr_cache())
+    return _default_engine
+
+
+def extract_text_from_image(image_path, source_lang='English'):
+    try:
+        # Determine the language for OCR based on source language
+        return get_ocr_engine().ocr_file(image_path, ocr_lang(source_lang))
+    except Exception as e:
+        raise Exception(f"Error extracting text from image: {str(e)}")
@@ -0,0 +1,119 @@
+import time
+
+TARGET_DPI = 300  # Tesseract is trained on text scanned at roughly 300 DPI
+MAX_SIDE = 3500  # Phone photos are downscaled to this many pixels on the long side
+MIN_SIDE = 1000  # Small screenshots are upscaled until the short side reaches this
+MAX_SKEW = 5.0  # Degrees searched either side of horizontal when deskewing
+SKEW_STEP = 0.5
+SKEW_SAMPLE_WIDTH = 800  # Deskew angle is estimated on a downsampled copy
+
+# Bump when the pipeline changes so cached OCR results are not reused
+PREPROCESS_VERSION = 1
+
+
+def to_grayscale(image):
+    from PIL import Image
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        # Flatten transparency onto white, otherwise transparent text becomes black
+        image = image.convert('RGBA')
+        background = Image.new('RGBA', image.size, 'white')
+        image = Image.alpha_composite(background, image)
+    return image.convert('L')
+
+
+def rescale(image):
+    """Bring the image to roughly TARGET_DPI, or into [MIN_SIDE, MAX_SIDE] without DPI info"""
+    from PIL import Image
+    dpi = image.info.get('dpi')
+    scale = 1.0
+    if dpi and dpi[0] and 72 <= dpi[0] <= 1200:
+        scale = TARGET_DPI / float(dpi[0])
+    long_side, short_side = max(image.size), min(image.size)
+    scale = min(scale, MAX_SIDE / long_side)
+    if short_side * scale < MIN_SIDE:
+        scale = min(MIN_SIDE / short_side, MAX_SIDE / long_side)
+    if abs(scale - 1.0) < 0.05:
+        return image
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    return image.resize(size, Image.LANCZOS if scale < 1 else Image.BICUBIC)
+
+
+def otsu_threshold(histogram):
+    """Threshold maximising between-class variance of a 256-bin histogram"""
+    total = sum(histogram)
+    sum_all = sum(level * count for level, count in enumerate(histogram))
+    sum_background = weight_background = 0
+    best_level, best_variance = 127, -1.0
+    for level, count in enumerate(histogram):
+        weight_background += count
+        if weight_background == 0:
+            continue
+        weight_foreground = total - weight_background
+        if weight_foreground == 0:
+            break
+        sum_background += level * count
+        mean_background = sum_background / weight_background
+        mean_foreground = (sum_all - sum_background) / weight_foreground
+        variance = weight_background * weight_foreground * (mean_background - mean_foreground) ** 2
+        if variance > best_variance:
+            best_level, best_variance = level, variance
+    return best_level
+
+
+def binarize(image):
+    threshold = otsu_threshold(image.histogram())
+    # point() applies the lookup table in C across the whole image
+    return image.point(lambda value: 255 if value > threshold else 0)
+
+
+def _row_profile_score(image):
+    """Variance of row darkness; highest when text lines are horizontal"""
+    from PIL import Image
+    rows = list(image.resize((1, image.height), Image.BOX).getdata())
+    mean = sum(rows) / len(rows)
+    return sum((value - mean) ** 2 for value in rows)
+
+
+def estimate_skew(image):
+    """Angle in degrees that makes text lines horizontal (projection profile search)"""
+    from PIL import ImageOps
+    sample = image
+    if image.width > SKEW_SAMPLE_WIDTH:
+        ratio = SKEW_SAMPLE_WIDTH / image.width
+        sample = image.resize((SKEW_SAMPLE_WIDTH, max(1, round(image.height * ratio))))
+    # Text as white on black so rotation padding (black) does not add to any row
+    sample = ImageOps.invert(sample)
+    best_angle, best_score = 0.0, -1.0
+    steps = int(MAX_SKEW / SKEW_STEP)
+    for step in range(-steps, steps + 1):
+        angle = step * SKEW_STEP
+        score = _row_profile_score(sample.rotate(angle, expand=False))
+        if score > best_score:
+            best_angle, best_score = angle, score
+    return best_angle
+
+
+def deskew(image):
+    angle = estimate_skew(image)
+    if abs(angle) < SKEW_STEP / 2:
+        return image
+    from PIL import Image
+    return image.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=255)
+
+
+STAGES = (
+    ('grayscale', to_grayscale),
+    ('rescale', rescale),
+    ('binarize', binarize),
+    ('deskew', deskew),
+)
+
+
+def preprocess(image):
+    """Run the preprocessing stages, returning (image, {stage: seconds})"""
+    timings = {}
+    for name, stage in STAGES:
+        start = time.perf_counter()
+        image = stage(image)
+        timings[name] = time.perf_counter() - start
+    return image, timings
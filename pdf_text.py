@@ -0,0 +1,90 @@
+import logging
+import time
+from collections import deque
+
+from metrics import incr, observe
+from ocr import LanguageChoice, get_ocr_engine, ocr_lang
+
+logger = logging.getLogger(__name__)
+
+
+def _page_images(page):
+    """Encoded images embedded in a page; for scanned PDFs this is the page scan"""
+    try:
+        return [image.data for image in page.images]
+    except Exception as e:
+        logger.warning("Could not read images from PDF page: %s", e)
+        return []
+
+
+def parse_page_ranges(spec, page_count):
+    """Turn '1-3,7,10-' (1-based, inclusive) into sorted 0-based page indices"""
+    if spec is None:
+        return list(range(page_count))
+    if not isinstance(spec, str):
+        return sorted(set(page - 1 for page in spec if 1 <= page <= page_count))
+    indices = set()
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        first, dash, last = part.partition('-')
+        try:
+            start = int(first) if first else 1
+            end = (int(last) if last else page_count) if dash else start
+        except ValueError:
+            raise ValueError(f"Invalid page range: {part}")
+        indices.update(range(max(start, 1) - 1, min(end, page_count)))
+    return sorted(indices)
+
+
+def iter_pdf_pages(pdf_path, source_lang='English', pages=None, lookahead=None):
+    """Yield (page_number, page_count, text) for each selected page as soon as it is parsed.
+
+    page_count is the number of selected pages. Pages without a text layer are
+    OCR'd in the background while later pages are parsed; at most `lookahead`
+    pages are held back waiting for their OCR so memory stays bounded.
+    """
+    import PyPDF2  # Imported on first use to keep startup fast
+    engine = get_ocr_engine()
+    lookahead = lookahead or engine.max_workers * 2
+    lang = ocr_lang(source_lang)
+    choice = LanguageChoice(lang)  # Scanned pages share the pack probed on the first of them
+    with open(pdf_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        selected = parse_page_ranges(pages, len(pdf_reader.pages))
+        pending = deque()  # (page number, text or list of OCR futures)
+
+        def ready(item):
+            return isinstance(item, str) or all(future.done() for future in item)
+
+        def resolve(item):
+            if isinstance(item, str):
+                return item
+            return '\n'.join(future.result() for future in item)
+
+        for idx in selected:
+            start = time.perf_counter()
+            page_text = pdf_reader.pages[idx].extract_text() or ''
+            observe('pdf_text_layer_seconds', time.perf_counter() - start)
+            if page_text.strip():
+                incr('pdf_pages', source='text')
+                pending.append((idx + 1, page_text))
+            else:
+                incr('pdf_pages', source='ocr')
+                images = _page_images(pdf_reader.pages[idx])
+                pending.append((idx + 1, engine.submit_pages(images, lang, choice=choice)))
+            # Emit every page whose text is ready, in order; block only when the window is full
+            while pending and (ready(pending[0][1]) or len(pending) > lookahead):
+                page_number, item = pending.popleft()
+                yield page_number, len(selected), resolve(item)
+        while pending:
+            page_number, item = pending.popleft()
+            yield page_number, len(selected), resolve(item)
+
+
+def extract_text_from_pdf(pdf_path, source_lang='English', pages=None):
+    try:
+        return '\n'.join(text for _, _, text in iter_pdf_pages(pdf_path, source_lang, pages)).strip()
+    except Exception as e:
+        raise Exception(f"Error extracting text from PDF: {str(e)}")
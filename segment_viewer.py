@@ -0,0 +1,266 @@
+import math
+from bisect import bisect_left
+
+from kivy.clock import Clock
+from kivy.metrics import dp
+from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.button import Button
+from kivy.uix.label import Label
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
+from kivy.uix.recycleview import RecycleView
+from kivy.uix.recycleview.views import RecycleDataViewBehavior
+from kivy.uix.textinput import TextInput
+
+FLUSH_INTERVAL = 0.2  # Seconds between pushes of new segments into the list
+ROW_PADDING = 8
+PAGE_COLUMN_WIDTH = 44
+CHAR_WIDTH = 0.55  # Average glyph width as a fraction of the font size, for height estimates
+LINE_HEIGHT = 1.25
+
+
+class SegmentStore:
+    """Source/target segment pairs of the current document, in reading order.
+
+    Each segment is a dict that doubles as RecycleView data, so the viewer
+    never copies segment text.
+    """
+
+    def __init__(self):
+        self.items = []
+        self.separators = []
+        self.page_numbers = []  # Pages in order of their first segment
+        self.page_starts = []  # Index of each page's first segment
+        self.translated = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def add(self, separator, source, page=None):
+        idx = len(self.items)
+        if page is not None and (not self.page_numbers or page != self.page_numbers[-1]):
+            self.page_numbers.append(page)
+            self.page_starts.append(idx)
+        self.separators.append(separator)
+        self.items.append({'index': idx, 'page': page, 'source': source, 'target': '',
+                           'first_of_page': bool(self.page_starts) and self.page_starts[-1] == idx})
+        return idx
+
+    def set_translation(self, idx, text):
+        item = self.items[idx]
+        if not item['target']:
+            self.translated += 1
+        item['target'] = text
+
+    def page_index(self, page):
+        """Index of the first segment on `page`, or on the closest following (else last) page"""
+        if not self.page_numbers:
+            return None
+        position = min(bisect_left(self.page_numbers, page), len(self.page_numbers) - 1)
+        return self.page_starts[position]
+
+    def _join(self, key):
+        parts = []
+        for separator, item in zip(self.separators, self.items):
+            parts.append(separator)
+            parts.append(item[key])
+        return ''.join(parts)
+
+    def source_text(self):
+        return self._join('source')
+
+    def target_text(self):
+        return self._join('target')
+
+
+def estimate_height(text, width, font_size):
+    """Row height for `text` wrapped to `width`, without rendering it"""
+    per_line = max(1, int(width / (font_size * CHAR_WIDTH)))
+    lines = sum(max(1, math.ceil(len(line) / per_line)) for line in text.split('\n'))
+    return lines * font_size * LINE_HEIGHT + 2 * ROW_PADDING
+
+
+class SegmentRow(RecycleDataViewBehavior, BoxLayout):
+    """One source/target pair; only enough of these for the viewport are ever created"""
+
+    def __init__(self, **kwargs):
+        super().__init__(orientation='horizontal', spacing=dp(8), padding=[dp(4), ROW_PADDING], **kwargs)
+        self.index = None
+        self._rv = None
+        self.page_label = Label(size_hint_x=None, width=dp(PAGE_COLUMN_WIDTH), valign='top',
+                                color=(0.6, 0.6, 0.6, 1))
+        self.source_label = Label(halign='left', valign='top')
+        self.target_label = Label(halign='left', valign='top')
+        for label in (self.page_label, self.source_label, self.target_label):
+            label.bind(size=self._wrap)
+            self.add_widget(label)
+        self.source_label.bind(texture_size=self._measured)
+        self.target_label.bind(texture_size=self._measured)
+
+    @staticmethod
+    def _wrap(label, size):
+        label.text_size = (size[0], None)
+
+    def refresh_view_attrs(self, rv, index, data):
+        self.index = index
+        self._rv = rv
+        self.page_label.text = f"p.{data['page']}" if data['first_of_page'] else ''
+        self.source_label.text = data['source']
+        self.target_label.text = data['target']
+        for label in (self.source_label, self.target_label):
+            label.font_name = rv.font_name
+            label.font_size = rv.font_size
+        return super().refresh_view_attrs(rv, index, data)
+
+    def _measured(self, *args):
+        """Replace the estimated height with the rendered one once the text is laid out"""
+        if self._rv is None or self.index is None or self.index >= len(self._rv.data):
+            return
+        height = max(self.source_label.texture_size[1], self.target_label.texture_size[1]) + 2 * ROW_PADDING
+        item = self._rv.data[self.index]
+        if abs(item.get('height', 0) - height) > 1:
+            item['height'] = height
+            self._rv.schedule_relayout()
+
+
+class SegmentList(RecycleView):
+    def __init__(self, font_name='', font_size=16, **kwargs):
+        super().__init__(**kwargs)
+        self.font_name = font_name
+        self.font_size = font_size
+        self.viewclass = SegmentRow
+        self.bar_width = dp(10)
+        self.scroll_type = ['bars', 'content']
+        layout = RecycleBoxLayout(orientation='vertical', size_hint=(1, None),
+                                  default_size=(None, dp(40)), default_size_hint=(1, None))
+        layout.bind(minimum_height=layout.setter('height'))
+        self.add_widget(layout)
+        self._relayout = Clock.create_trigger(lambda dt: self.refresh_from_data(), FLUSH_INTERVAL)
+
+    def schedule_relayout(self):
+        self._relayout()
+
+    def column_width(self):
+        return max(dp(100), (self.width - dp(PAGE_COLUMN_WIDTH) - dp(30)) / 2)
+
+    def scroll_to_index(self, idx):
+        """Put segment idx at the top of the viewport"""
+        content = self.layout_manager.height
+        if content <= self.height or not self.data:
+            return
+        above = sum(item.get('height', dp(40)) for item in self.data[:idx])
+        self.scroll_y = max(0.0, min(1.0, 1 - above / (content - self.height)))
+
+
+class SegmentViewer(BoxLayout):
+    """Side-by-side source/target viewer for large documents.
+
+    Segments are added and translated from the main thread; the list is only
+    refreshed every FLUSH_INTERVAL, so cost follows the viewport and the update
+    rate rather than the number of segments.
+    """
+
+    def __init__(self, font_name='', font_size=16, on_close=None, **kwargs):
+        super().__init__(orientation='vertical', spacing=dp(4), **kwargs)
+        self.store = SegmentStore()
+        self._synced = 0  # Segments already handed to the list
+        self._retranslated = []  # Segments whose target text changed since the last flush
+        self._message = ''
+        toolbar = BoxLayout(orientation='horizontal', size_hint_y=None, height=dp(36), spacing=dp(8),
+                            padding=[dp(10), 0])
+        self.info_label = Label(text='', halign='left')
+        self.info_label.bind(size=lambda label, size: setattr(label, 'text_size', size))
+        self.info_label.valign = 'middle'
+        self.page_input = TextInput(hint_text='Page', multiline=False, input_filter='int',
+                                    size_hint_x=None, width=dp(70))
+        self.page_input.bind(on_text_validate=self.jump_to_page)
+        go_btn = Button(text='Go', size_hint_x=None, width=dp(50))
+        go_btn.bind(on_press=self.jump_to_page)
+        text_btn = Button(text='Text View', size_hint_x=None, width=dp(100))
+        if on_close is not None:
+            text_btn.bind(on_press=lambda instance: on_close())
+        toolbar.add_widget(self.info_label)
+        toolbar.add_widget(self.page_input)
+        toolbar.add_widget(go_btn)
+        toolbar.add_widget(text_btn)
+        self.list = SegmentList(font_name=font_name, font_size=font_size)
+        self.add_widget(toolbar)
+        self.add_widget(self.list)
+        self._flush_trigger = Clock.create_trigger(self._flush, FLUSH_INTERVAL)
+        self._rewrap_trigger = Clock.create_trigger(self._rewrap, FLUSH_INTERVAL)
+        self.list.bind(width=lambda instance, width: self._rewrap_trigger())
+
+    def clear(self):
+        self.store = SegmentStore()
+        self._synced = 0
+        self._retranslated = []
+        self.list.data = []
+        self.list.scroll_y = 1
+        self.set_message('')
+
+    def load_text(self, segments):
+        """Replace the document with (separator, source, page) triples"""
+        self.clear()
+        for separator, source, page in segments:
+            self.store.add(separator, source, page)
+        self._flush_trigger()
+
+    def add_segment(self, separator, source, page=None):
+        idx = self.store.add(separator, source, page)
+        self._flush_trigger()
+        return idx
+
+    def set_translation(self, idx, text):
+        self.store.set_translation(idx, text)
+        self._retranslated.append(idx)
+        self._flush_trigger()
+
+    def set_message(self, text):
+        self._message = text
+        self._update_info()
+
+    def _update_info(self):
+        store = self.store
+        pages = f", {len(store.page_numbers)} pages" if store.page_numbers else ''
+        summary = f"{len(store)} segments{pages}, {store.translated} translated"
+        self.info_label.text = f"{summary}  {self._message}" if self._message else summary
+
+    def _estimate(self, item):
+        width = self.list.column_width()
+        font_size = self.list.font_size
+        item['height'] = max(estimate_height(item['source'], width, font_size),
+                             estimate_height(item['target'], width, font_size))
+
+    def _flush(self, dt):
+        new_items = self.store.items[self._synced:]
+        for item in new_items:
+            self._estimate(item)
+        if new_items:
+            self._synced = len(self.store.items)
+            self.list.data.extend(new_items)
+        if self._retranslated:
+            # Segments past _synced are estimated when they are handed over above
+            for idx in self._retranslated:
+                if idx < self._synced:
+                    self._estimate(self.store.items[idx])
+            self._retranslated = []
+            self.list.refresh_from_data()
+        self._update_info()
+
+    def _rewrap(self, dt):
+        # Estimates depend on the column width; rendered rows correct themselves
+        for item in self.store.items[:self._synced]:
+            self._estimate(item)
+        self.list.schedule_relayout()
+
+    def jump_to_page(self, instance=None):
+        try:
+            page = int(self.page_input.text)
+        except ValueError:
+            return
+        idx = self.store.page_index(page)
+        if idx is None:
+            self.set_message('No page numbers in this document.')
+            return
+        self._flush(0)  # Make sure the target segment is in the list
+        self.list.scroll_to_index(idx)
+        self.set_message(f"Page {self.store.items[idx]['page']}")
@@ -0,0 +1,138 @@
+import re
+from collections import namedtuple
+
+from metrics import timer
+
+MAX_CHARS = 1000  # Maximum characters per API request (adjust as needed)
+
+# A chunk of source text; text == source[start:end]
+Chunk = namedtuple('Chunk', ['text', 'start', 'end'])
+
+# Candidate sentence boundaries: a terminator, any further terminators or
+# closing quotes/brackets, then trailing whitespace. Scanning for a single
+# character class first is several times faster than an alternation.
+_BOUNDARY_RE = re.compile(r'[.!?…。！？；\n][.!?…。！？；」』”’）"\')\]]*\s*')
+_CJK_TERMINATORS = frozenset('。！？；')
+# Weaker boundaries used to split sentences that are longer than a chunk
+_CLAUSE_END_RE = re.compile(r'[,;:，、；：]\s*|\s+')
+
+
+def _sentence_bounds(text):
+    """Yield (start, content_end, end) for each sentence; text[content_end:end] is whitespace"""
+    start = 0
+    for match in _BOUNDARY_RE.finditer(text):
+        boundary = match.group()
+        # Latin terminators only end a sentence when followed by whitespace
+        # ("3.14", "e.g.x"); CJK terminators and line breaks always do.
+        if not (boundary[-1].isspace() or boundary[0] in _CJK_TERMINATORS):
+            continue
+        end = match.end()
+        yield start, match.start() + len(boundary.rstrip()), end
+        start = end
+    if start < len(text):
+        yield start, len(text.rstrip()) if text[-1:].isspace() else len(text), len(text)
+
+
+def iter_sentences(text):
+    """Yield (start, end) offsets of sentences, including trailing whitespace"""
+    for start, _, end in _sentence_bounds(text):
+        yield start, end
+
+
+def _split_long(text, start, end, max_chars):
+    """Split an oversized sentence at clause or word boundaries, else hard"""
+    while end - start > max_chars:
+        cut = None
+        for match in _CLAUSE_END_RE.finditer(text, start + 1, start + max_chars):
+            cut = match.end()
+        if cut is None or cut <= start:
+            # No boundary at all (e.g. unpunctuated CJK): cut at the limit
+            cut = start + max_chars
+        yield start, cut
+        start = cut
+    if end > start:
+        yield start, end
+
+
+def _trim(text, start, end):
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def chunk_spans(text, max_chars=MAX_CHARS):
+    """Pack whole sentences into chunks of at most max_chars.
+
+    Runs in linear time: chunks are built from offsets and only sliced out
+    of the source once. Leading and trailing whitespace is left out of each
+    chunk so the gaps between chunks can be restored on reassembly.
+    """
+    chunks = []
+    chunk_start = chunk_end = None
+
+    def flush():
+        if chunk_start is not None:
+            start, end = _trim(text, chunk_start, chunk_end)
+            if end > start:
+                chunks.append(Chunk(text[start:end], start, end))
+
+    for sent_start, content_end, _ in _sentence_bounds(text):
+        # Trailing whitespace does not count against the limit
+        if chunk_start is not None and content_end - chunk_start <= max_chars:
+            chunk_end = content_end
+            continue
+        for start, end in _split_long(text, sent_start, content_end, max_chars):
+            if chunk_start is not None and end - chunk_start > max_chars:
+                flush()
+                chunk_start = None
+            if chunk_start is None:
+                chunk_start = start
+            chunk_end = end
+    flush()
+    return chunks
+
+
+def chunk_text(text, max_chars=MAX_CHARS):
+    """Split text into chunks of at most max_chars for the translation API"""
+    return [chunk.text for chunk in chunk_spans(text, max_chars)]
+
+
+def reassemble(text, chunks, translations):
+    """Join translated chunks, restoring the whitespace found between the source chunks"""
+    parts = []
+    previous_end = None
+    for chunk, translation in zip(chunks, translations):
+        if previous_end is not None:
+            parts.append(text[previous_end:chunk.start])
+        parts.append(translation)
+        previous_end = chunk.end
+    return ''.join(parts)
+
+
+def chunk_items(text, max_chars=MAX_CHARS):
+    """Yield (separator, chunk text) pairs; joining them reproduces reassemble()"""
+    previous_end = None
+    with timer('chunking_seconds'):
+        chunks = chunk_spans(text, max_chars)
+    for chunk in chunks:
+        yield ('' if previous_end is None else text[previous_end:chunk.start]), chunk.text
+        previous_end = chunk.end
+
+
+def chunk_stream(texts, max_chars=MAX_CHARS, separator='\n'):
+    """Chunk an iterable of texts (e.g. PDF pages) lazily, joining texts with separator"""
+    for gap, chunk, _ in chunk_pages(enumerate(texts, 1), max_chars, separator):
+        yield gap, chunk
+
+
+def chunk_pages(pages, max_chars=MAX_CHARS, separator='\n'):
+    """Like chunk_stream for (page number, text) pairs, yielding (separator, chunk, page number)"""
+    first = True
+    for page, text in pages:
+        for idx, (gap, chunk) in enumerate(chunk_items(text, max_chars)):
+            if idx == 0:
+                gap = '' if first else separator
+            first = False
+            yield gap, chunk, page
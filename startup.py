@@ -0,0 +1,63 @@
+import sys
+import time
+
+# Modules that must not be imported before the window is shown
+HEAVY_MODULES = ('pytesseract', 'PIL.Image', 'PyPDF2', 'nltk', 'numpy')
+
+DEFAULT_BUDGET = 2.0  # Seconds from process start to the first frame
+
+
+class StartupProfile:
+    """Records how long startup phases take for --profile-startup"""
+
+    def __init__(self, budget=DEFAULT_BUDGET, start=None):
+        self.budget = budget
+        self.start = start if start is not None else time.perf_counter()
+        self.phases = []
+        self.toolkit_modules = frozenset()
+
+    @classmethod
+    def from_argv(cls, argv, start=None):
+        """Remove --profile-startup[=SECONDS] from argv, returning a profile if present.
+
+        This must run before Kivy is imported, as Kivy parses sys.argv itself.
+        """
+        for idx, arg in enumerate(argv):
+            if arg == '--profile-startup' or arg.startswith('--profile-startup='):
+                del argv[idx]
+                _, _, value = arg.partition('=')
+                try:
+                    budget = float(value) if value else DEFAULT_BUDGET
+                except ValueError:
+                    raise SystemExit(f"Invalid startup budget: {value}")
+                return cls(budget, start)
+        return None
+
+    def mark(self, phase):
+        self.phases.append((phase, time.perf_counter() - self.start))
+
+    def mark_toolkit(self):
+        """Note the modules Kivy has loaded; its image providers import Pillow whatever we defer"""
+        self.toolkit_modules = frozenset(sys.modules)
+
+    def report(self, stream=None):
+        """Print the phase timings and return True if startup fit in the budget"""
+        stream = stream or sys.stderr
+        total = self.phases[-1][1] if self.phases else time.perf_counter() - self.start
+        previous = 0.0
+        print('Startup profile:', file=stream)
+        for phase, elapsed in self.phases:
+            print(f"  {phase:<14} {elapsed * 1000:8.1f} ms  (+{(elapsed - previous) * 1000:.1f} ms)", file=stream)
+            previous = elapsed
+        by_toolkit = [name for name in HEAVY_MODULES if name in self.toolkit_modules]
+        loaded = [name for name in HEAVY_MODULES if name in sys.modules and name not in self.toolkit_modules]
+        if by_toolkit:
+            print(f"  Heavy modules imported by Kivy: {', '.join(by_toolkit)}", file=stream)
+        if loaded:
+            print(f"  Heavy modules imported eagerly: {', '.join(loaded)}", file=stream)
+        within_budget = total <= self.budget and not loaded
+        verdict = 'OK' if within_budget else 'OVER BUDGET'
+        print(f"  Total {total:.3f} s, budget {self.budget:.3f} s: {verdict}", file=stream)
+        print('  For a per-module breakdown run: python -X importtime translator.py --profile-startup',
+              file=stream)
+        return within_budget
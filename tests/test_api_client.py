@@ -0,0 +1,146 @@
+import threading
+import time
+
+import pytest
+import requests
+
+import api_client
+from api_client import CircuitBreaker, CircuitOpenError, LibreNodeClient, TokenBucket, TranslationCancelled
+from benchmarks.fake_server import FakeLibreNode
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(api_client, 'BACKOFF_BASE', 0.001)
+
+
+def test_breaker_needs_min_requests_before_opening():
+    breaker = CircuitBreaker(window=10, min_requests=4, failure_ratio=0.5, reset_timeout=60)
+    for _ in range(3):
+        breaker.record_failure()
+    assert breaker.state == 'closed'
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+
+
+def test_breaker_opens_on_failure_ratio_only():
+    breaker = CircuitBreaker(window=10, min_requests=4, failure_ratio=0.5, reset_timeout=60)
+    for _ in range(10):
+        breaker.record_success()
+        breaker.record_success()
+        breaker.record_failure()
+    assert breaker.state == 'closed'
+    for _ in range(3):
+        breaker.record_failure()
+    assert breaker.state == 'open'
+
+
+def test_breaker_half_open_lets_one_probe_through():
+    breaker = CircuitBreaker(window=10, min_requests=1, failure_ratio=0.5, reset_timeout=0.05)
+    breaker.record_failure()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.state == 'half-open'
+    assert breaker.allow()
+    assert not breaker.allow()
+    # A failed probe reopens the circuit
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed'
+    assert breaker.failures == 0
+
+
+def test_breaker_release_frees_the_probe():
+    breaker = CircuitBreaker(window=10, min_requests=1, failure_ratio=0.5, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.state == 'half-open'
+    assert breaker.allow()
+
+
+def test_token_bucket_limits_the_rate():
+    bucket = TokenBucket(rate=50, capacity=1)
+    start = time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+    assert time.monotonic() - start >= 0.09
+
+
+def test_token_bucket_wait_is_cancelled():
+    bucket = TokenBucket(rate=0.1, capacity=1)
+    bucket.acquire()
+    cancel = threading.Event()
+    threading.Timer(0.05, cancel.set).start()
+    start = time.monotonic()
+    with pytest.raises(TranslationCancelled):
+        bucket.acquire(cancel)
+    assert time.monotonic() - start < 1
+
+
+def translate_all(client, count, engine='google'):
+    failed = 0
+    for n in range(count):
+        try:
+            client.translate({'engine': engine, 'from': 'en', 'to': 'es', 'text': f"chunk {n}"})
+        except requests.exceptions.RequestException:
+            failed += 1
+    return failed
+
+
+def test_retried_errors_keep_the_circuit_closed():
+    with FakeLibreNode(error_rate=0.5, error_status=503) as server:
+        client = LibreNodeClient(server.base_url, rate_limit=0)
+        failed = translate_all(client, 30)
+        assert client.breaker('google').state == 'closed'
+        assert failed < 10
+        client.close()
+
+
+def test_rate_limiting_does_not_open_the_circuit():
+    with FakeLibreNode(error_rate=1.0, error_status=429) as server:
+        client = LibreNodeClient(server.base_url, rate_limit=0, max_retries=1)
+        assert translate_all(client, 15) == 15
+        assert client.breaker('google').state == 'closed'
+        client.close()
+
+
+def test_dead_engine_opens_the_circuit():
+    with FakeLibreNode(error_rate=1.0, error_status=503) as server:
+        client = LibreNodeClient(server.base_url, rate_limit=0, max_retries=1)
+        translate_all(client, api_client.BREAKER_MIN_REQUESTS)
+        sent = server.requests
+        with pytest.raises(CircuitOpenError):
+            client.translate({'engine': 'google', 'text': 'one more'})
+        assert server.requests == sent
+        assert client.breaker('yandex').state == 'closed'
+        client.close()
+
+
+def test_cancel_stops_retrying():
+    with FakeLibreNode(error_rate=1.0, error_status=503) as server:
+        client = LibreNodeClient(server.base_url, rate_limit=0, max_retries=50)
+        cancel = threading.Event()
+        cancel.set()
+        with pytest.raises(TranslationCancelled):
+            client.translate({'engine': 'google', 'text': 'hello'}, cancel)
+        assert server.requests == 0
+        client.close()
+
+
+def test_cancel_stops_waiting_for_a_request_in_flight():
+    with FakeLibreNode(latency=2.0, jitter=0) as server:
+        client = LibreNodeClient(server.base_url, rate_limit=0)
+        cancel = threading.Event()
+        threading.Timer(0.2, cancel.set).start()
+        start = time.monotonic()
+        with pytest.raises(TranslationCancelled):
+            client.translate({'engine': 'google', 'text': 'hello'}, cancel)
+        assert time.monotonic() - start < 1
+        assert client.breaker('google').failures == 0
+        client.close()
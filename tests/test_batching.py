@@ -0,0 +1,47 @@
+from batching import GROW_STEP, PayloadSizer, can_pack, pack, unpack
+
+SEGMENTS = ['Hello there.', 'Second segment,\nwith a line break.', '3']
+
+
+def test_pack_unpack_round_trip():
+    assert unpack(pack(SEGMENTS), len(SEGMENTS)) == SEGMENTS
+    assert unpack(pack(['only']), 1) == ['only']
+
+
+def test_unpack_accepts_spaced_and_full_width_markers():
+    assert unpack('Uno\n[ [1] ]\nDos\n【【2】】\nTres', 3) == ['Uno', 'Dos', 'Tres']
+    assert unpack('一［［1］］二', 2) == ['一', '二']
+
+
+def test_unpack_rejects_lost_or_mangled_markers():
+    packed = pack(SEGMENTS)
+    assert unpack(packed.replace('[[2]]', ''), 3) is None
+    assert unpack(packed.replace('[[2]]', '[[7]]'), 3) is None
+    assert unpack(packed.replace('[[1]]', '[1]'), 3) is None
+    assert unpack(packed, 2) is None
+
+
+def test_segments_with_markers_are_not_packed():
+    assert can_pack('Plain text [1] with brackets')
+    assert not can_pack('Looks like [[3]] a marker')
+
+
+def test_sizer_grows_on_fast_full_requests_only():
+    sizer = PayloadSizer(maximum=2000, initial=1000, minimum=250)
+    sizer.record('google', 0.2, True, 100)
+    assert sizer.limit('google') == 1000
+    sizer.record('google', 0.2, True, 900)
+    assert sizer.limit('google') == 1000 + GROW_STEP
+    assert sizer.limit('yandex') == 1000
+
+
+def test_sizer_halves_on_trouble_within_bounds():
+    sizer = PayloadSizer(maximum=2000, initial=1000, minimum=250)
+    sizer.record('google', 10.0, True, 1000)
+    assert sizer.limit('google') == 500
+    sizer.record('google', 0.1, False, 500)
+    sizer.shrink('google')
+    assert sizer.limit('google') == 250
+    for _ in range(20):
+        sizer.record('google', 0.1, True, 2000)
+    assert sizer.limit('google') == 2000
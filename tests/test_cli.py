@@ -0,0 +1,29 @@
+import json
+
+from api_client import LibreNodeClient
+from benchmarks.fake_server import FakeLibreNode
+from cli import BatchTranslator
+from translation_engine import TranslationEngine
+
+
+def test_invalid_records_become_error_lines():
+    batch = BatchTranslator(None, 'en', 'es', 'google')
+    for line in ('not json', '[1, 2]', '{"id": 1}', '{"text": "x", "from": 5}', '{"text": "x", "to": null}',
+                 '{"text": "x", "engine": ["google"]}', '{"text": "x", "from": "klingon"}'):
+        record, text = batch.parse_record(line)
+        assert text is None
+        assert record['error'].startswith('Invalid record: ')
+
+
+def test_a_bad_record_does_not_stop_the_stream():
+    with FakeLibreNode() as server:
+        engine = TranslationEngine(max_workers=2, client=LibreNodeClient(server.base_url, rate_limit=0),
+                                   memory=None)
+        batch = BatchTranslator(engine, 'en', 'es', 'google')
+        lines = [json.dumps({'id': 1, 'text': 'Hello.'}), '{"id": 2, "text": "x", "from": 5}',
+                 json.dumps({'id': 3, 'text': 'Bye.', 'from': 'English'})]
+        records = batch.translate_records(lines)
+        assert records[0] == {'from': 'en', 'to': 'es', 'engine': 'google', 'id': 1, 'translation': 'HELLO.'}
+        assert 'error' in records[1]
+        assert records[2]['translation'] == 'BYE.'
+        engine.close()
@@ -0,0 +1,46 @@
+from dedup import SegmentDeduplicator, needs_translation, segment_key, split_boilerplate
+
+
+def test_needs_translation():
+    assert needs_translation('Total')
+    assert not needs_translation('12')
+    assert not needs_translation('- 3 -')
+    assert not needs_translation('1,250.00')
+
+
+def test_segment_key_normalizes_whitespace_and_unicode():
+    assert segment_key('  Hello \n  world ') == 'Hello world'
+    assert segment_key('Cafe\u0301') == segment_key('Caf\u00e9')
+
+
+def test_duplicates_wait_for_the_first_copy():
+    dedup = SegmentDeduplicator()
+    assert dedup.add(0, 'Hello world.')
+    assert not dedup.add(1, 'Hello  world.')
+    assert not dedup.add(2, '42')
+    assert dedup.ready() == [(2, ('42', None))]
+    dedup.resolved(0, ('HELLO WORLD.', None))
+    assert dedup.ready() == [(1, ('HELLO WORLD.', None))]
+    # Copies seen after the first was translated are answered at once
+    assert not dedup.add(3, 'Hello world.')
+    assert dedup.ready() == [(3, ('HELLO WORLD.', None))]
+    assert (dedup.segments, dedup.duplicates, dedup.untranslatable, dedup.saved) == (4, 2, 1, 3)
+    assert dedup.report() == '3 of 4 segments needed no request (2 repeated, 1 without text)'
+
+
+def test_previous_results_are_reused_without_dedupe():
+    dedup = SegmentDeduplicator(previous={'Kept': ('KEPT', None)}, dedupe=False)
+    assert not dedup.add(0, 'Kept')
+    assert dedup.add(1, 'New')
+    assert dedup.add(2, 'New')
+    assert dedup.add(3, '7')
+    assert dedup.ready() == [(0, ('KEPT', None))]
+    assert dedup.reused == 1 and dedup.saved == 1
+
+
+def test_split_boilerplate_round_trips_pages():
+    pages = [(n, f"Annual Report\nBody text of page {n} says something.\n{n}") for n in range(1, 4)]
+    items = list(split_boilerplate(pages, 1000, separator='\n'))
+    joined = ''.join(gap + chunk for gap, chunk, _ in items)
+    assert joined == '\n'.join(text for _, text in pages)
+    assert [page for _, _, page in items] == sorted(page for _, _, page in items)
@@ -0,0 +1,49 @@
+from incremental import TranslationSession, chunk_like
+from segmenter import chunk_spans
+
+
+def test_chunk_like_keeps_unchanged_chunks():
+    before = 'First sentence here. Second sentence here. Third sentence here.'
+    previous = [chunk.text for chunk in chunk_spans(before, 25)]
+    after = before.replace('Second', 'Edited second')
+    chunks = chunk_like(after, previous, 25)
+    texts = [chunk.text for chunk in chunks]
+    assert texts[0] == previous[0] and texts[-1] == previous[-1]
+    assert all(chunk.text == after[chunk.start:chunk.end] for chunk in chunks)
+    assert all(len(text) <= 25 for text in texts)
+
+
+def test_chunk_like_only_reuses_whole_words():
+    chunks = chunk_like('Cats and dogs.', ['Cat'], 1000)
+    assert [chunk.text for chunk in chunks] == ['Cats and dogs.']
+
+
+def test_text_appended_to_an_unfinished_sentence_joins_it():
+    chunks = chunk_like('The contract is valid until 2025 for all parties.', ['The contract is valid'], 1000)
+    assert [chunk.text for chunk in chunks] == ['The contract is valid until 2025 for all parties.']
+    # A finished sentence is kept while the next one is typed
+    chunks = chunk_like('Signed. The contract is valid until', ['Signed.', 'The contract'], 10)
+    assert chunks[0].text == 'Signed.'
+
+
+def test_live_typing_sends_whole_sentences():
+    session = TranslationSession(max_chars=1000)
+    params = ('en', 'es', 'google')
+    for typed in ('The contract', 'The contract is valid', 'The contract is valid until the end',
+                  'The contract is valid until the end of the year.'):
+        chunks = [chunk for _, chunk in session.items(typed)]
+        session.record(params, chunks, {idx: (chunk.upper(), None) for idx, chunk in enumerate(chunks)})
+    assert chunks == ['The contract is valid until the end of the year.']
+
+
+def test_session_answers_unchanged_segments_but_not_failures():
+    session = TranslationSession(max_chars=1000)
+    params = ('en', 'es', 'google')
+    chunks = ['Hello.', 'Goodbye.']
+    session.record(params, chunks, {0: ('HOLA.', None), 1: ('[Chunk 2 failed: timeout]', None)})
+    dedup = session.deduplicator(params)
+    assert not dedup.add(0, 'Hello.')
+    assert dedup.add(1, 'Goodbye.')
+    assert dedup.ready() == [(0, ('HOLA.', None))]
+    # Other settings start from scratch
+    assert session.deduplicator(('en', 'fr', 'google')).add(0, 'Hello.')
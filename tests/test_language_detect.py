@@ -0,0 +1,39 @@
+from language_detect import chinese_variant, detect_language, detect_script
+
+
+def test_latin_languages():
+    assert detect_language('The weather is nice and the children are playing in the park.')[0] == 'english'
+    assert detect_language('El niño come una manzana en la casa de su abuela por la tarde.')[0] == 'spanish'
+    assert detect_language('Le chat est sur la table et il dort dans la cuisine.')[0] == 'french'
+    assert detect_language('Der Hund ist nicht in dem Haus und die Katze schläft.')[0] == 'german'
+
+
+def test_stopwords_of_several_languages_do_not_count():
+    # 'in' is English, German and Italian
+    language, confidence = detect_language('Die Band The Who spielte in Berlin.')
+    assert language != 'english' or confidence < 0.5
+
+
+def test_other_scripts():
+    assert detect_language('Привет, как у тебя дела сегодня?') == ('russian', 1.0)
+    assert detect_language('我们今天去公园散步。')[0] == 'chinese'
+
+
+def test_unsure_detection_has_no_language_or_low_confidence():
+    # Too few words to go on; translation_engine sends these with from=auto
+    assert detect_language('Hola amigo') == (None, 0.0)
+    assert detect_language('12 345 - 7') == (None, 0.0)
+    assert detect_language('') == (None, 0.0)
+    language, confidence = detect_language('Taxi hotel radio piano banana')
+    assert language is None or confidence < 0.2
+
+
+def test_detect_script_share():
+    script, share = detect_script('abcdef где')
+    assert script == 'latin' and share == 2 / 3
+
+
+def test_chinese_variant():
+    assert chinese_variant('这是我们的国家') == 'simplified'
+    assert chinese_variant('這是我們的國家') == 'traditional'
+    assert chinese_variant('中文') is None
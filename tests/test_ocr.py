@@ -0,0 +1,73 @@
+import pytesseract
+import pytest
+from PIL import Image
+
+import ocr
+from ocr import choose_ocr_lang, ocr_lang
+
+
+@pytest.fixture
+def probe_reads(monkeypatch):
+    """Make the probe pass read a given text, recording the packs it was run with"""
+    calls = []
+
+    def read(text):
+        def image_to_string(image, config=''):
+            calls.append(config)
+            return text
+        monkeypatch.setattr(pytesseract, 'image_to_string', image_to_string)
+        return calls
+
+    monkeypatch.setattr(ocr, 'installed_packs', lambda: frozenset())
+    return read
+
+
+def test_chinese_variant_picks_one_pack(probe_reads):
+    image = Image.new('RGB', (100, 100), 'white')
+    calls = probe_reads('這是我們的國家，我們說中文。')
+    assert choose_ocr_lang(image, ocr_lang('Chinese')) == 'chi_tra'
+    assert calls == ['-l chi_sim+chi_tra --psm 3']
+    probe_reads('这是我们的国家，我们说中文。')
+    assert choose_ocr_lang(image, ocr_lang('Chinese')) == 'chi_sim'
+
+
+def test_undecided_chinese_keeps_both_packs(probe_reads):
+    probe_reads('中文')
+    image = Image.new('RGB', (100, 100), 'white')
+    assert choose_ocr_lang(image, ocr_lang('Chinese')) == 'chi_sim+chi_tra'
+
+
+@pytest.fixture
+def fake_tesseract(monkeypatch, tmp_path):
+    """Images whose width names the pack their probe picks; batches 'read' the pack they ran with"""
+    packs = {100: 'chi_sim', 120: 'chi_tra', 140: 'rus'}
+    probed = []
+
+    def choose(image, lang):
+        probed.append(image.width)
+        return packs[image.width]
+
+    monkeypatch.setattr(ocr, 'choose_ocr_lang', choose)
+    monkeypatch.setattr(ocr, 'run_tesseract_batch', lambda paths, lang, psm=3: [lang] * len(paths))
+    paths = []
+    for n, width in enumerate([100, 120, 100, 140, 120]):
+        path = str(tmp_path / f"{n}.png")
+        Image.new('RGB', (width, 60), 'white').save(path)
+        paths.append(path)
+    return paths, probed
+
+
+def test_batch_picks_a_pack_per_image(fake_tesseract):
+    paths, probed = fake_tesseract
+    engine = ocr.OcrEngine(max_workers=2)
+    assert engine.ocr_batch(paths, 'auto') == ['chi_sim', 'chi_tra', 'chi_sim', 'rus', 'chi_tra']
+    assert len(probed) == len(paths)
+    engine.close()
+
+
+def test_batch_shares_a_named_pack(fake_tesseract):
+    paths, probed = fake_tesseract
+    engine = ocr.OcrEngine(max_workers=2)
+    assert engine.ocr_batch(paths, 'deu') == ['deu'] * len(paths)
+    assert probed == []
+    engine.close()
@@ -0,0 +1,53 @@
+from segmenter import chunk_items, chunk_pages, chunk_spans, chunk_text, reassemble
+
+TEXT = ("The first sentence is short. The second one runs on for a while, with a clause or two; "
+        "then it stops!  Is this the third?\n\nA new paragraph starts here. 3.14 is not a sentence end.\n"
+        "这是一个句子。这是另一个句子！Ends without a terminator")
+
+
+def long_texts():
+    yield TEXT
+    yield ' '.join(['word'] * 400)
+    yield 'x' * 2500
+    yield '  leading and trailing whitespace.  \n'
+    yield ''
+
+
+def test_chunks_fit_the_limit():
+    for text in long_texts():
+        for max_chars in (10, 40, 100, 1000):
+            assert all(len(chunk) <= max_chars for chunk in chunk_text(text, max_chars))
+
+
+def test_spans_are_ordered_and_point_into_the_text():
+    for text in long_texts():
+        previous_end = 0
+        for chunk in chunk_spans(text, 40):
+            assert chunk.text == text[chunk.start:chunk.end]
+            assert chunk.text.strip() == chunk.text
+            assert chunk.start >= previous_end
+            previous_end = chunk.end
+
+
+def test_identity_translation_round_trips():
+    for text in long_texts():
+        for max_chars in (10, 40, 1000):
+            chunks = chunk_spans(text, max_chars)
+            assert reassemble(text, chunks, [chunk.text for chunk in chunks]) == text.strip()
+
+
+def test_chunks_end_at_sentence_boundaries():
+    assert chunk_text('One two three. Four five six.', 20) == ['One two three.', 'Four five six.']
+    assert chunk_text('Pi is 3.14 exactly.', 1000) == ['Pi is 3.14 exactly.']
+
+
+def test_chunk_items_join_like_reassemble():
+    chunks = chunk_spans(TEXT, 40)
+    items = list(chunk_items(TEXT, 40))
+    assert ''.join(gap + chunk for gap, chunk in items) == reassemble(TEXT, chunks, [c.text for c in chunks])
+
+
+def test_chunk_pages_separates_pages():
+    pages = [(1, 'Page one.'), (2, ''), (3, 'Page three. Still three.')]
+    items = list(chunk_pages(pages, 1000, separator='\f'))
+    assert items == [('', 'Page one.', 1), ('\f', 'Page three. Still three.', 3)]
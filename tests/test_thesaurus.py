@@ -0,0 +1,53 @@
+import pytest
+
+from thesaurus import Thesaurus, ThesaurusIndex, normalize_word, write_index
+
+ENTRIES = [
+    ('red', ['crimson', 'scarlet'], [], 'na'),
+    ('re', ['ray'], [], 'n'),
+    ('walk', ['stroll', 'amble'], ['run'], 'nv'),
+    ('cat', ['feline'], [], 'n'),
+    ('great', ['large'], ['small'], 'a'),
+    ('ice_cream', ['gelato'], [], 'n'),
+    ('café', ['coffeehouse'], [], 'n'),
+]
+
+
+def test_index_round_trip(tmp_path):
+    path = str(tmp_path / 'english.idx')
+    assert write_index(path, ENTRIES) == len(ENTRIES)
+    index = ThesaurusIndex(path)
+    assert index.count == len(ENTRIES)
+    for key, synonyms, antonyms, pos in ENTRIES:
+        assert index.get(key) == (synonyms, antonyms, pos)
+    assert index.get('dog') is None
+    assert index.get('cats') is None
+    assert index.get('') is None
+    assert index.get('zzz') is None
+    index.close()
+
+
+def test_other_files_are_rejected(tmp_path):
+    path = tmp_path / 'english.idx'
+    path.write_bytes(b'DOTHES01' + bytes(8))
+    with pytest.raises(ValueError):
+        ThesaurusIndex(str(path))
+    path.write_bytes(b'')
+    with pytest.raises(ValueError):
+        ThesaurusIndex(str(path))
+
+
+def test_normalize_word():
+    assert normalize_word('  Ice Cream! ') == 'ice_cream'
+
+
+def test_lookup_uses_base_forms_of_the_right_part_of_speech(tmp_path):
+    thesaurus = Thesaurus(directory=str(tmp_path))
+    write_index(thesaurus.index_path('english'), ENTRIES)
+    assert thesaurus.lookup('Red', 'english') == (('crimson', 'scarlet'), ())
+    assert thesaurus.lookup('walked', 'english') == (('stroll', 'amble'), ('run',))
+    assert thesaurus.lookup('cats', 'english') == (('feline',), ())
+    assert thesaurus.lookup('greater', 'english') == (('large',), ('small',))
+    # 'cater' is no comparative: 'cat' is only a noun
+    assert thesaurus.lookup('cater', 'english') == ((), ())
+    thesaurus.close()
@@ -0,0 +1,118 @@
+import threading
+import time
+
+import pytest
+
+import api_client
+from api_client import LibreNodeClient, TranslationCancelled
+from batching import PayloadSizer
+from benchmarks.fake_server import FakeLibreNode
+from engine_router import EngineRouter
+from translation_engine import AUTO_ENGINE, AUTO_SOURCE, TranslationEngine, is_failure
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(api_client, 'BACKOFF_BASE', 0.001)
+
+
+def make_engine(server, max_retries=0, sizer=None, rate_limit=0, router=None):
+    client = LibreNodeClient(server.base_url, pool_size=8, max_retries=max_retries, rate_limit=rate_limit)
+    return TranslationEngine(max_workers=4, client=client, memory=None, router=router, sizer=sizer)
+
+
+def test_is_failure():
+    assert is_failure('[Chunk 3 failed: 503 Server Error]')
+    assert is_failure('[Deepl translation failed: no text]')
+    assert not is_failure('[Chunk] of text')
+
+
+def test_unsure_detection_is_sent_as_auto():
+    engine = TranslationEngine(max_workers=1, client=LibreNodeClient('http://127.0.0.1:9'), memory=None)
+    assert engine.detect_source('Hola amigo') == AUTO_SOURCE
+    assert engine.detect_source('The cat is on the mat and it is asleep.') == 'en'
+    engine.close()
+    with FakeLibreNode() as server:
+        engine = make_engine(server)
+        assert engine.translate_text('Hola amigo', AUTO_SOURCE, 'en', 'google') == ('HOLA AMIGO', None)
+        assert server.requests == 1
+        # A sure detection of a longer text in the target language needs no request
+        text = 'The weather is nice today and the children are playing in the park with all of their friends.'
+        assert engine.translate_text(text, AUTO_SOURCE, 'en', 'google')[0] == text
+        assert server.requests == 1
+        # Mixed text that only looks like the target language is still sent
+        assert engine.translate_text('Die Band The Who spielte in Berlin.', AUTO_SOURCE, 'en',
+                                     'google')[0] == 'DIE BAND THE WHO SPIELTE IN BERLIN.'
+        assert engine.translate_text('Il a vu The Lord of the Rings hier soir.', AUTO_SOURCE, 'en',
+                                     'google')[0] == 'IL A VU THE LORD OF THE RINGS HIER SOIR.'
+        assert server.requests == 3
+        engine.close()
+
+
+@pytest.mark.parametrize('engine_name', ['google', AUTO_ENGINE])
+def test_exhausted_engines_give_failure_markers(engine_name):
+    with FakeLibreNode(error_rate=1.0, error_status=503) as server:
+        engine = make_engine(server, sizer=PayloadSizer(0))
+        chunks = [f"Sentence number {n} is here." for n in range(5)]
+        results = engine.translate_chunks(chunks, 'en', 'es', engine_name)
+        assert len(results) == 5
+        assert all(is_failure(text) for text, _ in results)
+        engine.close()
+
+
+def test_packed_chunks_come_back_in_place():
+    with FakeLibreNode() as server:
+        engine = make_engine(server)
+        chunks = [f"Short segment {n}." for n in range(30)] + ['Short segment 3.', '42']
+        results = engine.translate_chunks(chunks, 'en', 'es', 'google')
+        assert [text for text, _ in results] == [chunk.upper() for chunk in chunks]
+        # Short segments share requests and repeats are sent once
+        assert server.requests < 30
+        engine.close()
+
+
+def test_translate_texts_keeps_texts_apart():
+    with FakeLibreNode() as server:
+        engine = make_engine(server)
+        texts = ['First text. Two sentences.', '', 'Second text.']
+        results = engine.translate_texts(texts, 'en', 'es', 'google', max_chars=15)
+        assert results == [('FIRST TEXT. TWO SENTENCES.', None), ('', None), ('SECOND TEXT.', None)]
+        engine.close()
+
+
+def test_rate_limiter_waits_do_not_trigger_hedges():
+    with FakeLibreNode(latency=0.02) as server:
+        engine = make_engine(server, sizer=PayloadSizer(0), rate_limit=4, router=EngineRouter(hedge=True))
+        chunks = [f"Distinct sentence number {n}." for n in range(16)]
+        results = engine.translate_chunks(chunks, 'en', 'es', AUTO_ENGINE)
+        assert [text for text, _ in results] == [chunk.upper() for chunk in chunks]
+        assert server.requests == len(chunks)
+        engine.close()
+
+
+def test_slow_engine_is_hedged():
+    with FakeLibreNode(latency=0.02, engine_latency={'google': 1.0}) as server:
+        router = EngineRouter(hedge=True)
+        for _ in range(5):
+            router.record('google', 0.05, True)
+        engine = make_engine(server, router=router)
+        start = time.monotonic()
+        assert engine.translate_text('One sentence.', 'en', 'es', AUTO_ENGINE) == ('ONE SENTENCE.', None)
+        assert time.monotonic() - start < 0.9
+        assert server.requests == 2
+        engine.close()
+
+
+def test_cancelled_job_frees_its_workers():
+    with FakeLibreNode(latency=0.05, engine_latency={'yandex': 3.0}, jitter=0) as server:
+        engine = make_engine(server, sizer=PayloadSizer(0))
+        cancel = threading.Event()
+        chunks = [f"Slow sentence number {n}." for n in range(8)]
+        slow = engine.iter_translations(chunks, 'en', 'es', 'yandex', cancel_event=cancel)
+        threading.Timer(0.3, cancel.set).start()
+        start = time.monotonic()
+        with pytest.raises(TranslationCancelled):
+            list(slow)
+        assert engine.translate_chunks(['One.', 'Two.'], 'en', 'es', 'google') == [('ONE.', None), ('TWO.', None)]
+        assert time.monotonic() - start < 1.5
+        engine.close()
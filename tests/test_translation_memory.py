@@ -0,0 +1,64 @@
+import translation_memory
+from translation_memory import TranslationMemory
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        self.now += 1.0  # Every call is a second later, so last_used values never tie
+        return self.now
+
+
+def memory(tmp_path, monkeypatch, **kwargs):
+    clock = Clock()
+    monkeypatch.setattr(translation_memory.time, 'time', clock)
+    return TranslationMemory(str(tmp_path / 'memory.sqlite3'), **kwargs), clock
+
+
+def test_round_trip_and_keys(tmp_path, monkeypatch):
+    mem, _ = memory(tmp_path, monkeypatch)
+    choices = [{'word': 'hola', 'score': 0.9}]
+    mem.put('google', 'en', 'es', 'Hello', 'Hola', choices)
+    assert mem.get('google', 'en', 'es', 'Hello') == ('Hola', choices)
+    assert mem.get('yandex', 'en', 'es', 'Hello') is None
+    assert mem.get('google', 'en', 'fr', 'Hello') is None
+    mem.put('google', 'en', 'es', 'Hello', 'Buenas')
+    assert mem.get('google', 'en', 'es', 'Hello') == ('Buenas', None)
+    assert mem.stats() == {'entries': 1, 'hits': 2, 'misses': 2}
+    mem.close()
+
+
+def test_entries_expire_after_ttl(tmp_path, monkeypatch):
+    mem, clock = memory(tmp_path, monkeypatch, ttl=100)
+    mem.put('google', 'en', 'es', 'Hello', 'Hola')
+    assert mem.get('google', 'en', 'es', 'Hello') == ('Hola', None)
+    clock.now += 100
+    assert mem.get('google', 'en', 'es', 'Hello') is None
+    assert mem.stats()['entries'] == 0
+    mem.close()
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    mem, _ = memory(tmp_path, monkeypatch, max_entries=10, ttl=0)
+    for n in range(10):
+        mem.put('google', 'en', 'es', f"text {n}", f"texto {n}")
+    assert mem.get('google', 'en', 'es', 'text 0') is not None
+    mem.put('google', 'en', 'es', 'text 10', 'texto 10')
+    # Trimmed to 90% of capacity, dropping the entries used longest ago
+    assert mem.stats()['entries'] == 9
+    assert mem.get('google', 'en', 'es', 'text 1') is None
+    assert mem.get('google', 'en', 'es', 'text 2') is None
+    assert mem.get('google', 'en', 'es', 'text 0') is not None
+    assert mem.get('google', 'en', 'es', 'text 10') is not None
+    mem.close()
+
+
+def test_entries_survive_reopening(tmp_path, monkeypatch):
+    mem, _ = memory(tmp_path, monkeypatch)
+    mem.put('google', 'en', 'es', 'Hello', 'Hola')
+    mem.close()
+    mem = TranslationMemory(str(tmp_path / 'memory.sqlite3'))
+    assert mem.get('google', 'en', 'es', 'Hello') == ('Hola', None)
+    mem.close()
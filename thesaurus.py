@@ -0,0 +1,348 @@
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import subprocess
+import sys
+import threading
+import time
+from functools import lru_cache
+
+from metrics import observe
+from translation_memory import cache_dir
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 2
+MAGIC = b'DOTHES%02d' % INDEX_VERSION
+HEADER = struct.Struct('<8sI')  # Magic, entry count
+SPAN = struct.Struct('<II')  # A record's start and end: two neighbouring offsets
+OFFSET_SIZE = 4
+FIELD_SEP = '\x1f'  # Between key, synonyms, antonyms and parts of speech
+ITEM_SEP = '\x1e'  # Between words of a list; neither occurs in WordNet lemma names
+LOOKUP_CACHE_SIZE = 4096
+BUILD_ARG = '--build-thesaurus'  # Command line of the child process that builds an index
+
+# WordNet's morphy detachment rules per part of speech. A base form only
+# counts if WordNet lists it with that part of speech, so 'red' never
+# becomes 're'. Irregular forms ('ran', 'stopped') are indexed at build time.
+MORPHY_SUFFIXES = {
+    'n': (('s', ''), ('ses', 's'), ('xes', 'x'), ('zes', 'z'), ('ches', 'ch'), ('shes', 'sh'),
+          ('men', 'man'), ('ies', 'y')),
+    'v': (('s', ''), ('ies', 'y'), ('es', 'e'), ('es', ''), ('ed', 'e'), ('ed', ''),
+          ('ing', 'e'), ('ing', '')),
+    'a': (('er', ''), ('est', ''), ('er', 'e'), ('est', 'e')),
+}
+WORDNET_EXCEPTIONS = ('noun.exc', 'verb.exc', 'adj.exc', 'adv.exc')
+
+_strip_re = re.compile(r"^[\W_]+|[\W_]+$")
+
+
+def normalize_word(word):
+    """Index key for a word: lowercased, outer punctuation removed, spaces as underscores"""
+    return _strip_re.sub('', word.strip().lower()).replace(' ', '_')
+
+
+def _unique(words):
+    # dict keeps first-seen order and makes deduplication linear
+    return list(dict.fromkeys(words))
+
+
+def write_index(path, entries):
+    """Write (key, synonyms, antonyms, parts of speech) entries as a sorted index file.
+
+    Layout: header, count + 1 little-endian uint32 record offsets, then UTF-8
+    records 'key FS syn RS syn ... FS ant RS ... FS nv' sorted bytewise by key
+    so lookups can binary search the memory-mapped file without parsing it.
+    Parts of speech are WordNet's letters for which key is a lemma.
+    """
+    records = sorted(
+        (key.encode('utf-8'), FIELD_SEP.join(
+            (key, ITEM_SEP.join(synonyms), ITEM_SEP.join(antonyms), pos)).encode('utf-8'))
+        for key, synonyms, antonyms, pos in entries)
+    offsets = [0]
+    for _, record in records:
+        offsets.append(offsets[-1] + len(record))
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, len(records)))
+        file.write(struct.pack(f'<{len(offsets)}I', *offsets))
+        for _, record in records:
+            file.write(record)
+    os.replace(tmp_path, path)
+    return len(records)
+
+
+class ThesaurusIndex:
+    """Read-only view of an index file; the OS pages in only the records that are probed"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, self.count = HEADER.unpack_from(self._map, 0)
+        except (ValueError, struct.error, OSError):
+            self._file.close()
+            raise ValueError(f"Not a thesaurus index: {path}")
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"Unsupported thesaurus index version: {path}")
+        self._data = HEADER.size + OFFSET_SIZE * (self.count + 1)
+
+    def _record(self, idx):
+        start, end = SPAN.unpack_from(self._map, HEADER.size + OFFSET_SIZE * idx)
+        return self._map[self._data + start:self._data + end]
+
+    def get(self, key):
+        """(synonyms, antonyms, parts of speech) stored for key, or None"""
+        target = key.encode('utf-8')
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            record = self._record(mid)
+            if record[:record.index(b'\x1f')] < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == self.count:
+            return None
+        record_key, synonyms, antonyms, pos = self._record(lo).decode('utf-8').split(FIELD_SEP)
+        if record_key != key:
+            return None
+        return (synonyms.split(ITEM_SEP) if synonyms else [],
+                antonyms.split(ITEM_SEP) if antonyms else [], pos)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+def wordnet_available():
+    """Whether the WordNet corpus is installed, without downloading it"""
+    import nltk  # Imported on first use to keep startup fast
+    try:
+        nltk.data.find('corpora/wordnet')
+    except LookupError:
+        return False
+    return True
+
+
+def _load_wordnet():
+    import nltk
+    try:
+        nltk.data.find('corpora/wordnet')
+    except LookupError:
+        nltk.download('wordnet')
+    from nltk.corpus import wordnet
+    return wordnet
+
+
+def wordnet_entry(wordnet, word):
+    """Synonyms and antonyms of every sense of `word`, in WordNet's sense order"""
+    synonyms = []
+    antonyms = []
+    for synset in wordnet.synsets(word):
+        for lemma in synset.lemmas():
+            synonyms.append(lemma.name().lower())
+            antonyms.extend(antonym.name().lower() for antonym in lemma.antonyms())
+    return _unique(synonyms), _unique(antonyms)
+
+
+def _exception_forms(wordnet):
+    """Irregular inflections WordNet maps to their base forms, e.g. 'ran' and 'stopped'"""
+    forms = set()
+    for name in WORDNET_EXCEPTIONS:
+        try:
+            with wordnet.open(name) as file:
+                forms.update(line.split()[0] for line in file if line.strip())
+        except OSError:
+            continue
+    return forms
+
+
+def wordnet_entries():
+    """One entry per WordNet lemma name and irregular form, the same answer a live WordNet lookup gives"""
+    wordnet = _load_wordnet()
+    parts = {}
+    for pos in 'nvar':
+        for name in wordnet.all_lemma_names(pos):
+            parts[name] = parts.get(name, '') + pos
+    for name in sorted(parts.keys() | _exception_forms(wordnet)):
+        synonyms, antonyms = wordnet_entry(wordnet, name)
+        if synonyms or antonyms:
+            yield name, synonyms, antonyms, parts.get(name, '')
+
+
+def build_command(path):
+    """Command line that builds the English index at path in a child process"""
+    if getattr(sys, 'frozen', False):
+        # PyInstaller builds have no interpreter to run this file; the app handles BUILD_ARG itself
+        return [sys.executable, BUILD_ARG, path]
+    return [sys.executable, os.path.abspath(__file__), BUILD_ARG, path]
+
+
+def main(argv=None):
+    """Entry point of the child process started by build_command"""
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 2 or argv[0] != BUILD_ARG:
+        raise SystemExit(f"usage: thesaurus.py {BUILD_ARG} PATH")
+    write_index(argv[1], wordnet_entries())
+
+
+class Thesaurus:
+    """Memoized synonym/antonym lookups.
+
+    English is answered from an index precomputed from WordNet; every language
+    also picks up synonyms learned from the translation API's word_choices.
+    """
+
+    def __init__(self, directory=None, cache_size=LOOKUP_CACHE_SIZE):
+        self.directory = directory or os.path.join(cache_dir(), 'thesaurus')
+        self._indexes = {}  # Language -> ThesaurusIndex, or None when there is none yet
+        self._learned = {}  # Language -> {word: [synonyms]}
+        self._lock = threading.Lock()
+        self._build_thread = None
+        self.lookup = lru_cache(maxsize=cache_size)(self._lookup)
+
+    def index_path(self, lang):
+        return os.path.join(self.directory, f"{lang}.idx")
+
+    def _learned_path(self, lang):
+        return os.path.join(self.directory, f"{lang}.learned.jsonl")
+
+    def _index(self, lang):
+        with self._lock:
+            if lang not in self._indexes:
+                path = self.index_path(lang)
+                try:
+                    self._indexes[lang] = ThesaurusIndex(path) if os.path.exists(path) else None
+                except ValueError as e:
+                    logger.warning("Ignoring thesaurus index: %s", e)
+                    self._indexes[lang] = None
+            return self._indexes[lang]
+
+    def build_index(self):
+        """Precompute the English index from WordNet.
+
+        Walking WordNet takes a while and holds the GIL, so it runs in a child
+        process; this only waits for it.
+        """
+        start = time.perf_counter()
+        result = subprocess.run(build_command(self.index_path('english')), stdin=subprocess.DEVNULL,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if result.returncode:
+            raise Exception(f"Error building thesaurus index: {result.stderr.decode(errors='replace')[-500:]}")
+        observe('thesaurus_build_seconds', time.perf_counter() - start)
+        logger.info("Built thesaurus index in %.1fs", time.perf_counter() - start)
+        with self._lock:
+            old = self._indexes.pop('english', None)
+        if old is not None:
+            old.close()
+        self.lookup.cache_clear()
+
+    def ensure_index(self, wait=False):
+        """Start building the English index unless it exists or is being built"""
+        # An index of an older version is rebuilt rather than kept
+        if self._index('english') is not None:
+            return
+        with self._lock:
+            if self._build_thread is None or not self._build_thread.is_alive():
+                self._build_thread = threading.Thread(target=self._build_quietly, daemon=True)
+                self._build_thread.start()
+            thread = self._build_thread
+        if wait:
+            thread.join()
+
+    def _build_quietly(self):
+        try:
+            self.build_index()
+        except Exception as e:
+            logger.warning("Could not build thesaurus index: %s", e)
+
+    def _learned_words(self, lang):
+        with self._lock:
+            if lang not in self._learned:
+                learned = {}
+                try:
+                    with open(self._learned_path(lang), encoding='utf-8') as file:
+                        for line in file:
+                            try:
+                                entry = json.loads(line)
+                            except json.JSONDecodeError:
+                                continue  # A torn last line from a crash
+                            learned[entry['word']] = _unique(learned.get(entry['word'], []) + entry['synonyms'])
+                except OSError:
+                    pass
+                self._learned[lang] = learned
+            return self._learned[lang]
+
+    def learn(self, lang, word, word_choices):
+        """Remember the API's word_choices for `word` as synonyms in `lang`"""
+        key = normalize_word(word)
+        synonyms = [normalize_word(choice['word']) for choice in word_choices or () if choice.get('word')]
+        synonyms = [synonym for synonym in synonyms if synonym and synonym != key]
+        if not key or not synonyms:
+            return
+        learned = self._learned_words(lang)
+        with self._lock:
+            if all(synonym in learned.get(key, ()) for synonym in synonyms):
+                return
+            learned[key] = _unique(learned.get(key, []) + synonyms)
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                with open(self._learned_path(lang), 'a', encoding='utf-8') as file:
+                    file.write(json.dumps({'word': key, 'synonyms': synonyms}, ensure_ascii=False) + '\n')
+            except OSError as e:
+                logger.warning("Could not save thesaurus entry: %s", e)
+        self.lookup.cache_clear()
+
+    def _index_entries(self, index, key):
+        """Index entries for key, or for its base forms when key itself is not a WordNet word"""
+        entry = index.get(key)
+        if entry is not None:
+            return [entry]
+        entries = {}
+        for pos, rules in MORPHY_SUFFIXES.items():
+            for suffix, replacement in rules:
+                if key.endswith(suffix) and len(key) > len(suffix):
+                    base = key[:-len(suffix)] + replacement
+                    entry = entries.get(base) or index.get(base)
+                    if entry is not None and pos in entry[2]:
+                        entries[base] = entry
+        return list(entries.values())
+
+    def _lookup(self, word, lang):
+        """(synonyms, antonyms) as tuples; memoized, so call it as self.lookup(word, lang)"""
+        start = time.perf_counter()
+        key = normalize_word(word)
+        synonyms = []
+        antonyms = []
+        if key:
+            index = self._index(lang)
+            if index is not None:
+                for entry_synonyms, entry_antonyms, _ in self._index_entries(index, key):
+                    synonyms.extend(entry_synonyms)
+                    antonyms.extend(entry_antonyms)
+            elif lang == 'english':
+                # No index yet: answer from WordNet directly and build the index for next time
+                synonyms, antonyms = wordnet_entry(_load_wordnet(), key)
+                self.ensure_index()
+            synonyms.extend(self._learned_words(lang).get(key, ()))
+        observe('thesaurus_lookup_seconds', time.perf_counter() - start, lang=lang)
+        return tuple(_unique(synonyms)), tuple(_unique(antonyms))
+
+    def close(self):
+        with self._lock:
+            for index in self._indexes.values():
+                if index is not None:
+                    index.close()
+            self._indexes.clear()
+        self.lookup.cache_clear()
+
+
+if __name__ == '__main__':
+    main()
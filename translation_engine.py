@@ -0,0 +1,480 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+
+from api_client import (CANCEL_POLL, RETRY_STATUSES, CircuitOpenError, LibreNodeClient, TranslationCancelled,
+                        default_base_url, default_rate_limit)
+from batching import FLUSH_FILL, MARKER_OVERHEAD, PayloadSizer, can_pack, default_batch_chars, pack, unpack
+from dedup import SegmentDeduplicator, needs_translation
+from engine_router import EngineRouter
+from language_detect import detect_language
+from metrics import incr, timer
+from segmenter import MAX_CHARS, chunk_spans, reassemble
+
+DEFAULT_WORKERS = 4  # Concurrent chunk requests (adjust as needed)
+
+# Map language names to their correct API codes
+LANGUAGE_CODES = {
+    'english': 'en',
+    'spanish': 'es',
+    'french': 'fr',
+    'german': 'de',
+    'russian': 'ru',
+    'chinese': 'zh',
+    'italian': 'it',
+    'detect': 'auto'  # Detected per chunk, see AUTO_SOURCE
+}
+
+# Map engine names to their API identifiers
+ENGINE_CODES = {
+    'google': 'google',
+    'duckduckgo': 'duckduckgo',
+    'yandex': 'yandex',
+    'deepl': 'deepl',
+    'auto': 'auto'
+}
+
+AUTO_ENGINE = 'auto'
+AUTO_SOURCE = 'auto'  # Source language detected from each chunk before it is sent
+MIN_DETECT_CONFIDENCE = 0.2  # Less certain chunks are sent with from=auto for the API to detect
+SAME_LANGUAGE_CONFIDENCE = 0.8  # Chunks detected as the target language are only skipped when this sure
+SAME_LANGUAGE_MIN_CHARS = 80  # ... and at least this long
+
+# Markers translate_chunk returns in place of a translation
+_failure_re = re.compile(r'\[(Chunk \d+ (failed|error)|Deepl translation failed)\b')
+
+logger = logging.getLogger(__name__)
+
+
+def is_failure(text):
+    """Whether a translate_chunk result is a failure marker rather than a translation"""
+    return bool(_failure_re.match(text))
+
+
+def _wait(ready, timeout=None, cancel_event=None):
+    """Poll ready(seconds) until it returns something truthy or timeout passes.
+
+    Raises TranslationCancelled once cancel_event is set.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        if cancel_event is not None and cancel_event.is_set():
+            raise TranslationCancelled()
+        remaining = CANCEL_POLL if deadline is None else min(CANCEL_POLL, deadline - time.monotonic())
+        if remaining <= 0:
+            return None
+        result = ready(remaining)
+        if result:
+            return result
+
+
+class TranslationFailed(Exception):
+    """The API answered, but without a usable translation; str() is the marker shown to the user"""
+
+
+class TranslationEngine:
+    """Translate chunks in parallel over a shared keep-alive HTTP session"""
+
+    def __init__(self, max_workers=DEFAULT_WORKERS, client=None, memory=None, router=None, sizer=None):
+        self.max_workers = max(1, int(max_workers))
+        # Hedging can put two requests per worker on the wire
+        self.client = client or LibreNodeClient(default_base_url(), pool_size=self.max_workers * 2,
+                                                rate_limit=default_rate_limit())
+        self.memory = memory
+        self.router = router or EngineRouter(hedge=os.environ.get('DOTRANSLATE_HEDGE', '1') != '0')
+        # Send repeated segments once and skip those without text
+        self.dedupe = os.environ.get('DOTRANSLATE_DEDUP', '1') != '0'
+        # Short segments share requests up to a per-engine size limit; a maximum of 0 turns this off
+        self.sizer = sizer or PayloadSizer(default_batch_chars())
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                           thread_name_prefix='translate')
+        # Auto mode issues its per-engine requests here so chunk workers never wait on their own pool
+        self.hedge_executor = ThreadPoolExecutor(max_workers=self.max_workers * 2,
+                                                 thread_name_prefix='hedge')
+
+    def detect_source(self, chunk, target_lang=None):
+        """API code of the language chunk is written in, or AUTO_SOURCE when detection is unsure.
+
+        A chunk detected as target_lang is left untranslated, so that takes
+        a sure detection of a longer chunk; mixed text such as a German
+        sentence quoting an English title is left to the API instead.
+        """
+        language, confidence = detect_language(chunk)
+        if language is not None and LANGUAGE_CODES[language] == target_lang and (
+                confidence < SAME_LANGUAGE_CONFIDENCE or len(chunk) < SAME_LANGUAGE_MIN_CHARS):
+            language = None
+        if language is None or confidence < MIN_DETECT_CONFIDENCE:
+            incr('language_detections', language='unsure')
+            return AUTO_SOURCE
+        incr('language_detections', language=language)
+        return LANGUAGE_CODES[language]
+
+    def translate_chunk(self, idx, chunk, source_lang, target_lang, engine, cancel_event=None):
+        """Translate a single chunk, returning (text, word_choices)"""
+        return self._translate(idx, chunk, source_lang, target_lang, engine, cancel_event=cancel_event)[0]
+
+    def _translate(self, idx, chunk, source_lang, target_lang, engine, packed=False, cancel_event=None):
+        """translate_chunk, returning ((text, word_choices), engine that answered or None).
+
+        Packed payloads bypass the translation memory; their segments are
+        remembered one by one instead.
+        """
+        if source_lang == AUTO_SOURCE and not packed:
+            # A pack's segments were detected one by one; AUTO_SOURCE there means none was sure
+            source_lang = self.detect_source(chunk, target_lang)
+        if source_lang == target_lang:
+            return (chunk, None), None  # Already in the target language; never assumed for an unsure detection
+        try:
+            if engine == AUTO_ENGINE:
+                return self._translate_auto(idx, chunk, source_lang, target_lang, packed, cancel_event)
+            return self._request(idx, chunk, source_lang, target_lang, engine, packed, cancel_event), engine
+        except TranslationFailed as failure:
+            return (str(failure), None), None
+        except (CircuitOpenError, requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            # Retries are exhausted: lose this chunk rather than the whole document
+            return (f"[Chunk {idx+1} failed: {str(e)}]", None), None
+        except requests.exceptions.HTTPError as e:
+            if e.response is not None and e.response.status_code in RETRY_STATUSES:
+                return (f"[Chunk {idx+1} failed: {str(e)}]", None), None
+            raise
+
+    def _request(self, idx, chunk, source_lang, target_lang, engine, packed=False, cancel_event=None,
+                 sent=None):
+        """Translate a chunk with one engine; raises TranslationFailed on an unusable response.
+
+        sent is set once the request has its rate limiter token and goes out.
+        """
+        if self.memory is not None and not packed:
+            cached = self.memory.get(engine, source_lang, target_lang, chunk)
+            incr('translation_memory_lookups', result='miss' if cached is None else 'hit')
+            if cached is not None:
+                return cached
+        payload = {
+            'from': source_lang,
+            'to': target_lang,
+            'engine': engine,
+            'text': chunk
+        }
+        latency = 0.0
+        ok = False
+        try:
+            response = self.client.translate(payload, cancel_event, sent)
+            # The attempt that answered, without our own rate limiting and retry backoff
+            latency = response.elapsed.total_seconds()
+            incr('http_sent_bytes', len(chunk.encode('utf-8')), engine=engine)
+            incr('http_received_bytes', len(response.content), engine=engine)
+            logger.debug("Chunk %d via %s: %d chars, HTTP %d in %.3fs",
+                         idx + 1, engine, len(chunk), response.status_code, latency)
+            try:
+                result = response.json()
+            except json.JSONDecodeError as json_err:
+                raise TranslationFailed(f"[Chunk {idx+1} error: {str(json_err)}]")
+            # Deepl-specific error handling
+            if engine == 'deepl' and (not result.get('translated-text')):
+                raise TranslationFailed('[Deepl translation failed: No result returned. Try another engine or check API status.]')
+            if 'translated-text' not in result:
+                raise TranslationFailed(f"[Chunk {idx+1} failed: Unexpected response format]")
+            ok = True
+        except TranslationCancelled:
+            ok = None  # Says nothing about the engine
+            raise
+        finally:
+            if ok is not None:
+                self.router.record(engine, latency, ok)
+                self.sizer.record(engine, latency, ok, len(chunk))
+                incr('http_requests', engine=engine, outcome='ok' if ok else 'error')
+        translation, word_choices = result['translated-text'], result.get('word_choices')
+        if self.memory is not None and translation and not packed:
+            self.memory.put(engine, source_lang, target_lang, chunk, translation, word_choices)
+        return translation, word_choices
+
+    def _translate_auto(self, idx, chunk, source_lang, target_lang, packed=False, cancel_event=None):
+        """Route a chunk to the fastest healthy engine, hedging with the runner-up when it is slow.
+
+        Returns (result, engine that answered).
+        """
+        ranked = self.router.ranked()
+        if self.memory is not None and not packed:
+            for engine in ranked:
+                cached = self.memory.get(engine, source_lang, target_lang, chunk)
+                if cached is not None:
+                    incr('translation_memory_lookups', result='hit')
+                    return cached, engine
+            incr('translation_memory_lookups', result='miss')
+
+        def attempt(engine):
+            # Each attempt has its own cancel event so a losing request stops retrying
+            stop = threading.Event()
+            sent = threading.Event()
+            future = self.hedge_executor.submit(
+                self._request, idx, chunk, source_lang, target_lang, engine, packed, stop, sent)
+            future.add_done_callback(lambda _: sent.set())
+            attempts[future] = engine, stop
+            return sent
+
+        def settle(timeout=None):
+            """Attempts done within timeout, passing a cancelled job on to them"""
+            return _wait(lambda remaining: wait(attempts, remaining, FIRST_COMPLETED)[0],
+                         timeout, cancel_event)
+
+        attempts = {}  # Future -> (engine, its cancel event)
+        try:
+            sent = attempt(ranked[0])
+            fallbacks = list(ranked[1:])
+            if self.router.hedge and fallbacks:
+                # The router's latencies leave out rate limiting and backoff, so the hedge
+                # clock starts once the preferred engine's request is on the wire
+                _wait(sent.wait, None, cancel_event)
+                if not settle(self.router.hedge_delay(ranked[0])):
+                    attempt(fallbacks.pop(0))
+            last_error = None
+            while attempts:
+                for future in settle():
+                    engine, _ = attempts.pop(future)
+                    try:
+                        result = future.result()
+                    except (TranslationFailed, requests.exceptions.RequestException) as e:
+                        last_error = e
+                        continue
+                    return result, engine
+                if not attempts and fallbacks:
+                    # Every engine tried so far failed: move down the ranking
+                    attempt(fallbacks.pop(0))
+            # Every engine failed; translate_chunk turns this into a marker like a fixed engine's failure
+            raise last_error
+        finally:
+            # Stop the loser, and every attempt of a cancelled job
+            for _, stop in attempts.values():
+                stop.set()
+
+    def _sized_engine(self, engine):
+        """Engine whose pack size applies to a request for engine; Auto packs for its preferred engine"""
+        return self.router.ranked()[0] if engine == AUTO_ENGINE else engine
+
+    def batch_limit(self, engine):
+        """Characters that may be packed into one request to engine; 0 when packing is off"""
+        if not self.sizer.maximum:
+            return 0
+        return self.sizer.limit(self._sized_engine(engine))
+
+    def _remembered(self, chunk, source_lang, target_lang, engine):
+        """A segment's translation from the memory, or None"""
+        if self.memory is None:
+            return None
+        for candidate in (self.router.ranked() if engine == AUTO_ENGINE else [engine]):
+            cached = self.memory.get(candidate, source_lang, target_lang, chunk)
+            if cached is not None:
+                return cached
+        return None
+
+    def translate_batch(self, batch, source_lang, target_lang, engine, cancel_event=None):
+        """Translate [(idx, chunk)] in one request, returning [(idx, (text, word_choices))].
+
+        Segments already in the translation memory are answered from it. When
+        the markers between the others do not survive translation, or the pack
+        is refused as too large, each segment is sent on its own.
+        """
+        def one_by_one(segments):
+            return [(idx, self.translate_chunk(idx, chunk, source_lang, target_lang, engine, cancel_event))
+                    for idx, chunk in segments]
+
+        if len(batch) == 1 or source_lang == target_lang:
+            return one_by_one(batch)
+        results = []
+        missing = []
+        for idx, chunk in batch:
+            cached = self._remembered(chunk, source_lang, target_lang, engine)
+            if cached is None:
+                missing.append((idx, chunk))
+            else:
+                incr('translation_memory_lookups', result='hit')
+                results.append((idx, cached))
+        if len(missing) <= 1:
+            return results + one_by_one(missing)
+        answered = None
+        try:
+            (text, _), answered = self._translate(missing[0][0], pack([chunk for _, chunk in missing]),
+                                                  source_lang, target_lang, engine, packed=True,
+                                                  cancel_event=cancel_event)
+        except requests.exceptions.HTTPError as e:
+            # Some deployments cap the request size below ours
+            if e.response is None or e.response.status_code not in (400, 413):
+                raise
+            text = None
+        if text is not None and is_failure(text):
+            return results + [(idx, (text, None)) for idx, _ in missing]
+        translations = None if text is None else unpack(text, len(missing))
+        # Shrink the engine that answered; a refused pack counts against the one it was sized for
+        answered = answered or self._sized_engine(engine)
+        if translations is None:
+            self.sizer.shrink(answered)
+            incr('batch_fallbacks', engine=answered)
+            logger.info("Batch of %d segments came back unusable; sending them one by one", len(missing))
+            return results + one_by_one(missing)
+        incr('batched_segments', len(missing), engine=answered)
+        for (idx, chunk), translation in zip(missing, translations):
+            if self.memory is not None and translation:
+                self.memory.put(answered, source_lang, target_lang, chunk, translation)
+            results.append((idx, (translation, None)))
+        return results
+
+    def iter_translations(self, chunks, source_lang, target_lang, engine, cancel_event=None, window=None,
+                          dedup=None):
+        """Yield (idx, (text, word_choices)) for each chunk as soon as it completes.
+
+        `chunks` may be any iterable, including a generator still reading a
+        document; at most `window` requests are queued ahead of the pool.
+        Consecutive short chunks are packed into one request up to
+        batch_limit(). Pass a SegmentDeduplicator as `dedup` to read how many
+        requests it saved.
+        """
+        window = window or self.max_workers * 4
+        if dedup is None and self.dedupe:
+            dedup = SegmentDeduplicator()
+
+        def unique():
+            for idx, chunk in enumerate(chunks):
+                if dedup is None or dedup.add(idx, chunk):
+                    # Chunks too short to tell are left to the API's own detection
+                    if source_lang == AUTO_SOURCE:
+                        yield idx, chunk, self.detect_source(chunk, target_lang)
+                    else:
+                        yield idx, chunk, source_lang
+
+        def batches():
+            batch = []
+            size = 0
+            limit = self.batch_limit(engine)
+            for idx, chunk, source in unique():
+                cost = len(chunk) + MARKER_OVERHEAD
+                if batch and (source != batch[0][2] or size + cost > limit or not can_pack(chunk)):
+                    yield batch
+                    batch, size, limit = [], 0, self.batch_limit(engine)
+                batch.append((idx, chunk, source))
+                size += cost
+                # Send a well-filled batch now rather than wait on a document still being read
+                if size >= limit * FLUSH_FILL or not can_pack(chunk):
+                    yield batch
+                    batch, size, limit = [], 0, self.batch_limit(engine)
+            if batch:
+                yield batch
+
+        def run(batch):
+            if cancel_event is not None and cancel_event.is_set():
+                raise TranslationCancelled()
+            return self.translate_batch([(idx, chunk) for idx, chunk, _ in batch], batch[0][2],
+                                        target_lang, engine, cancel_event)
+
+        def finished(timeout):
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if cancel_event is not None and cancel_event.is_set():
+                raise TranslationCancelled()
+            results = []
+            for future in done:
+                del pending[future]
+                results.extend(future.result())
+            if dedup is not None:
+                for idx, result in results:
+                    dedup.resolved(idx, result)
+                results.extend(dedup.ready())
+            return results
+
+        pending = {}
+        try:
+            for batch in batches():
+                if cancel_event is not None and cancel_event.is_set():
+                    raise TranslationCancelled()
+                pending[self.executor.submit(run, batch)] = batch
+                # Hand back whatever is done; only block when the window is full
+                yield from finished(None if len(pending) >= window else 0)
+            while pending:
+                yield from finished(None)
+            if dedup is not None:
+                yield from dedup.ready()
+        finally:
+            # Drop queued requests when cancelled or on the first failure
+            for future in pending:
+                future.cancel()
+
+    def translate_chunks(self, chunks, source_lang, target_lang, engine):
+        """Translate all chunks concurrently and return the results in input order"""
+        if len(chunks) == 1:
+            if self.dedupe and not needs_translation(chunks[0]):
+                return [(chunks[0], None)]
+            # No point paying for a thread hop on short texts
+            return [self.translate_chunk(0, chunks[0], source_lang, target_lang, engine)]
+        results = [None] * len(chunks)
+        for idx, result in self.iter_translations(chunks, source_lang, target_lang, engine):
+            results[idx] = result
+        return results
+
+    def translate_items(self, items, source_lang, target_lang, engine, cancel_event=None, dedup=None):
+        """Translate a stream of (separator, chunk) pairs, returning (translation, word_choices)"""
+        separators = []
+
+        def texts():
+            for separator, chunk in items:
+                separators.append(separator)
+                yield chunk
+
+        results = {}
+        for idx, result in self.iter_translations(texts(), source_lang, target_lang, engine, cancel_event,
+                                                  dedup=dedup):
+            results[idx] = result
+        if not results:
+            return '', None
+        parts = []
+        for idx, separator in enumerate(separators):
+            parts.append(separator)
+            parts.append(results[idx][0])
+        return ''.join(parts), results[0][1]
+
+    def translate_texts(self, texts, source_lang, target_lang, engine, max_chars=MAX_CHARS):
+        """Translate several texts together so their short chunks can share requests.
+
+        Returns one (translation, word_choices) per text.
+        """
+        with timer('chunking_seconds'):
+            spans = [chunk_spans(text, max_chars) for text in texts]
+        results = self.translate_chunks([chunk.text for chunks in spans for chunk in chunks],
+                                        source_lang, target_lang, engine)
+        translations = []
+        position = 0
+        for text, chunks in zip(texts, spans):
+            done = results[position:position + len(chunks)]
+            position += len(chunks)
+            if not chunks:
+                translations.append(('', None))
+                continue
+            translations.append((reassemble(text, chunks, [translation for translation, _ in done]), done[0][1]))
+        return translations
+
+    def translate_text(self, text, source_lang, target_lang, engine, max_chars=MAX_CHARS):
+        """Chunk and translate a whole text, returning (translation, word_choices)"""
+        with timer('chunking_seconds'):
+            chunks = chunk_spans(text, max_chars)
+        if not chunks:
+            return '', None
+        results = self.translate_chunks([chunk.text for chunk in chunks], source_lang, target_lang, engine)
+        return reassemble(text, chunks, [translation for translation, _ in results]), results[0][1]
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.hedge_executor.shutdown(wait=False, cancel_futures=True)
+        self.client.close()
+        if self.memory is not None:
+            self.memory.close()
+
+
+def default_workers():
+    """Concurrency from DOTRANSLATE_WORKERS, falling back to DEFAULT_WORKERS"""
+    try:
+        return max(1, int(os.environ.get('DOTRANSLATE_WORKERS', DEFAULT_WORKERS)))
+    except ValueError:
+        return DEFAULT_WORKERS
@@ -0,0 +1,146 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+MAX_ENTRIES = 50000  # Least recently used entries are evicted beyond this
+TTL_SECONDS = 30 * 24 * 3600  # Cached translations expire after 30 days
+
+_whitespace_re = re.compile(r'[ \t\r\f\v]+')
+
+logger = logging.getLogger(__name__)
+
+
+def cache_dir():
+    """Per-user cache directory, honouring XDG_CACHE_HOME and LOCALAPPDATA"""
+    base = (os.environ.get('XDG_CACHE_HOME') or os.environ.get('LOCALAPPDATA')
+            or os.path.join(os.path.expanduser('~'), '.cache'))
+    path = os.path.join(base, 'dotranslate')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def segment_hash(text):
+    """Hash of a chunk after Unicode and whitespace normalization"""
+    normalized = unicodedata.normalize('NFC', text)
+    normalized = _whitespace_re.sub(' ', normalized).strip()
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+class TranslationMemory:
+    """On-disk translation cache keyed by (engine, from, to, segment hash)"""
+
+    def __init__(self, path=None, max_entries=MAX_ENTRIES, ttl=TTL_SECONDS):
+        self.path = path or os.path.join(cache_dir(), 'translation_memory.sqlite3')
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS memory (
+                engine TEXT NOT NULL,
+                source TEXT NOT NULL,
+                target TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                translation TEXT NOT NULL,
+                word_choices TEXT,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (engine, source, target, hash)
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS memory_last_used ON memory (last_used)')
+        self._conn.commit()
+        self._count = self._conn.execute('SELECT COUNT(*) FROM memory').fetchone()[0]
+
+    def get(self, engine, source_lang, target_lang, text):
+        """Return (translation, word_choices) or None on a miss"""
+        key = (engine, source_lang, target_lang, segment_hash(text))
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT translation, word_choices, created FROM memory '
+                'WHERE engine=? AND source=? AND target=? AND hash=?', key).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            translation, word_choices, created = row
+            if self.ttl and now - created > self.ttl:
+                self._conn.execute(
+                    'DELETE FROM memory WHERE engine=? AND source=? AND target=? AND hash=?', key)
+                self._conn.commit()
+                self._count -= 1
+                self.misses += 1
+                return None
+            self._conn.execute(
+                'UPDATE memory SET last_used=? WHERE engine=? AND source=? AND target=? AND hash=?',
+                (now,) + key)
+            self._conn.commit()
+            self.hits += 1
+        return translation, json.loads(word_choices) if word_choices else None
+
+    def put(self, engine, source_lang, target_lang, text, translation, word_choices=None):
+        key = (engine, source_lang, target_lang, segment_hash(text))
+        now = time.time()
+        choices = json.dumps(word_choices) if word_choices else None
+        with self._lock:
+            cursor = self._conn.execute(
+                'UPDATE memory SET translation=?, word_choices=?, created=?, last_used=? '
+                'WHERE engine=? AND source=? AND target=? AND hash=?',
+                (translation, choices, now, now) + key)
+            if cursor.rowcount == 0:
+                self._conn.execute(
+                    'INSERT INTO memory VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    key + (translation, choices, now, now))
+                self._count += 1
+            if self._count > self.max_entries:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        # Trim to 90% of capacity so eviction is not paid on every insert
+        if self.ttl:
+            self._conn.execute('DELETE FROM memory WHERE created < ?', (time.time() - self.ttl,))
+        keep = int(self.max_entries * 0.9)
+        self._conn.execute(
+            'DELETE FROM memory WHERE rowid IN ('
+            'SELECT rowid FROM memory ORDER BY last_used ASC LIMIT max(0, '
+            '(SELECT COUNT(*) FROM memory) - ?))', (keep,))
+        self._count = self._conn.execute('SELECT COUNT(*) FROM memory').fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM memory')
+            self._conn.commit()
+            self._conn.execute('VACUUM')
+            self._count = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        return {'entries': self._count, 'hits': self.hits, 'misses': self.misses}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def open_default_memory():
+    """Open the user's translation memory unless DOTRANSLATE_CACHE=off"""
+    setting = os.environ.get('DOTRANSLATE_CACHE', '')
+    if setting.lower() in ('0', 'off', 'false', 'no'):
+        return None
+    try:
+        return TranslationMemory(path=setting or None)
+    except (OSError, sqlite3.Error) as e:
+        logger.warning("Translation memory disabled: %s", e)
+        return None
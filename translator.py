@@ -1,32 +1,58 @@
+import time
+_startup_t0 = time.perf_counter()
+import sys
+if len(sys.argv) > 1 and sys.argv[1] == '--build-thesaurus':
+    # PyInstaller builds run the thesaurus index build as a child copy of the app, see thesaurus.build_command
+    from thesaurus import main as build_thesaurus
+    build_thesaurus(sys.argv[1:])
+    sys.exit(0)
+from startup import StartupProfile
+# Strip --profile-startup before Kivy gets to parse sys.argv
+startup_profile = StartupProfile.from_argv(sys.argv, start=_startup_t0)
+
 from kivy.app import App
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.button import Button
 from kivy.uix.textinput import TextInput
 from kivy.uix.label import Label
 from kivy.uix.spinner import Spinner
-from kivy.uix.scrollview import ScrollView
 from kivy.core.window import Window
-from kivy.uix.gridlayout import GridLayout
 from kivy.metrics import dp
 from kivy.core.clipboard import Clipboard
 from kivy.config import Config
-from kivy.core.text import Label as CoreLabel
-from kivy.uix.filechooser import FileChooserListView
-from kivy.uix.popup import Popup
 from kivy.uix.widget import Widget
-from kivy.properties import ObjectProperty
+from kivy.uix.progressbar import ProgressBar
+from kivy.uix.togglebutton import ToggleButton
+from kivy.clock import Clock
+if startup_profile:
+    startup_profile.mark_toolkit()
 import os
+import threading
+import logging
 import requests
 import json
-import pytesseract
-from PIL import Image
-import PyPDF2
-import io
-import re
-from PyDictionary import PyDictionary
-import nltk
+from metrics import METRICS, configure_logging, configure_metrics
+from translation_engine import (AUTO_SOURCE, TranslationEngine, TranslationCancelled, default_workers,
+                                LANGUAGE_CODES, ENGINE_CODES)
+from translation_memory import open_default_memory
+from segmenter import MAX_CHARS, chunk_pages
+from dedup import SegmentDeduplicator, split_boilerplate
+from incremental import LIVE_DELAY, TranslationSession
+from language_detect import detect_language
+from segment_viewer import SegmentViewer
+from extraction import extract_text_from_file, warm_up as warm_up_extraction
+from pdf_text import iter_pdf_pages
+from ocr import get_ocr_engine
+from thesaurus import Thesaurus, wordnet_available
+
+WARMUP_DELAY = 1.0  # Seconds after the first frame before preloading OCR/PDF/NLTK
+VIEWER_MIN_PAGES = 20  # PDFs with at least this many pages open in the segment viewer
+MISMATCH_CONFIDENCE = 0.6  # Detections this sure are suggested when they disagree with the chosen source language
+
+logger = logging.getLogger(__name__)
 
-MAX_CHARS = 1000  # Maximum characters per API request (adjust as needed)
+if startup_profile:
+    startup_profile.mark('imports')
 
 # Configure keyboard shortcuts
 Config.set('kivy', 'exit_on_escape', '0')
@@ -53,7 +79,7 @@ class CustomTitleBar(BoxLayout):
         # Source language spinner with fixed size
         self.source_lang = Spinner(
             text='English',
-            values=('English', 'Spanish', 'French', 'German', 'Russian', 'Chinese', 'Italian'),
+            values=('English', 'Spanish', 'French', 'German', 'Russian', 'Chinese', 'Italian', 'Detect'),
             size_hint=(None, None),
             size=(dp(100), dp(40)),
             pos_hint={'center_y': 0.5}
@@ -96,8 +122,23 @@ class TranslationApp(App):
         self.font_path = self._find_font()
         self.file_chooser = None
         self.popup = None
-        self.thesaurus = PyDictionary()
+        self._thesaurus = None
         self.enabled_thesaurus_langs = set(['english'])  # Default to English; user can add more
+        self.current_job = None  # Cancel event of the running background job
+        self.pages_read = (0, 0)  # (pages read, page count) of the document being streamed
+        self.viewer_active = False  # Segment viewer shown instead of the two text boxes
+        self.session = TranslationSession(MAX_CHARS)  # Last run's segments, so edits only re-send what changed
+        self.live_job = None  # Cancel event of the job started by live translation
+        self.exit_code = 0
+        self.engine_client = TranslationEngine(max_workers=default_workers(),
+                                               memory=open_default_memory())
+    
+    @property
+    def thesaurus(self):
+        # The index is memory-mapped on the first lookup, not at startup
+        if self._thesaurus is None:
+            self._thesaurus = Thesaurus()
+        return self._thesaurus
     
     def _find_font(self):
         """Find a suitable font for Chinese characters"""
@@ -118,6 +159,8 @@ class TranslationApp(App):
         return None
     
     def show_file_chooser(self, instance):
+        from kivy.uix.filechooser import FileChooserListView
+        from kivy.uix.popup import Popup
         content = BoxLayout(orientation='vertical')
         self.file_chooser = FileChooserListView(
             path=os.path.expanduser('~'),
@@ -127,12 +170,15 @@ class TranslationApp(App):
         
         buttons = BoxLayout(size_hint_y=None, height=dp(44))
         select_btn = Button(text='Select')
+        translate_btn = Button(text='Select & Translate')
         cancel_btn = Button(text='Cancel')
         
         select_btn.bind(on_press=self.process_selected_file)
+        translate_btn.bind(on_press=lambda instance: self.process_selected_file(instance, translate=True))
         cancel_btn.bind(on_press=self.dismiss_popup)
         
         buttons.add_widget(select_btn)
+        buttons.add_widget(translate_btn)
         buttons.add_widget(cancel_btn)
         content.add_widget(buttons)
         
@@ -143,66 +189,78 @@ class TranslationApp(App):
         if self.popup:
             self.popup.dismiss()
     
-    def process_selected_file(self, instance):
+    def process_selected_file(self, instance, translate=False):
         if self.file_chooser and self.file_chooser.selection:
             file_path = self.file_chooser.selection[0]
             self.dismiss_popup(instance)
             
-            try:
-                if file_path.lower().endswith(('.png', '.jpg', '.jpeg')):
-                    text = self.extract_text_from_image(file_path)
-                elif file_path.lower().endswith('.pdf'):
-                    text = self.extract_text_from_pdf(file_path)
-                else:
-                    self.result_text.text = "Unsupported file format"
-                    return
-                
-                self.input_text.text = text
-            except Exception as e:
-                self.result_text.text = f"Error processing file: {str(e)}"
-    
-    def extract_text_from_image(self, image_path):
-        try:
-            image = Image.open(image_path)
-            
-            # Determine the language for OCR based on source language
-            lang_codes = {
-                'English': 'eng',
-                'Chinese': 'chi_sim+chi_tra',  # Use both simplified and traditional Chinese
-                'Russian': 'rus',
-                'German': 'deu',
-                'French': 'fra',
-                'Spanish': 'spa',
-                'Italian': 'ita'
-            }
+            if not file_path.lower().endswith(('.png', '.jpg', '.jpeg', '.pdf')):
+                self.result_text.text = "Unsupported file format"
+                return
             
-            # Get the source language from the spinner
+            # OCR and PDF parsing can take seconds, so keep them off the UI thread
+            params = self.translation_params() if translate else None
+            cancel_event = self.start_job(f"Extracting text from {os.path.basename(file_path)}...")
             source_lang = self.title_bar.source_lang.text
-            lang = lang_codes.get(source_lang, 'eng')
-            
-            # Configure tesseract parameters for better accuracy
-            custom_config = f'-l {lang} --psm 3'
-            
-            # Preprocess image for better OCR
-            # Convert to RGB if image is in RGBA
-            if image.mode == 'RGBA':
-                image = image.convert('RGB')
-            
-            text = pytesseract.image_to_string(image, config=custom_config)
-            return text.strip()
+            self.input_text.text = ''
+            if translate:
+                self.result_text.text = ''
+            threading.Thread(
+                target=self._extract_file_worker,
+                args=(file_path, source_lang, params, cancel_event),
+                daemon=True
+            ).start()
+    
+    def _extract_file_worker(self, file_path, source_lang, params, cancel_event):
+        errors = []
+        if file_path.lower().endswith('.pdf'):
+            pages = self._read_pdf_pages(file_path, source_lang, cancel_event, errors)
+        else:
+            pages = self._read_image(file_path, source_lang, cancel_event, errors)
+        if self.engine_client.dedupe:
+            items = split_boilerplate(pages, MAX_CHARS)
+        else:
+            items = chunk_pages(pages, MAX_CHARS)
+        if params is None:
+            for _ in self._record_segments(items, cancel_event):
+                if cancel_event.is_set():
+                    break
+        else:
+            # Pages are chunked and translated while later pages are still being read
+            self.run_translation(items, None, params, cancel_event, errors)
+            return
+        self.finish_job(cancel_event, error=errors[0] if errors else None)
+    
+    def _record_segments(self, items, cancel_event):
+        """Pass (separator, chunk, page) items through, adding each to the segment viewer"""
+        for separator, chunk, page in items:
+            Clock.schedule_once(
+                lambda dt, item=(separator, chunk, page): self.add_segment(cancel_event, *item))
+            yield separator, chunk, page
+    
+    def _read_image(self, file_path, source_lang, cancel_event, errors):
+        try:
+            text = extract_text_from_file(file_path, source_lang)
         except Exception as e:
-            raise Exception(f"Error extracting text from image: {str(e)}")
+            errors.append(f"Error processing file: {str(e)}")
+            return
+        Clock.schedule_once(lambda dt: self.append_input(cancel_event, text))
+        yield None, text
     
-    def extract_text_from_pdf(self, pdf_path):
+    def _read_pdf_pages(self, file_path, source_lang, cancel_event, errors):
+        """Yield (page number, text) as pages are parsed, mirroring them into the input box"""
+        self.pages_read = (0, 0)
         try:
-            text = ""
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                for page in pdf_reader.pages:
-                    text += page.extract_text() + "\n"
-            return text.strip()
+            for page_idx, (page_number, page_count, text) in enumerate(
+                    iter_pdf_pages(file_path, source_lang), 1):
+                separator = '\n' if page_idx > 1 else ''
+                Clock.schedule_once(lambda dt, text=separator + text: self.append_input(cancel_event, text))
+                Clock.schedule_once(
+                    lambda dt, page_idx=page_idx, page_count=page_count: self.update_pages(
+                        cancel_event, page_idx, page_count))
+                yield page_number, text
         except Exception as e:
-            raise Exception(f"Error extracting text from PDF: {str(e)}")
+            errors.append(f"Error processing file: {str(e)}")
     
     def build(self):
         # Set minimum window size
@@ -235,12 +293,12 @@ class TranslationApp(App):
             orientation='horizontal',
             # Remove default stretching
             size_hint_x=None,
-            width=dp(900)  # Fixed width for the button row
+            width=dp(1140)  # Fixed width for the button row
         )
         # Engine spinner with fixed size
         self.engine = Spinner(
             text='Google',
-            values=('Google', 'DuckDuckGo', 'Yandex', 'DeepL'),
+            values=('Auto', 'Google', 'DuckDuckGo', 'Yandex', 'DeepL'),
             size_hint=(None, None),
             size=(dp(150), dp(40)),
             pos_hint={'center_y': 0.5}
@@ -277,6 +335,22 @@ class TranslationApp(App):
             pos_hint={'center_y': 0.5}
         )
         thesaurus_btn.bind(on_press=self.select_thesaurus_languages)
+        # Translation memory button with fixed size
+        cache_btn = Button(
+            text='Clear Cache',
+            size_hint=(None, None),
+            size=(dp(120), dp(40)),
+            pos_hint={'center_y': 0.5}
+        )
+        cache_btn.bind(on_press=self.clear_translation_memory)
+        # Session metrics summary
+        metrics_btn = Button(
+            text='Metrics',
+            size_hint=(None, None),
+            size=(dp(100), dp(40)),
+            pos_hint={'center_y': 0.5}
+        )
+        metrics_btn.bind(on_press=self.show_metrics)
         # Container to left-align the buttons
         left_buttons = BoxLayout(orientation='horizontal', size_hint=(None, 1))
         left_buttons.width = sum([
@@ -289,6 +363,10 @@ class TranslationApp(App):
             dp(150),  # copy_btn
             10,
             dp(180),  # thesaurus_btn
+            10,
+            dp(120),  # cache_btn
+            10,
+            dp(100),  # metrics_btn
             10
         ])
         left_buttons.spacing = 10
@@ -298,10 +376,51 @@ class TranslationApp(App):
         left_buttons.add_widget(translate_btn)
         left_buttons.add_widget(copy_btn)
         left_buttons.add_widget(thesaurus_btn)
+        left_buttons.add_widget(cache_btn)
+        left_buttons.add_widget(metrics_btn)
         # Add left_buttons to engine_layout
         engine_layout.add_widget(left_buttons)
         # Remove extra flexible spaces
         
+        # Progress row for background translation and file extraction
+        progress_layout = BoxLayout(
+            size_hint_y=None,
+            height=dp(30),
+            spacing=10,
+            padding=[10, 0],
+            orientation='horizontal'
+        )
+        self.progress_bar = ProgressBar(max=1, value=0)
+        self.status_label = Label(text='', size_hint_x=None, width=dp(220))
+        self.cancel_btn = Button(
+            text='Cancel',
+            size_hint=(None, None),
+            size=(dp(100), dp(30)),
+            disabled=True
+        )
+        self.cancel_btn.bind(on_press=self.cancel_job)
+        # Switch between the text boxes and the side-by-side segment viewer
+        self.segments_btn = ToggleButton(
+            text='Segments',
+            size_hint=(None, None),
+            size=(dp(100), dp(30))
+        )
+        self.segments_btn.bind(on_press=self.toggle_segment_view)
+        # Re-translate the changed segments a moment after typing stops
+        self.live_btn = ToggleButton(
+            text='Live',
+            size_hint=(None, None),
+            size=(dp(80), dp(30))
+        )
+        self.live_btn.bind(on_press=lambda instance: self._live_trigger())
+        self._live_trigger = Clock.create_trigger(self.live_translate, LIVE_DELAY)
+        self.input_text.bind(text=self.on_input_changed)
+        progress_layout.add_widget(self.progress_bar)
+        progress_layout.add_widget(self.status_label)
+        progress_layout.add_widget(self.live_btn)
+        progress_layout.add_widget(self.segments_btn)
+        progress_layout.add_widget(self.cancel_btn)
+        
         # Result text area
         self.result_text = TextInput(
             multiline=True,
@@ -313,140 +432,340 @@ class TranslationApp(App):
             allow_copy=True
         )
         
+        # Side-by-side viewer for large documents; only rows in view are rendered
+        self.viewer = SegmentViewer(
+            font_name=self.font_path if self.font_path else '',
+            font_size=16,
+            on_close=self.show_text_view,
+            size_hint_y=0.8
+        )
+        
         # Add all widgets to main layout
+        self.main_layout = main_layout
         main_layout.add_widget(self.input_text)
         main_layout.add_widget(engine_layout)
+        main_layout.add_widget(progress_layout)
         main_layout.add_widget(self.result_text)
         
         # Bind swap button
         self.title_bar.swap_btn.bind(on_press=self.swap_languages)
         
+        if startup_profile:
+            startup_profile.mark('build')
         return main_layout
     
+    def on_start(self):
+        if startup_profile:
+            # Clock callbacks run once the first frame has been drawn
+            Clock.schedule_once(self._finish_startup_profile, 0)
+        elif os.environ.get('DOTRANSLATE_WARMUP', '1') != '0':
+            Clock.schedule_once(self._start_warm_up, WARMUP_DELAY)
+    
+    def _finish_startup_profile(self, dt):
+        startup_profile.mark('first frame')
+        if not startup_profile.report():
+            self.exit_code = 1
+        self.stop()
+    
+    def _start_warm_up(self, dt):
+        threading.Thread(target=self._warm_up, daemon=True).start()
+    
+    def _warm_up(self):
+        """Preload the heavy OCR/PDF/NLTK modules in the background"""
+        try:
+            warm_up_extraction()
+            if 'english' in self.enabled_thesaurus_langs and wordnet_available():
+                # Precompute the WordNet index once so lookups never walk WordNet
+                self.thesaurus.ensure_index()
+        except Exception as e:
+            logger.warning("Warm-up failed: %s", e)
+    
     def swap_languages(self, instance):
         # Swap source and target languages
         current_source = self.title_bar.source_lang.text
+        if current_source == 'Detect':
+            return  # The target needs an actual language
         self.title_bar.source_lang.text = self.title_bar.target_lang.text
         self.title_bar.target_lang.text = current_source
     
+    def translation_params(self):
+        """Languages and engine picked in the UI; must be read on the main thread"""
+        source_lang = LANGUAGE_CODES.get(self.title_bar.source_lang.text.lower(), 'en')
+        target_lang = LANGUAGE_CODES.get(self.title_bar.target_lang.text.lower(), 'es')
+        engine = ENGINE_CODES.get(self.engine.text.lower(), 'google')
+        target_name = self.title_bar.target_lang.text.lower()
+        return source_lang, target_lang, engine, target_name
+    
+    def on_input_changed(self, instance, text):
+        if self.live_btn.state == 'down':
+            self._live_trigger()
+    
+    def live_translate(self, dt):
+        # Never interrupt extraction or a document job; a live job still running is superseded
+        if self.live_btn.state != 'down' or self.viewer_active:
+            return
+        if self.current_job is not None and self.current_job is not self.live_job:
+            return
+        self.live_job = self.translate_text(None)
+    
     def translate_text(self, instance):
-        text = self.input_text.text
-        if not text:
+        if self.viewer_active:
+            # Keep the segments (and their page numbers) of the document on screen
+            store = self.viewer.store
+            items = [(separator, item['source'], item['page'])
+                     for separator, item in zip(store.separators, store.items)]
+            text = None
+        else:
+            items = None
+            text = self.input_text.text
+        if not (text or items):
             return
         
-        # Map language names to their correct API codes
-        language_codes = {
-            'english': 'en',
-            'spanish': 'es',
-            'french': 'fr',
-            'german': 'de',
-            'russian': 'ru',
-            'chinese': 'zh',
-            'italian': 'it'
-        }
-        
-        # Map engine names to their API identifiers
-        engine_codes = {
-            'google': 'google',
-            'duckduckgo': 'duckduckgo',
-            'yandex': 'yandex',
-            'deepl': 'deepl'
-        }
-        
-        source_lang = language_codes.get(self.title_bar.source_lang.text.lower(), 'en')
-        target_lang = language_codes.get(self.title_bar.target_lang.text.lower(), 'es')
-        engine = engine_codes.get(self.engine.text.lower(), 'google')
+        params = self.translation_params()
+        status = "Translating..."
+        if text and params[0] != AUTO_SOURCE:
+            # Only a hint: mixed-language text can fool detection, the user's choice stands
+            language, confidence = detect_language(text)
+            if (language and LANGUAGE_CODES[language] != params[0]
+                    and confidence >= MISMATCH_CONFIDENCE):
+                status = f"Translating (looks like {language.title()})..."
+        cancel_event = self.start_job(status)
+        self.result_text.text = ''
+        threading.Thread(
+            target=self._translate_worker,
+            args=(text, items, params, cancel_event),
+            daemon=True
+        ).start()
+        return cancel_event
+    
+    def _translate_worker(self, text, items, params, cancel_event):
+        if items is None:
+            # Keep the last run's segments so an edit only re-sends the chunks it touched
+            items = [(separator, chunk, None) for separator, chunk in self.session.items(text)]
+        dedup = self.session.deduplicator(params, self.engine_client.dedupe)
+        self.run_translation(items, len(items), params, cancel_event, dedup=dedup)
+    
+    def run_translation(self, items, total, params, cancel_event, errors=(), dedup=None):
+        """Translate (separator, chunk, page) items on a worker thread, streaming results to the UI.
+
+        `items` may be a generator still extracting the document, in which case
+        `total` is None and extraction failures are collected in `errors`.
+        """
+        source_lang, target_lang, engine, target_name = params
+        separators = []
+        chunks = []
         
-        def chunk_text(text, max_chars):
-            # If the text contains CJK (Chinese, Japanese, Korean) characters, split by characters
-            cjk_re = re.compile(r'[\u4e00-\u9fff\u3400-\u4dbf\u3040-\u30ff\uac00-\ud7af]')
-            if cjk_re.search(text):
-                # Split by max_chars characters
-                return [text[i:i+max_chars] for i in range(0, len(text), max_chars)]
-            # Otherwise, split by paragraphs, but keep chunks under max_chars
-            paragraphs = text.split('\n')
-            chunks = []
-            current = ''
-            for para in paragraphs:
-                if len(current) + len(para) + 1 > max_chars:
-                    if current:
-                        chunks.append(current)
-                        current = ''
-                if len(para) > max_chars:
-                    # If a single paragraph is too long, split it
-                    for i in range(0, len(para), max_chars):
-                        chunks.append(para[i:i+max_chars])
-                else:
-                    if current:
-                        current += '\n' + para
-                    else:
-                        current = para
-            if current:
-                chunks.append(current)
-            return chunks
+        def texts():
+            for separator, chunk, _ in self._record_segments(items, cancel_event):
+                separators.append(separator)
+                chunks.append(chunk)
+                yield chunk
         
-        chunks = chunk_text(text, MAX_CHARS)
-        translations = []
+        results = {}
+        finished = {}  # Every result so far, for the next incremental run
+        output = []
+        rendered = 0
+        first_word_choices = None
+        if dedup is None and self.engine_client.dedupe:
+            dedup = SegmentDeduplicator()
+        Clock.schedule_once(lambda dt: self.update_progress(cancel_event, 0, total))
         
         try:
-            for idx, chunk in enumerate(chunks):
-                url = "https://translate.librenode.com/api/translate"
-                headers = {
-                    'Accept': 'application/json'
-                }
-                payload = {
-                    'from': source_lang,
-                    'to': target_lang,
-                    'engine': engine,
-                    'text': chunk
-                }
-                print(f"Making POST request to: {url} with payload length {len(chunk)}")
-                response = requests.post(url, headers=headers, data=payload)
-                print(f"Response status code: {response.status_code}")
-                print(f"Response headers: {response.headers}")
-                print(f"Response content: {response.text[:500]}")
-                response.raise_for_status()
-                try:
-                    result = response.json()
-                    # Deepl-specific error handling
-                    if engine == 'deepl' and (not result.get('translated-text')):
-                        translations.append('[Deepl translation failed: No result returned. Try another engine or check API status.]')
-                    elif 'translated-text' in result:
-                        translations.append(result['translated-text'])
-                        # Save word_choices for thesaurus if present
-                        if idx == 0 and result.get('word_choices'):
-                            self.last_word_choices = result['word_choices']
-                        else:
-                            self.last_word_choices = None
-                    else:
-                        translations.append(f"[Chunk {idx+1} failed: Unexpected response format]")
-                except json.JSONDecodeError as json_err:
-                    translations.append(f"[Chunk {idx+1} error: {str(json_err)}]")
-            self.result_text.text = '\n'.join(translations)
+            for done, (idx, result) in enumerate(self.engine_client.iter_translations(
+                    texts(), source_lang, target_lang, engine, cancel_event, dedup=dedup), 1):
+                results[idx] = result
+                finished[idx] = result
+                # Stream the contiguous prefix of finished chunks to the result box,
+                # keeping the source whitespace between chunks
+                ready = []
+                while rendered in results:
+                    translation, word_choices = results.pop(rendered)
+                    if rendered == 0:
+                        first_word_choices = word_choices
+                    ready.append((rendered, separators[rendered], translation))
+                    output.append(separators[rendered])
+                    output.append(translation)
+                    rendered += 1
+                Clock.schedule_once(
+                    lambda dt, ready=ready, done=done: self.append_translation(cancel_event, ready, done, total))
+            result_text = ''.join(output).strip()
+            if first_word_choices and len(result_text.split()) == 1:
+                # Alternatives offered by the API become synonyms for future lookups
+                self.thesaurus.learn(target_name, result_text, first_word_choices)
             # Thesaurus auto-trigger: only if single word, not Chinese, and language enabled
-            result_text = self.result_text.text.strip()
-            target_lang = self.title_bar.target_lang.text.lower()
             if (len(result_text.split()) == 1 and
-                target_lang != 'chinese' and
-                target_lang in self.enabled_thesaurus_langs):
-                self.result_text.text = self.get_thesaurus_text(result_text, target_lang)
+                target_name != 'chinese' and
+                target_name in self.enabled_thesaurus_langs):
+                thesaurus_text = self.get_thesaurus_text(result_text, target_name)
+                Clock.schedule_once(lambda dt: self.show_result(cancel_event, thesaurus_text))
+            status = f"Done: {dedup.report()}" if dedup is not None and dedup.saved else 'Done'
+            self.finish_job(cancel_event, error=errors[0] if errors else None, status=status)
+        except TranslationCancelled:
+            self.finish_job(cancel_event)
         except requests.exceptions.HTTPError as http_err:
-            if response.status_code == 400:
+            response = http_err.response
+            if response is not None and response.status_code == 400:
                 try:
                     error_detail = response.json().get('error', {}).get('message', 'Unknown error')
-                    self.result_text.text = f"Error: {error_detail}"
+                    self.finish_job(cancel_event, error=f"Error: {error_detail}")
                 except json.JSONDecodeError:
-                    self.result_text.text = f"Error: {response.text[:100]}"
+                    self.finish_job(cancel_event, error=f"Error: {response.text[:100]}")
             else:
-                self.result_text.text = f"HTTP Error: {str(http_err)}"
+                self.finish_job(cancel_event, error=f"HTTP Error: {str(http_err)}")
         except requests.exceptions.RequestException as req_err:
-            self.result_text.text = f"Request Error: {str(req_err)}"
+            self.finish_job(cancel_event, error=f"Request Error: {str(req_err)}")
         except Exception as e:
-            self.result_text.text = f"Unexpected Error: {str(e)}"
+            self.finish_job(cancel_event, error=f"Unexpected Error: {str(e)}")
+        finally:
+            self.session.record(params, chunks, finished)
+    
+    def start_job(self, status):
+        """Cancel any running job and return the cancel event for a new one"""
+        self.cancel_job()
+        cancel_event = threading.Event()
+        self.current_job = cancel_event
+        self.status_label.text = status
+        self.progress_bar.value = 0
+        self.cancel_btn.disabled = False
+        self.viewer.clear()
+        return cancel_event
+    
+    def cancel_job(self, instance=None):
+        if self.current_job is not None:
+            self.current_job.set()
+            self.current_job = None
+            self.status_label.text = 'Cancelled'
+            self.cancel_btn.disabled = True
+    
+    def finish_job(self, cancel_event, error=None, status='Done'):
+        """Called from worker threads; UI updates are marshalled onto the main thread"""
+        def finish(dt):
+            if cancel_event is not self.current_job:
+                return
+            self.current_job = None
+            self.cancel_btn.disabled = True
+            if error:
+                self.result_text.text = error
+                self.viewer.set_message(error)
+                self.status_label.text = 'Failed'
+            else:
+                self.progress_bar.value = self.progress_bar.max
+                self.status_label.text = status
+        Clock.schedule_once(finish)
+    
+    def update_progress(self, cancel_event, done, total):
+        if cancel_event is not self.current_job:
+            return
+        if total is None:
+            # Streaming a document: the bar follows the pages read instead
+            self.status_label.text = f"Translated {done} chunks, page {self.pages_read[0]}/{self.pages_read[1]}"
+            return
+        self.progress_bar.max = max(total, 1)
+        self.progress_bar.value = done
+        self.status_label.text = f"Translated {done}/{total} chunks"
+    
+    def update_pages(self, cancel_event, page_idx, page_count):
+        if cancel_event is not self.current_job:
+            return
+        self.pages_read = (page_idx, page_count)
+        if page_idx == 1 and page_count >= VIEWER_MIN_PAGES:
+            self.show_segment_view()
+        self.progress_bar.max = max(page_count, 1)
+        self.progress_bar.value = page_idx
+        self.status_label.text = f"Read page {page_idx}/{page_count}"
+    
+    def append_input(self, cancel_event, text):
+        # The segment viewer shows the source itself; text view is refilled when shown again
+        if cancel_event is self.current_job and not self.viewer_active:
+            self.input_text.text += text
+    
+    def add_segment(self, cancel_event, separator, chunk, page):
+        if cancel_event is self.current_job:
+            self.viewer.add_segment(separator, chunk, page)
+    
+    def append_translation(self, cancel_event, pieces, done, total):
+        """pieces are (segment index, separator, translation) in document order"""
+        if cancel_event is not self.current_job:
+            return
+        for idx, _, translation in pieces:
+            self.viewer.set_translation(idx, translation)
+        if pieces and not self.viewer_active:
+            self.result_text.text += ''.join(separator + translation for _, separator, translation in pieces)
+        self.update_progress(cancel_event, done, total)
+    
+    def toggle_segment_view(self, instance):
+        if self.viewer_active:
+            self.show_text_view()
+        else:
+            self.show_segment_view()
+    
+    def show_segment_view(self):
+        if self.viewer_active:
+            return
+        if self.current_job is None and self.input_text.text != self.viewer.store.source_text():
+            # The text was edited (or typed) since the last job: show its segments untranslated
+            self.viewer.load_text((separator, chunk, None)
+                                  for separator, chunk in self.session.items(self.input_text.text))
+        self.main_layout.remove_widget(self.input_text)
+        self.main_layout.remove_widget(self.result_text)
+        self.main_layout.add_widget(self.viewer)
+        self.viewer_active = True
+        self.segments_btn.state = 'down'
+    
+    def show_text_view(self):
+        if not self.viewer_active:
+            return
+        self.main_layout.remove_widget(self.viewer)
+        # Insert the source box right below the title bar, the result box at the bottom
+        self.main_layout.add_widget(self.input_text, index=len(self.main_layout.children) - 1)
+        self.main_layout.add_widget(self.result_text)
+        self.input_text.text = self.viewer.store.source_text()
+        self.result_text.text = self.viewer.store.target_text()
+        self.viewer_active = False
+        self.segments_btn.state = 'normal'
+    
+    def show_result(self, cancel_event, text):
+        if cancel_event is self.current_job:
+            self.result_text.text = text
+    
+    def clear_translation_memory(self, instance):
+        messages = []
+        memory = self.engine_client.memory
+        if memory is None:
+            messages.append("Translation memory is disabled.")
+        else:
+            stats = memory.stats()
+            memory.clear()
+            messages.append(f"Translation memory cleared ({stats['entries']} entries, "
+                            f"{stats['hits']} hits / {stats['misses']} misses this session).")
+        ocr_cache = get_ocr_engine().cache
+        if ocr_cache is not None:
+            ocr_cache.clear()
+            messages.append("OCR cache cleared.")
+        self.session.clear()
+        self.show_text_view()
+        self.result_text.text = '\n'.join(messages)
+    
+    def show_metrics(self, instance):
+        """Show where time went this session in the result box"""
+        lines = [METRICS.summary()]
+        if METRICS.prometheus_path:
+            lines.append(f"Prometheus metrics are written to {METRICS.prometheus_path} on exit.")
+        self.show_text_view()
+        self.result_text.text = '\n'.join(lines)
+    
+    def on_stop(self):
+        self.cancel_job()
+        self.engine_client.close()
+        get_ocr_engine().close()
+        if self._thesaurus is not None:
+            self._thesaurus.close()
+        METRICS.close()
     
     def copy_translation(self, instance):
-        if self.result_text.text:
-            Clipboard.copy(self.result_text.text)
+        text = self.viewer.store.target_text() if self.viewer_active else self.result_text.text
+        if text:
+            Clipboard.copy(text)
     
     def select_thesaurus_languages(self, instance=None):
         # Supported languages (except Chinese)
@@ -454,6 +773,7 @@ class TranslationApp(App):
         content = BoxLayout(orientation='vertical', spacing=5)
         checkboxes = {}
         from kivy.uix.checkbox import CheckBox
+        from kivy.uix.popup import Popup
         for lang in supported:
             row = BoxLayout(orientation='horizontal', size_hint_y=None, height=dp(40))
             cb = CheckBox(active=(lang in self.enabled_thesaurus_langs))
@@ -476,45 +796,23 @@ class TranslationApp(App):
         popup.open()
 
     def get_thesaurus_text(self, word, lang):
-        # For English, use NLTK WordNet
-        if lang == 'english':
-            try:
-                nltk.data.find('corpora/wordnet')
-            except LookupError:
-                nltk.download('wordnet')
-            synonyms = []
-            antonyms = []
-            from nltk.corpus import wordnet
-            for syn in wordnet.synsets(word):
-                for l in syn.lemmas():
-                    if l.name().lower() not in synonyms:
-                        synonyms.append(l.name().lower())
-                    if l.antonyms():
-                        for ant in l.antonyms():
-                            if ant.name().lower() not in antonyms:
-                                antonyms.append(ant.name().lower())
-            thesaurus_lines = [f"Thesaurus for '{word}' ({lang.title()}):"]
-            if synonyms:
-                thesaurus_lines.append(f"Synonyms: {', '.join(synonyms)}")
-            else:
-                thesaurus_lines.append("No synonyms found.")
-            if antonyms:
-                thesaurus_lines.append(f"Antonyms: {', '.join(antonyms)}")
-            else:
-                thesaurus_lines.append("No antonyms found.")
-            return '\n'.join(thesaurus_lines)
-        # For other languages, use API word_choices if available
-        elif hasattr(self, 'last_word_choices') and self.last_word_choices:
-            synonyms = [w['word'] for w in self.last_word_choices if w.get('word')]
-            thesaurus_lines = [f"Thesaurus for '{word}' ({lang.title()}):"]
-            if synonyms:
-                thesaurus_lines.append(f"Synonyms: {', '.join(synonyms)}")
-            else:
-                thesaurus_lines.append("No synonyms found.")
-            thesaurus_lines.append("No antonyms found.")
-            return '\n'.join(thesaurus_lines)
+        synonyms, antonyms = self.thesaurus.lookup(word, lang)
+        thesaurus_lines = [f"Thesaurus for '{word}' ({lang.title()}):"]
+        if synonyms:
+            thesaurus_lines.append(f"Synonyms: {', '.join(synonyms)}")
         else:
-            return f"Thesaurus for '{word}' ({lang.title()}):\nNo synonyms found.\nNo antonyms found.\n(Thesaurus is only available for English or when supported by the translation API.)"
+            thesaurus_lines.append("No synonyms found.")
+        if antonyms:
+            thesaurus_lines.append(f"Antonyms: {', '.join(antonyms)}")
+        else:
+            thesaurus_lines.append("No antonyms found.")
+        if lang != 'english' and not synonyms:
+            thesaurus_lines.append("(Thesaurus is only available for English or when supported by the translation API.)")
+        return '\n'.join(thesaurus_lines)
 
 if __name__ == '__main__':
-    TranslationApp().run()
+    configure_logging()
+    configure_metrics()
+    app = TranslationApp()
+    app.run()
+    sys.exit(app.exit_code)